@@ -7,31 +7,85 @@ Prophet Sentinel - Flask后端主程序
 - 实现惰性初始化避免导入时副作用
 - 支持生产环境部署（Gunicorn + systemd/Docker）
 """
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from datetime import datetime, UTC
+import hashlib
 import logging
+import math
 import os
-from typing import Optional
+import random
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
 
 from config import Config
+from models.batcher import MicroBatcher
+from models.cache import PredictionCache
 from models.predict import RiskPredictor
+from models.reloader import ModelReloader
+from risk_stream import RiskStream
+from scheduler import PrefetchScheduler, ScoreStore, metrics_fingerprint
+from services.ingestion import StreamIngestor
+from services.protocol_registry import PROTOCOL_REGISTRY
 from services.solana_service import SolanaService
 from services.sustainability import calculate_sustainability_score
+from utils.deadline import Deadline, DeadlineExceeded, DeadlineStats
 from utils.logger import setup_logger
+from utils.rate_limit import SharedRateLimiter, default_rate_limit_path
+from utils.responses import FastJSONProvider, dumps as encode_json, etag_matches, weak_etag
 
 # 初始化应用
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config.from_object(Config)
 CORS(app)
 
 # 设置日志
 logger = setup_logger()
 
+# 支持的协议列表
+SUPPORTED_PROTOCOLS = [
+    {'name': 'Jupiter', 'type': 'DEX Aggregator', 'supported': True},
+    {'name': 'Orca', 'type': 'AMM DEX', 'supported': True},
+    {'name': 'Raydium', 'type': 'AMM DEX', 'supported': True},
+    {'name': 'Serum', 'type': 'Order Book DEX', 'supported': True},
+    {'name': 'Marinade', 'type': 'Liquid Staking', 'supported': True},
+    {'name': 'Solend', 'type': 'Lending', 'supported': True},
+]
+
 # 服务实例（惰性初始化）
 _risk_predictor: Optional[RiskPredictor] = None
 _solana_service: Optional[SolanaService] = None
+_micro_batcher: Optional[MicroBatcher] = None
+_model_reloader: Optional[ModelReloader] = None
+_score_store: Optional[ScoreStore] = None
+_prefetch_scheduler: Optional[PrefetchScheduler] = None
+_stream_ingestor: Optional[StreamIngestor] = None
+_rate_limiter: Optional[SharedRateLimiter] = None
+
+# 风险分数变化推送（SSE），由分数存储写入时触发
+_risk_stream = RiskStream(
+    history=Config.RISK_STREAM_HISTORY,
+    heartbeat=Config.RISK_STREAM_HEARTBEAT,
+    max_subscribers=Config.RISK_STREAM_MAX_SUBSCRIBERS
+)
+
+# WSGI 模式下同时在线的推送连接数（每个连接占住一个处理线程）
+_wsgi_stream_slots = threading.BoundedSemaphore(max(1, Config.RISK_STREAM_WSGI_SLOTS))
+
+# 每个协议最近一次成功计算的响应，截止时间内算不完时作为旧分数返回
+# 协议名来自请求参数：只保存并推送注册表中的协议，任意名称不会撑大存储或推给订阅者
+_last_known_scores = ScoreStore(on_put=_risk_stream.publish, protocols=PROTOCOL_REGISTRY)
+_deadline_stats = DeadlineStats()
+
+# 按 ETag 缓存已编码的风险响应，缓存期内同一 ETag 复用同一份编码（不必每次重新编码）
+_risk_bodies = PredictionCache(max_size=Config.RESPONSE_CACHE_SIZE, ttl=Config.CACHE_TIMEOUT)
+_risk_not_modified = 0
 _services_initialized = False
+_background_pid: Optional[int] = None  # 已启动后台任务的进程
 
 
 def get_risk_predictor() -> RiskPredictor:
@@ -44,6 +98,17 @@ def get_risk_predictor() -> RiskPredictor:
     return _risk_predictor
 
 
+def get_prediction_backend():
+    """
+    获取单条预测使用的后端
+    
+    启用微批处理时返回 MicroBatcher（合并并发请求），否则直接返回 RiskPredictor。
+    两者都提供 predict / predict_batch 接口。
+    """
+    predictor = get_risk_predictor()
+    return _micro_batcher if _micro_batcher is not None else predictor
+
+
 def get_solana_service() -> SolanaService:
     """惰性获取 Solana 服务实例"""
     global _solana_service, _services_initialized
@@ -54,39 +119,511 @@ def get_solana_service() -> SolanaService:
     return _solana_service
 
 
-def _ensure_services_initialized():
-    """确保服务已初始化（内部使用）"""
-    global _risk_predictor, _solana_service, _services_initialized
+def get_rate_limiter() -> Optional[SharedRateLimiter]:
+    """惰性打开所有 worker 共享的限流文件；RATE_LIMIT_ENABLED=false 时返回 None"""
+    global _rate_limiter
     
-    if _services_initialized:
+    if _rate_limiter is None and Config.RATE_LIMIT_ENABLED:
+        _rate_limiter = SharedRateLimiter(
+            Config.RATE_LIMIT_FILE or default_rate_limit_path(Config.RATE_LIMIT_NAMESPACE or None),
+            capacity=Config.API_RATE_LIMIT,
+            per_seconds=60,
+            slots=Config.RATE_LIMIT_SLOTS
+        )
+        logger.info(f"🚦 限流已启用: 每个客户端每分钟 {Config.API_RATE_LIMIT} 次 ({_rate_limiter.path})")
+    
+    return _rate_limiter
+
+
+def _resolve_model_path() -> str:
+    """优先使用 mmap 模型文件（多 worker 共享页缓存），不存在时回退到 pickle"""
+    if Config.MODEL_ARTIFACT_PATH and os.path.exists(Config.MODEL_ARTIFACT_PATH):
+        return Config.MODEL_ARTIFACT_PATH
+    return Config.MODEL_PATH
+
+
+def _create_prediction_cache() -> Optional[PredictionCache]:
+    """按配置创建预测缓存，PREDICTION_CACHE_SIZE=0 时禁用"""
+    if Config.PREDICTION_CACHE_SIZE <= 0:
+        return None
+    return PredictionCache(max_size=Config.PREDICTION_CACHE_SIZE, ttl=Config.CACHE_TIMEOUT)
+
+
+def _ensure_services_initialized(start_background: bool = True):
+    """
+    确保服务已初始化（内部使用）
+    
+    Args:
+        start_background: 同时启动后台任务；preload 模式的 master 传 False，
+                          后台线程只在 fork 出的 worker 中启动
+    """
+    global _risk_predictor, _solana_service, _micro_batcher, _services_initialized
+    
+    if not _services_initialized:
+        try:
+            _risk_predictor = RiskPredictor(
+                model_path=_resolve_model_path(),
+                engine=Config.INFERENCE_ENGINE,
+                cache=_create_prediction_cache(),
+                cache_precision=Config.PREDICTION_CACHE_PRECISION
+            )
+            _solana_service = SolanaService()
+            _services_initialized = True
+            logger.info("✅ 服务初始化成功")
+        except Exception as e:
+            logger.error(f"❌ 服务初始化失败: {e}")
+            # Demo模式：即使初始化失败也继续运行
+            _risk_predictor = RiskPredictor(demo_mode=True)
+            _solana_service = SolanaService(demo_mode=True)
+            _services_initialized = True
+        
+        if Config.BATCHING_ENABLED:
+            _micro_batcher = MicroBatcher(
+                _risk_predictor,
+                window_ms=Config.BATCH_WINDOW_MS,
+                max_batch_size=Config.BATCH_MAX_SIZE
+            )
+            logger.info(
+                f"📦 微批处理已启用: 窗口 {Config.BATCH_WINDOW_MS}ms, 最大批 {Config.BATCH_MAX_SIZE}"
+            )
+    
+    if start_background:
+        start_background_services()
+
+
+def start_background_services():
+    """
+    在当前进程中启动后台任务：流式摄取、模型热更新、预取调度
+    
+    每个进程只启动一次。preload 模式下 master 不启动（fork 时这些线程可能正持有锁，
+    master 中的结果也没有请求使用），由 reinit_after_fork 或首个请求在每个 worker 中启动。
+    """
+    global _model_reloader, _score_store, _prefetch_scheduler, _stream_ingestor, _background_pid
+    
+    if _background_pid == os.getpid():
         return
+    _background_pid = os.getpid()
     
-    try:
-        _risk_predictor = RiskPredictor()
-        _solana_service = SolanaService()
-        _services_initialized = True
-        logger.info("✅ 服务初始化成功")
-    except Exception as e:
-        logger.error(f"❌ 服务初始化失败: {e}")
-        # Demo模式：即使初始化失败也继续运行
-        _risk_predictor = RiskPredictor(demo_mode=True)
-        _solana_service = SolanaService(demo_mode=True)
-        _services_initialized = True
+    if Config.STREAM_INGESTION_ENABLED and not _solana_service.demo_mode:
+        if _stream_ingestor is None:
+            _stream_ingestor = StreamIngestor(
+                _solana_service,
+                Config.SOLANA_WS_URL,
+                protocols=[p.name for p in PROTOCOL_REGISTRY.values()],
+                backfill=Config.STREAM_BACKFILL_ENABLED,
+                backfill_parallel=Config.STREAM_BACKFILL_PARALLEL
+            )
+            _solana_service.ingestor = _stream_ingestor
+        _stream_ingestor.start()
+        logger.info(f"📡 流式摄取已启用: {Config.SOLANA_WS_URL}")
+    
+    if Config.MODEL_RELOAD_ENABLED:
+        if _model_reloader is None:
+            _model_reloader = ModelReloader(_risk_predictor, interval=Config.MODEL_UPDATE_INTERVAL)
+        _model_reloader.start()
+    
+    if Config.PREFETCH_ENABLED:
+        if _prefetch_scheduler is None:
+            _score_store = ScoreStore(
+                max_age=Config.PREFETCH_MAX_AGE,
+                on_put=_risk_stream.publish,
+                protocols=PROTOCOL_REGISTRY
+            )
+            _prefetch_scheduler = PrefetchScheduler(
+                _solana_service,
+                _risk_predictor,
+                _score_store,
+                protocols=[p.name for p in PROTOCOL_REGISTRY.values()],
+                build_response=_build_risk_response,
+                interval=Config.PREFETCH_INTERVAL,
+                max_workers=Config.PREFETCH_WORKERS
+            )
+        _prefetch_scheduler.start()
+        logger.info(f"🔄 预取调度已启用: 每 {Config.PREFETCH_INTERVAL}s 刷新 {len(PROTOCOL_REGISTRY)} 个协议")
 
 
 def init_services():
     """手动初始化服务（用于测试和预加载）"""
     _ensure_services_initialized()
 
+
+# preload 模式 master 预热用的固定指标（低 / 中 / 高风险），覆盖模型的不同分支
+_WARMUP_METRICS = (
+    {'volume_24h': 50_000_000, 'liquidity_change': 0.1, 'whale_transfers': 2, 'holder_concentration': 0.4},
+    {'volume_24h': 15_000_000, 'liquidity_change': -0.05, 'whale_transfers': 5, 'holder_concentration': 0.6},
+    {'volume_24h': 3_000_000, 'liquidity_change': -0.3, 'whale_transfers': 12, 'holder_concentration': 0.85},
+)
+
+
+def warmup_services(rounds: int = None, start_background: bool = True):
+    """
+    预热模型和服务
+    
+    对所有支持的协议跑几轮完整的 拉取指标 → 批量预测 → 单条预测 路径，
+    让模型数组页、NumPy 内部缓存和惰性导入在处理第一个真实请求之前就绪。
+    preload 模式下在 master 中执行（start_background=False），
+    fork 出的 worker 以写时复制共享这些页面；此时不拉取链上指标，只用固定指标预热模型，
+    master 中不留下后台线程和连接。
+    """
+    rounds = Config.WARMUP_ROUNDS if rounds is None else rounds
+    _ensure_services_initialized(start_background=start_background)
+    
+    start = time.perf_counter()
+    names = [p['name'] for p in SUPPORTED_PROTOCOLS]
+    # master 中不发 RPC：拉取指标会启动 solana-rpc 事件循环线程并打开连接池，
+    # fork 后 worker 继承这些 socket 和填好的指标缓存；只用固定指标预热模型
+    use_rpc = start_background or _solana_service.demo_mode
+    for _ in range(rounds):
+        if use_rpc:
+            metrics_by_protocol = _solana_service.get_many_protocol_metrics(names)
+        else:
+            metrics_by_protocol = {
+                name: dict(_WARMUP_METRICS[i % len(_WARMUP_METRICS)], protocol=name)
+                for i, name in enumerate(names)
+            }
+        metrics_list = [metrics_by_protocol[name] for name in names]
+        predictions = _risk_predictor.predict_batch(metrics_list)
+        _risk_predictor.predict(metrics_list[0])
+        for name, metrics, prediction in zip(names, metrics_list, predictions):
+            _build_risk_response(name, metrics, prediction)
+    
+    logger.info(f"🔥 预热完成: {rounds} 轮, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def reinit_after_fork():
+    """
+    fork 之后在 worker 中重置不能跨进程共享的状态，然后启动后台任务
+    
+    - 随机数发生器：否则所有 worker 产生相同的随机序列
+    - SolanaService 客户端连接：socket 不能在进程间共享
+    - 模块级的锁（分数存储、预测缓存、响应缓存、模型热更新、截止时间统计、微批处理）：
+      fork 时其它线程可能正持有，子进程中永远不会释放，全部换新
+    - 风险推送流：换新的锁和事件纪元，各 worker 的事件序号互相独立；推送连接名额重新计数
+    - 限流器：共享映射继续使用，重建线程锁并清空本进程的缓存
+    - 流式摄取、模型热更新、预取调度：master 中不启动，在每个 worker 中启动
+    """
+    global _wsgi_stream_slots
+    
+    random.seed()
+    np.random.seed()
+    
+    if _solana_service is not None:
+        _solana_service.reset_after_fork()
+    
+    if _risk_predictor is not None:
+        _risk_predictor.reset_after_fork()
+    
+    if _micro_batcher is not None:
+        _micro_batcher.reset_after_fork()
+    
+    for store in (_last_known_scores, _score_store):
+        if store is not None:
+            store.reset_after_fork()
+    _risk_bodies.reset_after_fork()
+    _deadline_stats.reset_after_fork()
+    _wsgi_stream_slots = threading.BoundedSemaphore(max(1, Config.RISK_STREAM_WSGI_SLOTS))
+    _risk_stream.reset_after_fork()
+    
+    if _rate_limiter is not None:
+        _rate_limiter.reset_after_fork()
+    
+    if _services_initialized:
+        start_background_services()
+
+# ==================== 辅助函数 ====================
+
+def _classify_alert(risk_score: int) -> tuple:
+    """根据风险分数确定警报等级和对应emoji"""
+    if risk_score >= Config.RISK_THRESHOLD_HIGH:
+        return 'critical', '🚨'
+    elif risk_score >= Config.RISK_THRESHOLD_MEDIUM:
+        return 'high', '⚠️'
+    elif risk_score >= Config.RISK_THRESHOLD_LOW:
+        return 'medium', '⚡'
+    return 'low', '✅'
+
+
+def _build_risk_response(protocol: str, metrics: dict, prediction: dict) -> dict:
+    """组装单个协议的风险预测响应"""
+    risk_score = prediction['risk_score']
+    alert_level, alert_emoji = _classify_alert(risk_score)
+    
+    return {
+        'protocol': protocol,
+        'risk_score': risk_score,
+        'alert_level': alert_level,
+        'alert_emoji': alert_emoji,
+        'sustainable_score': calculate_sustainability_score(metrics),
+        'timestamp': datetime.now(UTC).isoformat(),
+        'metrics': {
+            'volume_24h': metrics.get('volume_24h'),
+            'liquidity_change': metrics.get('liquidity_change'),
+            'whale_transfers': metrics.get('whale_transfers'),
+            'holder_concentration': metrics.get('holder_concentration')
+        },
+        'confidence': prediction.get('confidence', 0.85)
+    }
+
+def _request_deadline(header: Optional[str] = None) -> Deadline:
+    """本次请求的截止时间：配置的预算，客户端通过 X-Deadline-Ms 请求头（header）可以要求更短"""
+    budget_ms = Config.REQUEST_DEADLINE_MS
+    if header:
+        try:
+            budget_ms = min(budget_ms, max(0.0, float(header)))
+        except ValueError:
+            pass
+    return Deadline(budget_ms / 1000)
+
+
+def _stale_response(protocol: str) -> Optional[dict]:
+    """最近一次的分数（按需计算或预取中较新的一个），标记 stale 和距今秒数"""
+    candidates = [
+        store.peek(protocol) for store in (_last_known_scores, _score_store) if store is not None
+    ]
+    candidates = [c for c in candidates if c is not None]
+    if not candidates:
+        return None
+    response, age = min(candidates, key=lambda c: c[1])
+    return {**response, 'stale': True, 'stale_age_seconds': round(age, 1)}
+
+
+def _deadline_fallback(protocol: str, error: DeadlineExceeded) -> tuple:
+    """单个协议超时后的响应 (payload, 状态码)：有旧分数返回旧分数，否则 504"""
+    stale = _stale_response(protocol)
+    _deadline_stats.record_miss(error.stage, served_stale=stale is not None)
+    if stale is not None:
+        logger.warning(f"⏱️ {protocol} 在 {error.stage} 阶段超时，返回 {stale['stale_age_seconds']}s 前的分数")
+        return stale, 200
+    logger.error(f"⏱️ {protocol} 在 {error.stage} 阶段超时，且没有可用的旧分数")
+    return {
+        'error': str(error),
+        'status': 'timeout'
+    }, 504
+
+
+def _risk_cache_headers(protocol: str, fingerprint: tuple, max_age: float) -> dict:
+    """
+    风险响应的缓存头
+    
+    ETag 由 协议 + 指标 + 模型版本（fingerprint）决定，三者不变则风险分数、等级和指标不变。
+    timestamp 和演示模式的 confidence 每次生成都不同，不在 ETag 覆盖范围内，
+    所以是弱 ETag：同一 ETag 的响应语义相同，但不保证字节相同（缓存过期后、不同 worker 之间）。
+    max-age 为距指标下次刷新的秒数。
+    """
+    return {
+        'ETag': weak_etag(protocol, fingerprint),
+        'Cache-Control': f'public, max-age={max(0, int(max_age))}',
+    }
+
+
+def _risk_not_modified_hit(cache_headers: dict, if_none_match: Optional[str]) -> bool:
+    """客户端缓存的版本仍然有效时返回 True，调用方直接回 304，不需要打分"""
+    global _risk_not_modified
+    if etag_matches(if_none_match, cache_headers['ETag']):
+        _risk_not_modified += 1
+        return True
+    return False
+
+
+def _cached_risk_body(cache_headers: dict) -> Optional[bytes]:
+    return _risk_bodies.get(cache_headers['ETag'])
+
+
+def _store_risk_body(cache_headers: dict, response: dict) -> bytes:
+    body = encode_json(response)
+    _risk_bodies.set(cache_headers['ETag'], body)
+    return body
+
+
+def _prefetched_risk(protocol: str) -> Optional[Tuple[dict, dict]]:
+    """预取存储命中时返回 (响应, 缓存头)"""
+    entry = _score_store.lookup(protocol) if _score_store is not None else None
+    if entry is None:
+        return None
+    response, fingerprint, age = entry
+    return response, _risk_cache_headers(response['protocol'], fingerprint, Config.PREFETCH_INTERVAL - age)
+
+
+def _unknown_protocol_error(protocol: str) -> Optional[dict]:
+    """
+    协议不在注册表中时返回错误条目（Flask 与 ASGI 入口、批量接口共用）
+
+    演示模式生成模拟指标，接受任意协议名；真实模式只能拉取注册表中的账户。
+    """
+    solana_svc = get_solana_service()
+    if solana_svc.demo_mode or protocol.lower() in solana_svc.registry:
+        return None
+    return {
+        'protocol': protocol,
+        'error': f'不支持的协议: {protocol}',
+        'status': 'unknown_protocol'
+    }
+
+
+def _rate_limit_check(method: str, path: str, remote_addr: Optional[str],
+                      forwarded_for: Optional[str] = None) -> Optional[tuple]:
+    """
+    按客户端 IP 消耗一个令牌（Flask 与 ASGI 入口共用）
+    
+    Returns:
+        放行返回 None；超限返回 (payload, 状态码 429, 响应头)
+    """
+    # 健康检查、CORS 预检和非 API 路径不限流
+    if method == 'OPTIONS' or not path.startswith('/api/') or path == '/api/health':
+        return None
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return None
+    
+    client = remote_addr or 'unknown'
+    hops = Config.RATE_LIMIT_PROXY_HOPS
+    if hops > 0 and forwarded_for:
+        # 与 werkzeug ProxyFix(x_for=N) 相同：取可信代理追加的地址；条目不足 N 个时说明没有经过全部代理，用对端地址
+        entries = forwarded_for.split(',')
+        if len(entries) >= hops:
+            client = entries[-hops].strip()
+    
+    wait = limiter.acquire(client)
+    if not wait:
+        return None
+    return {
+        'error': '请求过于频繁，请稍后重试',
+        'status': 'rate_limited'
+    }, 429, {'Retry-After': str(math.ceil(wait))}
+
+
+def _health_payload() -> dict:
+    """健康检查内容（Flask 与 ASGI 入口共用）"""
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now(UTC).isoformat(),
+        'model_loaded': _services_initialized and _risk_predictor is not None,
+        'solana_connected': _services_initialized and _solana_service is not None,
+        'batching': _micro_batcher.stats() if _micro_batcher is not None else None,
+        'model': _risk_predictor.model_info() if _risk_predictor is not None else None,
+        'model_reloader': _model_reloader.stats() if _model_reloader is not None else None,
+        'prefetch': _prefetch_scheduler.stats() if _prefetch_scheduler is not None else None,
+        'stream_ingestion': _stream_ingestor.stats() if _stream_ingestor is not None else None,
+        'metrics_cache': (
+            _solana_service.metrics_cache.stats() if _solana_service is not None else None
+        ),
+        'deadlines': _deadline_stats.stats(),
+        'risk_stream': _risk_stream.stats(),
+        'rpc': (
+            _solana_service.client.stats()
+            if _solana_service is not None and not _solana_service.demo_mode else None
+        ),
+        'prediction_cache': (
+            _risk_predictor.cache.stats()
+            if _risk_predictor is not None and _risk_predictor.cache is not None else None
+        ),
+        'response_cache': {**_risk_bodies.stats(), 'not_modified': _risk_not_modified},
+        'rate_limit': _rate_limiter.stats() if _rate_limiter is not None else None
+    }
+
+
+def _verify_proof_payload(data: dict) -> tuple:
+    """zk 验证响应 (payload, 状态码)（简化版，实际应使用 zk-SNARK）"""
+    wallet_hash = data.get('wallet_hash')
+    risk_score = data.get('risk_score')
+    
+    if not wallet_hash or risk_score is None:
+        return {'error': '缺少必要参数'}, 400
+    
+    proof_data = f"{wallet_hash}:{risk_score}:{int(time.time())}"
+    proof_hash = hashlib.sha256(proof_data.encode()).hexdigest()
+    
+    return {
+        'verified': True,
+        'proof_hash': proof_hash,
+        'message': '✅ 风险分数已验证，钱包地址未泄露',
+        'timestamp': datetime.now(UTC).isoformat()
+    }, 200
+
+
+def _score_protocols(protocols: list, deadline: Deadline) -> dict:
+    """
+    一次批量打分多个协议：预取存储命中的直接使用，其余协议只拉取一轮指标、只调用一次模型。
+    超过截止时间时，未完成的协议返回旧分数（stale: true），没有旧分数的返回错误条目。
+    
+    Returns:
+        {协议名: 响应}，响应格式同 /api/predict_risk
+    """
+    solana_svc = get_solana_service()
+    risk_pred = get_risk_predictor()
+    
+    # 0. 未注册的协议返回错误条目，预取调度器已打分的协议直接使用
+    responses = {}
+    for p in protocols:
+        unknown = _unknown_protocol_error(p)
+        if unknown is not None:
+            responses[p] = unknown
+    if _score_store is not None:
+        for p in protocols:
+            prefetched = _score_store.get(p)
+            if prefetched is not None:
+                responses[p] = prefetched
+    pending = [p for p in dict.fromkeys(protocols) if p not in responses]
+    
+    if pending:
+        try:
+            # 1. 批量拉取其余协议指标（去重账户，合并为 JSON-RPC 批量请求）
+            try:
+                metrics_by_protocol = solana_svc.get_many_protocol_metrics(
+                    pending, timeout=deadline.remaining()
+                )
+            except TimeoutError:
+                raise DeadlineExceeded('metrics')
+            metrics_list = [metrics_by_protocol[p] for p in pending]
+            
+            # 2. 一次性批量预测（本地推理不可中断，开始前检查预算）
+            deadline.check('predict')
+            predictions = risk_pred.predict_batch(metrics_list)
+            
+            for protocol, metrics, prediction in zip(pending, metrics_list, predictions):
+                responses[protocol] = _build_risk_response(protocol, metrics, prediction)
+                _last_known_scores.put(protocol, responses[protocol], fingerprint=())
+        except DeadlineExceeded as e:
+            for protocol in pending:
+                stale = _stale_response(protocol)
+                _deadline_stats.record_miss(e.stage, served_stale=stale is not None)
+                responses[protocol] = stale if stale is not None else {
+                    'protocol': protocol,
+                    'error': str(e),
+                    'status': 'timeout'
+                }
+            logger.warning(f"⏱️ 批量预测在 {e.stage} 阶段超时: {len(pending)} 个协议回退")
+    
+    return responses
+
+
 # 确保在模块导入时初始化服务（使得测试导入 app 时也能使用服务）
+# 导入时不启动后台线程：preload 模式下这里运行在 gunicorn master 中，
+# 后台任务在 worker 中启动（post_fork 钩子或首个请求）
 try:
-    init_services()
+    _ensure_services_initialized(start_background=False)
 except Exception:
     # 初始化失败时已经在 init_services 内部降级为 demo_mode，这里再捕获以防万一
     pass
 
 # ==================== API路由 ====================
 
+@app.before_request
+def ensure_background_services():
+    """在处理请求的进程中启动后台任务（已启动时只比较一次 pid）"""
+    start_background_services()
+
+
+@app.before_request
+def enforce_rate_limit():
+    """每个客户端每分钟最多 API_RATE_LIMIT 次请求，所有 worker 共享同一组令牌桶"""
+    limited = _rate_limit_check(
+        request.method, request.path, request.remote_addr, request.headers.get('X-Forwarded-For')
+    )
+    if limited is not None:
+        payload, status, headers = limited
+        return jsonify(payload), status, headers
+
 @app.route('/', methods=['GET'])
 def home():
     """API首页"""
@@ -97,6 +634,7 @@ def home():
         'endpoints': {
             '/api/health': '健康检查',
             '/api/predict_risk': '风险预测',
+            '/api/predict_risk/batch': '批量风险预测',
             '/api/protocols': '支持的协议列表',
             '/api/verify_proof': 'zk隐私验证'
         }
@@ -105,12 +643,7 @@ def home():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查端点"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now(UTC).isoformat(),
-        'model_loaded': _services_initialized and _risk_predictor is not None,
-        'solana_connected': _services_initialized and _solana_service is not None
-    })
+    return jsonify(_health_payload())
 
 @app.route('/api/predict_risk', methods=['GET'])
 def predict_risk():
@@ -118,58 +651,69 @@ def predict_risk():
     风险预测API
     参数: protocol (string) - 协议名称，如 'Jupiter', 'Orca'
     返回: JSON包含风险分数、警报等级、可持续性评分等
+    
+    整个请求受 REQUEST_DEADLINE_MS 约束：拉取指标或预测超时时返回最近一次的分数，
+    并带上 stale: true 和 stale_age_seconds；没有旧分数时返回 504。
+    
+    响应带弱 ETag 和 Cache-Control；If-None-Match 命中时返回 304，不运行模型。
     """
+    deadline = _request_deadline(request.headers.get('X-Deadline-Ms'))
+    protocol = request.args.get('protocol', 'Jupiter')
+    if_none_match = request.headers.get('If-None-Match')
     try:
-        protocol = request.args.get('protocol', 'Jupiter')
-        
         logger.info(f"🔍 收到风险预测请求: {protocol}")
         
+        unknown = _unknown_protocol_error(protocol)
+        if unknown is not None:
+            return jsonify(unknown), 404
+        
+        # 预取调度器已打分的协议直接返回
+        prefetched = _prefetched_risk(protocol)
+        if prefetched is not None:
+            response, cache_headers = prefetched
+            if _risk_not_modified_hit(cache_headers, if_none_match):
+                return Response(status=304, headers=cache_headers)
+            body = _cached_risk_body(cache_headers) or _store_risk_body(cache_headers, response)
+            return Response(body, headers=cache_headers, mimetype='application/json')
+        
         # 惰性获取服务实例
         solana_svc = get_solana_service()
-        risk_pred = get_risk_predictor()
+        risk_pred = get_prediction_backend()
         
         # 1. 从Solana拉取实时指标
-        metrics = solana_svc.get_protocol_metrics(protocol)
+        try:
+            metrics = solana_svc.get_protocol_metrics(protocol, timeout=deadline.remaining())
+        except TimeoutError:
+            raise DeadlineExceeded('metrics')
         
-        # 2. ML模型预测风险
-        prediction = risk_pred.predict(metrics)
+        # 指标和模型都没变：客户端的版本仍然有效，或直接复用已编码的响应
+        cache_headers = _risk_cache_headers(
+            protocol,
+            metrics_fingerprint(get_risk_predictor().model_version, metrics),
+            solana_svc.metrics_ttl(protocol)
+        )
+        if _risk_not_modified_hit(cache_headers, if_none_match):
+            return Response(status=304, headers=cache_headers)
+        body = _cached_risk_body(cache_headers)
         
-        # 3. 计算可持续性评分
-        sustainable_score = calculate_sustainability_score(metrics)
+        if body is None:
+            # 2. ML模型预测风险
+            try:
+                prediction = risk_pred.predict(metrics, timeout=deadline.remaining())
+            except TimeoutError:
+                raise DeadlineExceeded('predict')
+            
+            # 3-4. 计算可持续性评分并确定警报等级
+            response = _build_risk_response(protocol, metrics, prediction)
+            _last_known_scores.put(protocol, response, fingerprint=())
+            body = _store_risk_body(cache_headers, response)
+            logger.info(f"✅ 预测完成: {protocol} - 风险分数 {response['risk_score']}")
         
-        # 4. 确定警报等级
-        risk_score = prediction['risk_score']
-        if risk_score >= Config.RISK_THRESHOLD_HIGH:
-            alert_level = 'critical'
-            alert_emoji = '🚨'
-        elif risk_score >= Config.RISK_THRESHOLD_MEDIUM:
-            alert_level = 'high'
-            alert_emoji = '⚠️'
-        elif risk_score >= Config.RISK_THRESHOLD_LOW:
-            alert_level = 'medium'
-            alert_emoji = '⚡'
-        else:
-            alert_level = 'low'
-            alert_emoji = '✅'
+        return Response(body, headers=cache_headers, mimetype='application/json')
         
-        response = {
-            'protocol': protocol,
-            'risk_score': risk_score,
-            'alert_level': alert_level,
-            'alert_emoji': alert_emoji,
-            'sustainable_score': sustainable_score,
-            'timestamp': datetime.now(UTC).isoformat(),
-            'metrics': {
-                'volume_24h': metrics.get('volume_24h'),
-                'liquidity_change': metrics.get('liquidity_change'),
-                'whale_transfers': metrics.get('whale_transfers'),
-                'holder_concentration': metrics.get('holder_concentration')
-            },
-            'confidence': prediction.get('confidence', 0.85)
-        }
-        
-        logger.info(f"✅ 预测完成: {protocol} - 风险分数 {risk_score}")
-        return jsonify(response)
+    except DeadlineExceeded as e:
+        payload, status = _deadline_fallback(protocol, e)
+        return jsonify(payload), status
         
     except Exception as e:
         logger.error(f"❌ 预测失败: {e}")
@@ -178,17 +722,142 @@ def predict_risk():
             'status': 'error'
         }), 500
 
+@app.route('/api/predict_risk/batch', methods=['POST'])
+def predict_risk_batch():
+    """
+    批量风险预测API
+    请求体: {"protocols": ["Jupiter", "Orca", ...]}
+    返回: 每个协议的预测结果（格式同 /api/predict_risk），模型只调用一次
+    
+    超过截止时间时，未完成的协议返回旧分数（stale: true），没有旧分数的协议返回错误条目。
+    """
+    deadline = _request_deadline(request.headers.get('X-Deadline-Ms'))
+    try:
+        data = request.get_json(silent=True) or {}
+        protocols = data.get('protocols')
+        
+        if not isinstance(protocols, list) or not protocols:
+            return jsonify({'error': '缺少必要参数: protocols'}), 400
+        
+        if len(protocols) > Config.BATCH_MAX_PROTOCOLS:
+            return jsonify({
+                'error': f'单次最多预测 {Config.BATCH_MAX_PROTOCOLS} 个协议'
+            }), 400
+        
+        if not all(isinstance(p, str) and p for p in protocols):
+            return jsonify({'error': 'protocols 必须是非空字符串列表'}), 400
+        
+        logger.info(f"🔍 收到批量风险预测请求: {len(protocols)} 个协议")
+        
+        responses = _score_protocols(protocols, deadline)
+        results = [responses[p] for p in protocols]
+        
+        logger.info(f"✅ 批量预测完成: {len(results)} 个协议")
+        return jsonify({
+            'results': results,
+            'total': len(results),
+            'timestamp': datetime.now(UTC).isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ 批量预测失败: {e}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+# 热图矩阵的列，rows 中每行按此顺序排列
+HEATMAP_COLUMNS = ['protocol', 'risk_score', 'sustainable_score', 'alert_level', 'stale']
+
+@app.route('/api/risk_heatmap', methods=['GET'])
+def risk_heatmap():
+    """
+    风险热图API
+    一次批量打分 /api/protocols 中的全部协议（一轮指标拉取、一次模型调用），
+    返回紧凑的矩阵格式: {"columns": [...], "rows": [[...], ...]}
+    
+    单个协议无法打分（未注册或超时且没有旧分数）时该行分数为 null，
+    原因列在 errors 中，其余协议照常返回。
+    """
+    deadline = _request_deadline(request.headers.get('X-Deadline-Ms'))
+    try:
+        protocols = [p['name'] for p in SUPPORTED_PROTOCOLS if p['supported']]
+        responses = _score_protocols(protocols, deadline)
+        
+        rows = []
+        errors = []
+        for protocol in protocols:
+            r = responses[protocol]
+            if 'error' in r:
+                errors.append(r)
+            rows.append([
+                protocol,
+                r.get('risk_score'),
+                r.get('sustainable_score'),
+                r.get('alert_level', 'unknown'),
+                r.get('stale', False),
+            ])
+        
+        return jsonify({
+            'columns': HEATMAP_COLUMNS,
+            'rows': rows,
+            'errors': errors,
+            'total': len(rows),
+            'timestamp': datetime.now(UTC).isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ 热图计算失败: {e}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+@app.route('/api/stream/risk', methods=['GET'])
+def stream_risk():
+    """
+    风险变化推送（Server-Sent Events）
+    参数: protocols (string, 可选) - 逗号分隔的协议名，只接收这些协议的事件
+    请求头: Last-Event-ID - 断线重连时从该事件之后补发（也可用 last_event_id 参数）
+    
+    连接后先收到 snapshot 事件（当前全部分数），之后每当 risk_score 或 alert_level
+    变化收到一条 risk 增量事件；空闲时定期收到心跳注释行。
+    """
+    # 单线程 worker 中一个推送连接会占住整个进程（并被 gunicorn 超时重启），不提供推送，客户端改为轮询
+    if not request.environ.get('wsgi.multithread') or Config.RISK_STREAM_WSGI_SLOTS <= 0:
+        return jsonify({
+            'error': '当前部署不支持推送，请改用轮询 /api/risk_heatmap',
+            'status': 'stream_unavailable'
+        }), 503
+    
+    protocols = [p.strip() for p in request.args.get('protocols', '').split(',') if p.strip()]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    # 推送连接最多占用 RISK_STREAM_WSGI_SLOTS 个线程，其余线程留给普通请求
+    slots = _wsgi_stream_slots
+    subscription = None
+    if slots.acquire(blocking=False):
+        subscription = _risk_stream.subscribe(last_event_id, protocols or None)
+        if subscription is None:
+            slots.release()
+    if subscription is None:
+        logger.warning("⚠️ 风险推送订阅数已达上限")
+        return jsonify({
+            'error': '订阅连接数已达上限，请稍后重试',
+            'status': 'busy'
+        }), 503, {'Retry-After': str(_risk_stream.retry_ms // 1000)}
+    
+    response = Response(subscription, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭反向代理缓冲
+    })
+    response.call_on_close(slots.release)
+    return response
+
 @app.route('/api/protocols', methods=['GET'])
 def get_protocols():
     """获取支持的协议列表"""
-    protocols = [
-        {'name': 'Jupiter', 'type': 'DEX Aggregator', 'supported': True},
-        {'name': 'Orca', 'type': 'AMM DEX', 'supported': True},
-        {'name': 'Raydium', 'type': 'AMM DEX', 'supported': True},
-        {'name': 'Serum', 'type': 'Order Book DEX', 'supported': True},
-        {'name': 'Marinade', 'type': 'Liquid Staking', 'supported': True},
-        {'name': 'Solend', 'type': 'Lending', 'supported': True},
-    ]
+    protocols = SUPPORTED_PROTOCOLS
     
     return jsonify({
         'protocols': protocols,
@@ -202,26 +871,8 @@ def verify_proof():
     接收钱包hash和风险分数，返回验证结果
     """
     try:
-        data = request.json
-        wallet_hash = data.get('wallet_hash')
-        risk_score = data.get('risk_score')
-        
-        if not wallet_hash or risk_score is None:
-            return jsonify({'error': '缺少必要参数'}), 400
-        
-        # 简化版zk验证（实际应使用zk-SNARK）
-        import hashlib
-        import time
-        
-        proof_data = f"{wallet_hash}:{risk_score}:{int(time.time())}"
-        proof_hash = hashlib.sha256(proof_data.encode()).hexdigest()
-        
-        return jsonify({
-            'verified': True,
-            'proof_hash': proof_hash,
-            'message': '✅ 风险分数已验证，钱包地址未泄露',
-            'timestamp': datetime.now(UTC).isoformat()
-        })
+        payload, status = _verify_proof_payload(request.json)
+        return jsonify(payload), status
         
     except Exception as e:
         logger.error(f"❌ zk验证失败: {e}")
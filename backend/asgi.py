@@ -0,0 +1,294 @@
+"""
+Prophet Sentinel - ASGI 入口
+
+同步 worker 中，等待 RPC 的请求会占住整个进程，并发上限就是 worker 数。
+ASGI 模式下热点路由用协程处理：拉取指标时在 SolanaService 的事件循环上等待，
+不占用线程；模型推理放在有界线程池（ASGI_MODEL_WORKERS）中执行，不阻塞事件循环。
+
+- 原生异步: /api/health, /api/predict_risk, /api/protocols, /api/verify_proof，
+  以及 /api/stream/risk（推送连接不占线程）
+- 其余路由（批量预测、热图等）转交 Flask 应用，在线程池中执行
+- 响应格式、截止时间与旧分数回退与 app.py 完全一致（共用同一组辅助函数与服务实例）
+
+运行:
+    uvicorn asgi:application --app-dir backend --workers 4
+    gunicorn -c backend/gunicorn_config.py -k uvicorn.workers.UvicornWorker --chdir backend asgi:application
+"""
+import asyncio
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+import app as flask_app
+from config import Config
+from scheduler import metrics_fingerprint
+from utils.deadline import DeadlineExceeded
+from utils.responses import dumps as encode_json
+
+logger = flask_app.logger
+
+# 模型推理线程池（按进程创建：fork 出的 worker 不继承线程）
+_model_executor: Optional[ThreadPoolExecutor] = None
+_model_executor_pid: Optional[int] = None
+
+
+def get_model_executor() -> ThreadPoolExecutor:
+    global _model_executor, _model_executor_pid
+    if _model_executor is None or _model_executor_pid != os.getpid():
+        _model_executor = ThreadPoolExecutor(
+            max_workers=Config.ASGI_MODEL_WORKERS, thread_name_prefix='asgi-model'
+        )
+        _model_executor_pid = os.getpid()
+    return _model_executor
+
+
+class Request:
+    """ASGI 请求的最小封装：查询参数、请求头（小写）和请求体"""
+
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+# 处理函数返回 (payload, 状态码) 或 (payload, 状态码, 额外响应头)；payload 可以是已编码的字节
+Handler = Callable[[Request], Awaitable[tuple]]
+
+
+# ==================== 路由处理 ====================
+
+async def health_check(request: Request) -> Tuple[dict, int]:
+    return flask_app._health_payload(), 200
+
+
+async def predict_risk(request: Request) -> tuple:
+    """与 app.predict_risk 相同的流程、响应格式和缓存头，I/O 和推理都不阻塞事件循环"""
+    deadline = flask_app._request_deadline(request.headers.get('x-deadline-ms'))
+    protocol = request.args.get('protocol', 'Jupiter')
+    if_none_match = request.headers.get('if-none-match')
+    try:
+        logger.info(f"🔍 收到风险预测请求: {protocol}")
+
+        unknown = flask_app._unknown_protocol_error(protocol)
+        if unknown is not None:
+            return unknown, 404
+
+        prefetched = flask_app._prefetched_risk(protocol)
+        if prefetched is not None:
+            response, cache_headers = prefetched
+            if flask_app._risk_not_modified_hit(cache_headers, if_none_match):
+                return b'', 304, cache_headers
+            body = flask_app._cached_risk_body(cache_headers) or flask_app._store_risk_body(cache_headers, response)
+            return body, 200, cache_headers
+
+        solana_svc = flask_app.get_solana_service()
+        risk_pred = flask_app.get_prediction_backend()
+
+        # 1. 在服务事件循环上拉取指标，这里只挂起协程
+        try:
+            metrics = await solana_svc.aget_protocol_metrics(protocol, timeout=deadline.remaining())
+        except TimeoutError:
+            raise DeadlineExceeded('metrics')
+
+        cache_headers = flask_app._risk_cache_headers(
+            protocol,
+            metrics_fingerprint(flask_app.get_risk_predictor().model_version, metrics),
+            solana_svc.metrics_ttl(protocol)
+        )
+        if flask_app._risk_not_modified_hit(cache_headers, if_none_match):
+            return b'', 304, cache_headers
+        body = flask_app._cached_risk_body(cache_headers)
+        if body is not None:
+            return body, 200, cache_headers
+
+        # 2. 在有界线程池中推理；排队超过剩余预算同样算作超时
+        loop = asyncio.get_running_loop()
+        try:
+            prediction = await asyncio.wait_for(
+                loop.run_in_executor(
+                    get_model_executor(),
+                    functools.partial(risk_pred.predict, metrics, timeout=deadline.remaining())
+                ),
+                deadline.remaining()
+            )
+        except TimeoutError:
+            raise DeadlineExceeded('predict')
+
+        response = flask_app._build_risk_response(protocol, metrics, prediction)
+        flask_app._last_known_scores.put(protocol, response, fingerprint=())
+
+        logger.info(f"✅ 预测完成: {protocol} - 风险分数 {response['risk_score']}")
+        return flask_app._store_risk_body(cache_headers, response), 200, cache_headers
+
+    except DeadlineExceeded as e:
+        return flask_app._deadline_fallback(protocol, e)
+
+    except Exception as e:
+        logger.error(f"❌ 预测失败: {e}")
+        return {'error': str(e), 'status': 'error'}, 500
+
+
+async def get_protocols(request: Request) -> Tuple[dict, int]:
+    protocols = flask_app.SUPPORTED_PROTOCOLS
+    return {'protocols': protocols, 'total': len(protocols)}, 200
+
+
+async def verify_proof(request: Request) -> Tuple[dict, int]:
+    try:
+        return flask_app._verify_proof_payload(request.json())
+    except Exception as e:
+        logger.error(f"❌ zk验证失败: {e}")
+        return {'error': str(e)}, 500
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_risk(scope, receive, send):
+    """与 app.stream_risk 相同的 SSE 推送；连接在事件循环上等待，不占线程，客户端断开即释放"""
+    request = Request(scope, b'')
+    protocols = [p.strip() for p in request.args.get('protocols', '').split(',') if p.strip()]
+    last_event_id = request.headers.get('last-event-id') or request.args.get('last_event_id')
+
+    stream = flask_app._risk_stream
+    subscription = stream.subscribe(last_event_id, protocols or None)
+    if subscription is None:
+        logger.warning("⚠️ 风险推送订阅数已达上限")
+        await _send_json(send, {
+            'error': '订阅连接数已达上限，请稍后重试',
+            'status': 'busy'
+        }, 503, [(b'retry-after', str(stream.retry_ms // 1000).encode())])
+        return
+
+    async def pump():
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ] + _CORS_HEADERS,
+        })
+        async for chunk in subscription:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(_wait_disconnect(receive))]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        subscription.close()
+
+
+ROUTES: Dict[str, Dict[str, Handler]] = {
+    '/api/health': {'GET': health_check},
+    '/api/predict_risk': {'GET': predict_risk},
+    '/api/protocols': {'GET': get_protocols},
+    '/api/verify_proof': {'POST': verify_proof},
+}
+
+
+# ==================== ASGI 应用 ====================
+
+_wsgi_fallback = WSGIMiddleware(flask_app.app)
+
+_CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _send_json(send, payload: Union[dict, bytes], status: int, headers: Optional[list] = None):
+    """发送 JSON 响应；payload 为字节时视为已编码，304 不带响应体"""
+    body = payload if isinstance(payload, bytes) else encode_json(payload)
+    if status == 304:
+        entity_headers = []
+        body = b''
+    else:
+        entity_headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ]
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': entity_headers + _CORS_HEADERS + (headers or []),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            flask_app.init_services()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _model_executor is not None:
+                _model_executor.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def _rate_limit(scope) -> Optional[tuple]:
+    """原生路由的限流检查；转交 Flask 的路由由 app.enforce_rate_limit 检查，不重复计数"""
+    client = scope.get('client')
+    forwarded_for = next((v.decode('latin-1') for k, v in scope.get('headers', []) if k == b'x-forwarded-for'), None)
+    return flask_app._rate_limit_check(scope['method'], scope['path'], client[0] if client else None, forwarded_for)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    is_stream = scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == '/api/stream/risk'
+    methods = ROUTES.get(scope['path']) if scope['type'] == 'http' else None
+    handler = methods.get(scope['method']) if methods else None
+    if handler is None and not is_stream:
+        # 其它路由、CORS 预检和 405 交给 Flask 处理
+        await _wsgi_fallback(scope, receive, send)
+        return
+
+    limited = _rate_limit(scope)
+    if limited is not None:
+        payload, status, headers = limited
+        await _send_json(send, payload, status, [(k.lower().encode(), v.encode()) for k, v in headers.items()])
+        return
+
+    if is_stream:
+        await stream_risk(scope, receive, send)
+        return
+
+    request = Request(scope, await _read_body(receive))
+    headers = None
+    try:
+        payload, status, *extra = await handler(request)
+        if extra:
+            headers = [(k.lower().encode(), v.encode()) for k, v in extra[0].items()]
+    except Exception as e:
+        logger.error(f"内部错误: {e}")
+        payload, status = {'error': '服务器内部错误'}, 500
+    await _send_json(send, payload, status, headers)
@@ -24,12 +24,56 @@ class Config:
     TELEGRAM_ADMIN_CHAT_ID = os.getenv('TELEGRAM_ADMIN_CHAT_ID', '')
     
     # 模型配置
-    MODEL_PATH = 'backend/models/risk_model.pkl'
-    MODEL_UPDATE_INTERVAL = 3600  # 1小时
+    MODEL_PATH = os.getenv('MODEL_PATH', 'backend/models/risk_model.pkl')
+    MODEL_ARTIFACT_PATH = os.getenv('MODEL_ARTIFACT_PATH', 'backend/models/risk_model.forest')  # 存在时优先 mmap 加载
+    MODEL_UPDATE_INTERVAL = int(os.getenv('MODEL_UPDATE_INTERVAL', 3600))  # 模型文件检查间隔（秒），1小时
+    MODEL_RELOAD_ENABLED = os.getenv('MODEL_RELOAD_ENABLED', 'true').lower() == 'true'  # 后台热更新
+    INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'compiled')  # 'compiled' 或 'sklearn'
+    
+    # 微批处理配置（多线程 worker 下合并并发预测请求）
+    BATCHING_ENABLED = os.getenv('BATCHING_ENABLED', 'false').lower() == 'true'
+    BATCH_WINDOW_MS = float(os.getenv('BATCH_WINDOW_MS', 2))  # 凑批等待窗口（毫秒）
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 64))  # 单批最大行数
+    
+    # 启动预热（preload 模式在 master 中执行一次，否则每个 worker 各执行一次）
+    WARMUP_ROUNDS = int(os.getenv('WARMUP_ROUNDS', 3))
+    
+    # 后台预取：定期为所有协议刷新指标并打分，请求直接读取结果
+    PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+    PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', 60))  # 刷新间隔（秒）
+    PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 4))  # 并发拉取指标的线程数
+    PREFETCH_MAX_AGE = float(os.getenv('PREFETCH_MAX_AGE', 180))  # 分数超过该时间未刷新则回退到按需计算（秒）
+    
+    # 流式摄取：通过 websocket 订阅链上事件增量维护特征（仅非 Demo 模式生效）
+    STREAM_INGESTION_ENABLED = os.getenv('STREAM_INGESTION_ENABLED', 'false').lower() == 'true'
+    SOLANA_WS_URL = os.getenv('SOLANA_WS_URL', 'wss://api.mainnet-beta.solana.com')
+    STREAM_BACKFILL_ENABLED = os.getenv('STREAM_BACKFILL_ENABLED', 'true').lower() == 'true'  # 冷启动回填最近 24 小时历史
+    STREAM_BACKFILL_PARALLEL = int(os.getenv('STREAM_BACKFILL_PARALLEL', 16))  # 每个协议同时进行的 getTransaction 数
     
     # API配置
-    API_RATE_LIMIT = 100  # 每分钟请求数
-    CACHE_TIMEOUT = 60  # 缓存过期时间（秒）
+    API_RATE_LIMIT = int(os.getenv('API_RATE_LIMIT', 100))  # 每个客户端每分钟请求数（令牌桶容量，所有 worker 共享）
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_FILE = os.getenv('RATE_LIMIT_FILE', '')  # 共享令牌桶文件，默认 /dev/shm/prophet-sentinel-ratelimit-<命名空间>
+    RATE_LIMIT_NAMESPACE = os.getenv('RATE_LIMIT_NAMESPACE', '')  # 默认文件名的命名空间，默认 master 进程 PID
+    RATE_LIMIT_SLOTS = int(os.getenv('RATE_LIMIT_SLOTS', 65536))  # 可同时跟踪的客户端数（约 24 字节/个）
+    # 前面可信反向代理的层数：N>0 时按 X-Forwarded-For 从右数第 N 个地址（最外层可信代理追加的）识别客户端，
+    # 左侧的地址由客户端自己填写，不可信；0 表示直接使用对端地址
+    RATE_LIMIT_PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS', 0))
+    REQUEST_DEADLINE_MS = float(os.getenv('REQUEST_DEADLINE_MS', 1500))  # 单个请求的时间预算（毫秒），超时返回最近一次分数
+    ASGI_MODEL_WORKERS = int(os.getenv('ASGI_MODEL_WORKERS', 4))  # ASGI 模式下模型推理线程池大小
+    
+    # 风险推送流（SSE /api/stream/risk）
+    RISK_STREAM_HEARTBEAT = float(os.getenv('RISK_STREAM_HEARTBEAT', 15))  # 空闲连接心跳间隔（秒）
+    RISK_STREAM_HISTORY = int(os.getenv('RISK_STREAM_HISTORY', 1024))  # 可补发的事件数，也是慢连接允许的最大落后量
+    RISK_STREAM_MAX_SUBSCRIBERS = int(os.getenv('RISK_STREAM_MAX_SUBSCRIBERS', 5000))  # 每个进程的订阅连接上限
+    # WSGI 模式下每个推送连接占住一个处理线程：每个进程最多允许的推送连接数，应小于 gthread 线程数，
+    # 其余线程留给普通请求；同步 worker（单线程）中不提供推送。ASGI 模式不受此限制
+    RISK_STREAM_WSGI_SLOTS = int(os.getenv('RISK_STREAM_WSGI_SLOTS', 4))
+    CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 60))  # 缓存过期时间（秒）
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1024))  # 按 ETag 缓存的已编码风险响应数
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 1024))  # 预测缓存最大条目数，0 表示禁用
+    PREDICTION_CACHE_PRECISION = int(os.getenv('PREDICTION_CACHE_PRECISION', 4))  # 缓存键特征量化有效数字
+    BATCH_MAX_PROTOCOLS = int(os.getenv('BATCH_MAX_PROTOCOLS', 100))  # 批量预测单次上限
     
     # 风险阈值
     RISK_THRESHOLD_LOW = 30
@@ -2,8 +2,10 @@
 Gunicorn 生产环境配置
 Prophet Sentinel API Server Configuration
 """
+import gc
 import multiprocessing
 import os
+import time
 
 # ==================== Server Socket ====================
 bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
@@ -12,7 +14,9 @@ backlog = 2048
 # ==================== Worker Processes ====================
 # 推荐的 workers 数量: (2 x CPU核心数) + 1
 workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
-worker_class = 'sync'  # 可选: 'sync', 'gevent', 'eventlet'
+# 默认 sync。需要风险推送（SSE）时设 GUNICORN_WORKER_CLASS=gthread 并配合 GUNICORN_THREADS：
+# 推送长连接只占一个线程，不会占满整个 worker，也不受 timeout 影响（sync worker 中推送返回 503，客户端改为轮询）
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')  # 可选: 'sync', 'gthread', 'gevent', 'eventlet'；ASGI 模式用 -k uvicorn.workers.UvicornWorker asgi:application
 worker_connections = 1000
 max_requests = 1000  # 防止内存泄漏，每处理1000个请求后重启worker
 max_requests_jitter = 50  # 添加随机抖动，避免所有worker同时重启
@@ -20,8 +24,14 @@ timeout = 30  # 请求超时时间（秒）
 keepalive = 5  # Keep-Alive连接时间（秒）
 
 # ==================== Threading ====================
+# 每个 worker 的线程数（gthread 生效）；其中最多 RISK_STREAM_WSGI_SLOTS 个线程用于推送连接
 threads = int(os.getenv('GUNICORN_THREADS', 1))
 
+# ==================== Preload ====================
+# preload 模式: master 加载模型并预热，fork 出的 worker 以写时复制共享内存页，
+# worker 启动时不再各自加载模型。注意 preload 模式下 reload 不会重新加载应用代码。
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
 # ==================== Server Mechanics ====================
 daemon = False  # 不作为守护进程运行（systemd会管理）
 pidfile = None  # systemd不需要pidfile
@@ -43,6 +53,9 @@ proc_name = 'prophet-sentinel-api'
 
 # ==================== Server Hooks ====================
 
+_started_at = time.monotonic()
+
+
 def on_starting(server):
     """服务器启动时调用"""
     server.log.info("🚀 Prophet Sentinel API 服务器启动中...")
@@ -54,7 +67,15 @@ def on_reload(server):
 
 
 def when_ready(server):
-    """服务器准备就绪时调用"""
+    """服务器准备就绪时调用（fork worker 之前）"""
+    if server.cfg.preload_app:
+        from app import warmup_services
+        # 只加载并预热模型；后台线程在 worker 中启动（post_fork → reinit_after_fork）
+        warmup_services(start_background=False)
+        # 把预热后的对象移出 GC 追踪，避免 worker 中的 GC 触碰这些页面引发写时复制
+        gc.freeze()
+        server.log.info("📦 preload 模式: 模型已在 master 中加载并预热")
+    
     server.log.info(f"✅ Prophet Sentinel API 已就绪，监听 {bind}")
 
 
@@ -65,12 +86,29 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     """Fork worker进程之后调用"""
+    from config import Config
+    if server.cfg.threads > 1 and Config.RISK_STREAM_WSGI_SLOTS >= server.cfg.threads:
+        server.log.warning(
+            f"⚠️ RISK_STREAM_WSGI_SLOTS={Config.RISK_STREAM_WSGI_SLOTS} 不小于线程数 {server.cfg.threads}，"
+            f"推送连接可能占满全部线程"
+        )
+    if server.cfg.preload_app:
+        # 重建继承自 master 的锁和连接，并在 worker 中启动后台任务
+        from app import reinit_after_fork
+        reinit_after_fork()
     server.log.info(f"👷 Worker {worker.pid} 已生成")
 
 
 def post_worker_init(worker):
     """Worker初始化完成后调用"""
-    worker.log.info(f"⚙️  Worker {worker.pid} 初始化完成")
+    if not worker.cfg.preload_app:
+        # 非 preload 模式: 每个 worker 自己加载模型，在接收请求前预热
+        from app import warmup_services
+        warmup_services()
+    worker.log.info(
+        f"⚙️  Worker {worker.pid} 初始化完成 "
+        f"(距启动 {time.monotonic() - _started_at:.2f}s)"
+    )
 
 
 def worker_int(worker):
@@ -115,6 +153,15 @@ def nworkers_changed(server, new_value, old_value):
 
 def on_exit(server):
     """服务器退出时调用"""
+    from config import Config
+    if not Config.RATE_LIMIT_FILE:
+        # 默认限流文件以 master PID 命名，master 退出后不再有人使用
+        from utils.rate_limit import default_rate_limit_path
+        path = default_rate_limit_path(Config.RATE_LIMIT_NAMESPACE or str(os.getpid()))
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
     server.log.info("👋 Prophet Sentinel API 服务器关闭")
 
 # ==================== SSL 配置 ====================
@@ -1,7 +1,21 @@
 """
 Machine Learning Models Package
 """
-from .predict import RiskPredictor
+from .artifact import load_forest_artifact, save_forest_artifact
+from .batcher import MicroBatcher
+from .cache import PredictionCache
+from .forest_engine import CompiledForest
+from .predict import LoadedModel, RiskPredictor
+from .reloader import ModelReloader
 
-__all__ = ['RiskPredictor']
+__all__ = [
+    'CompiledForest',
+    'LoadedModel',
+    'MicroBatcher',
+    'ModelReloader',
+    'PredictionCache',
+    'RiskPredictor',
+    'load_forest_artifact',
+    'save_forest_artifact',
+]
 
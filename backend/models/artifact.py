@@ -0,0 +1,133 @@
+"""
+可内存映射的模型文件格式
+
+把 CompiledForest 的扁平数组写入单个文件，worker 以只读 mmap 打开，
+数组直接指向映射页面而不复制。所有 gunicorn worker 映射同一个文件时，
+操作系统页缓存中只有一份模型数据；加载也不需要 unpickle，更不需要导入
+sklearn。
+
+文件布局（小端）:
+    8 字节   魔数 b'PSFOREST'
+    4 字节   格式版本 (uint32)
+    4 字节   头部 JSON 长度 (uint32)
+    N 字节   头部 JSON: 标量参数 + 每个数组的 dtype/shape/offset
+    ...      按 64 字节对齐的数组数据
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, UTC
+
+import numpy as np
+
+from .forest_engine import CompiledForest
+
+MAGIC = b'PSFOREST'
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.forest'
+
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 64
+_ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def save_forest_artifact(forest: CompiledForest, path: str) -> dict:
+    """
+    保存为 mmap 格式
+
+    先写临时文件再原子替换，正在映射旧文件的 worker 不受影响。
+
+    Returns:
+        写入的头部信息（含 model_version）
+    """
+    arrays = {name: np.ascontiguousarray(getattr(forest, name)) for name in _ARRAY_FIELDS}
+
+    digest = hashlib.sha256()
+    for name in _ARRAY_FIELDS:
+        digest.update(arrays[name].tobytes())
+
+    header = {
+        'model_version': digest.hexdigest()[:16],
+        'created_at': datetime.now(UTC).isoformat(),
+        'max_depth': forest.max_depth,
+        'n_features': forest.n_features,
+        'arrays': {},
+    }
+
+    # 头部长度影响数据偏移，先用占位偏移估算长度，再按最终长度计算
+    def layout(header_len):
+        offset = _align(_PREAMBLE.size + header_len)
+        for name in _ARRAY_FIELDS:
+            arr = arrays[name]
+            header['arrays'][name] = {
+                'dtype': arr.dtype.str,
+                'shape': list(arr.shape),
+                'offset': offset,
+            }
+            offset = _align(offset + arr.nbytes)
+        return json.dumps(header).encode('utf-8')
+
+    header_bytes = layout(0)
+    while True:
+        candidate = layout(len(header_bytes))
+        if len(candidate) == len(header_bytes):
+            header_bytes = candidate
+            break
+        header_bytes = candidate
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name in _ARRAY_FIELDS:
+            meta = header['arrays'][name]
+            f.seek(meta['offset'])
+            f.write(arrays[name].tobytes())
+    os.replace(tmp_path, path)
+
+    return header
+
+
+def read_artifact_header(path: str) -> dict:
+    """只读取文件头（不映射数组），用于校验和获取模型版本"""
+    with open(path, 'rb') as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的模型文件: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的模型文件版本: {version}")
+        return json.loads(f.read(header_len).decode('utf-8'))
+
+
+def load_forest_artifact(path: str) -> CompiledForest:
+    """
+    以只读 mmap 方式加载
+
+    返回的 CompiledForest 中所有数组都是映射页面上的只读视图。
+    """
+    header = read_artifact_header(path)
+
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    for name in _ARRAY_FIELDS:
+        meta = header['arrays'][name]
+        dtype = np.dtype(meta['dtype'])
+        shape = tuple(meta['shape'])
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=meta['offset']).reshape(shape)
+
+    return CompiledForest(
+        max_depth=header['max_depth'],
+        n_features=header['n_features'],
+        model_version=header['model_version'],
+        **arrays
+    )
@@ -0,0 +1,216 @@
+"""
+预测请求微批处理模块
+
+在多线程 / 异步 worker 下，把短时间窗口内到达的并发预测请求合并成一个
+特征矩阵，只调用一次 RiskPredictor.predict_batch，再把每一行结果交还给
+对应的调用方。窗口长度和最大批大小可调，用于在吞吐量和尾延迟之间取舍。
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List
+import logging
+
+import numpy as np
+
+logger = logging.getLogger('prophet-sentinel')
+
+# 统计排队等待时间时保留的最近样本数
+_WAIT_SAMPLE_SIZE = 1024
+
+
+class _PendingRequest:
+    """队列中等待合并的单个预测请求"""
+
+    __slots__ = ('metrics', 'future', 'enqueued_at')
+
+    def __init__(self, metrics: Dict):
+        self.metrics = metrics
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """RiskPredictor 前的请求合并层，接口与 RiskPredictor 的 predict/predict_batch 一致"""
+
+    def __init__(self, predictor, window_ms: float = 2.0, max_batch_size: int = 64):
+        """
+        Args:
+            predictor: 被包装的 RiskPredictor
+            window_ms: 第一个请求到达后最多等待多少毫秒来凑批
+            max_batch_size: 单批最大行数，达到后立即发送
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size 必须 >= 1")
+
+        self.predictor = predictor
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue: queue.Queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        # 同时保护 _closed 与入队：关闭后不会再有请求排到停止哨兵之后
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch = 0
+        self._size_histogram: Dict[str, int] = {}
+        self._waits = deque(maxlen=_WAIT_SAMPLE_SIZE)
+
+    # ==================== 公共接口 ====================
+
+    def predict(self, metrics: Dict, timeout: float = None) -> Dict:
+        """提交单个预测请求，阻塞直到所在批次完成；关闭之后直接调用预测器"""
+        request = _PendingRequest(metrics)
+        with self._start_lock:
+            if self._closed:
+                request = None
+            else:
+                self._ensure_worker()
+                self._queue.put(request)
+        if request is None:
+            return self.predictor.predict(metrics)
+        try:
+            return request.future.result(timeout=timeout)
+        except TimeoutError:
+            # 还没进入批次的请求不再计算；已在计算中的取消失败，结果直接丢弃
+            request.future.cancel()
+            raise
+
+    def predict_batch(self, metrics_list: List[Dict]) -> List[Dict]:
+        """调用方已经成批的请求直接透传给预测器"""
+        return self.predictor.predict_batch(metrics_list)
+
+    def reset_after_fork(self):
+        """fork 之后换新的队列和锁；后台线程在首次使用时按新 pid 重建"""
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def close(self):
+        """停止后台线程，哨兵之前排队的请求仍会被处理，线程退出后遗留的请求以异常结束"""
+        with self._start_lock:
+            self._closed = True
+            worker = self._worker
+            if worker is not None and worker.is_alive():
+                self._queue.put(None)
+        if worker is not None:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                return  # 线程还在处理，剩余请求仍由它完成
+        self._fail_pending()
+
+    def stats(self) -> Dict:
+        """导出批大小和排队等待时间指标"""
+        with self._stats_lock:
+            waits_ms = np.asarray(self._waits) * 1000.0
+            return {
+                'window_ms': self.window * 1000.0,
+                'max_batch_size': self.max_batch_size,
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': round(self._rows / self._batches, 2) if self._batches else 0.0,
+                'max_observed_batch_size': self._max_batch,
+                'batch_size_histogram': dict(self._size_histogram),
+                'queue_wait_ms': {
+                    'p50': round(float(np.percentile(waits_ms, 50)), 3) if len(waits_ms) else 0.0,
+                    'p99': round(float(np.percentile(waits_ms, 99)), 3) if len(waits_ms) else 0.0,
+                    'max': round(float(waits_ms.max()), 3) if len(waits_ms) else 0.0,
+                },
+                'queue_depth': self._queue.qsize(),
+            }
+
+    # ==================== 内部实现 ====================
+
+    def _ensure_worker(self):
+        """惰性启动后台线程（调用方持有 _start_lock）；fork 之后线程不会被继承，需要在子进程中重新启动"""
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+
+        if self._worker_pid != pid:
+            # 父进程的队列和锁状态在 fork 后不可靠，重新创建
+            self._queue = queue.Queue()
+            self._stats_lock = threading.Lock()
+        self._worker_pid = pid
+        self._worker = threading.Thread(
+            target=self._run, name='prediction-batcher', daemon=True
+        )
+        self._worker.start()
+
+    def _fail_pending(self):
+        """后台线程已退出：队列中没人处理的请求直接以异常结束，避免调用方一直阻塞"""
+        error = RuntimeError("MicroBatcher 已关闭")
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and not request.future.done():
+                request.future.set_exception(error)
+
+    def _run(self):
+        """后台循环：取到第一个请求后在窗口内继续收集，满批或超时即发送"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            if not first.future.set_running_or_notify_cancel():
+                continue  # 调用方已超时放弃
+
+            batch = [first]
+            deadline = first.enqueued_at + self.window
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                if request.future.set_running_or_notify_cancel():
+                    batch.append(request)
+
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch: List[_PendingRequest]):
+        """对一批请求执行一次模型调用，并把结果分发给各自的 Future"""
+        dispatched_at = time.monotonic()
+        self._record(batch, dispatched_at)
+
+        try:
+            results = self.predictor.predict_batch([r.metrics for r in batch])
+        except Exception as e:
+            logger.error(f"❌ 微批预测失败: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+    def _record(self, batch: List[_PendingRequest], dispatched_at: float):
+        size = len(batch)
+        # 按 2 的幂分桶: 1, 2, 4, 8, ...
+        bucket = str(1 << (size - 1).bit_length())
+
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += size
+            self._max_batch = max(self._max_batch, size)
+            self._size_histogram[bucket] = self._size_histogram.get(bucket, 0) + 1
+            self._waits.extend(dispatched_at - r.enqueued_at for r in batch)
@@ -0,0 +1,100 @@
+"""
+预测结果缓存模块
+
+有界的 TTL + LRU 缓存，键为 (协议, 量化后的特征向量)。演示指标每小时才
+变化一次，同一协议在同一时间段内的重复请求可以直接复用模型输出。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+
+def quantize_features(features: Sequence[float], significant_digits: int = 4) -> Tuple[float, ...]:
+    """
+    按有效数字量化特征向量，作为缓存键的一部分
+
+    volume_24h 是千万量级，holder_concentration 是 0-1，按有效数字而非
+    固定小数位量化，才能对所有特征都保持相近的相对精度。
+    """
+    return tuple(float(f"{float(x):.{significant_digits}g}") for x in features)
+
+
+class PredictionCache:
+    """线程安全的 TTL + LRU 缓存"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        """
+        Args:
+            max_size: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活时间（秒）
+        """
+        if max_size < 1:
+            raise ValueError("max_size 必须 >= 1")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """命中且未过期时返回缓存值，并将条目移到最近使用端"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """写入条目，超出容量时淘汰最久未使用的条目"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def reset_after_fork(self):
+        """fork 之后换新的锁：fork 时其它线程可能正持有旧锁；保留已缓存的条目"""
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """清空缓存（例如模型更新后），计数器保留"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        """导出命中、未命中、淘汰计数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,136 @@
+"""
+列式训练数据存储
+
+每个分片（shard）是一个目录，每列一个 .npy 文件；数据集根目录下的
+manifest.json 记录列、dtype、每个分片的行数和各类别样本数。读取时按
+分片以 mmap 方式打开，只有被访问的列和分片会进入内存，适合比内存更大的
+数据集。
+
+目录结构:
+    dataset/
+        manifest.json
+        shard-00000/volume_24h.npy
+        shard-00000/liquidity_change.npy
+        ...
+"""
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def write_shards(chunks: Iterable[pd.DataFrame], out_dir: str, label_column: str = None) -> dict:
+    """
+    把 DataFrame 块依次写成分片，最后写 manifest
+
+    Args:
+        chunks: DataFrame 迭代器（例如 iter_synthetic_training_data 的输出）
+        out_dir: 数据集目录
+        label_column: 标签列名，提供时在 manifest 中记录各类别样本数
+
+    Returns:
+        manifest 字典
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'columns': None,
+        'dtypes': None,
+        'label_column': label_column,
+        'shards': [],
+        'total_rows': 0,
+    }
+
+    for i, chunk in enumerate(chunks):
+        if manifest['columns'] is None:
+            manifest['columns'] = list(chunk.columns)
+            manifest['dtypes'] = {c: chunk[c].dtype.str for c in chunk.columns}
+        elif list(chunk.columns) != manifest['columns']:
+            raise ValueError(f"第 {i} 个分片的列与之前不一致")
+
+        name = f'shard-{i:05d}'
+        shard_dir = os.path.join(out_dir, name)
+        os.makedirs(shard_dir, exist_ok=True)
+        for column in manifest['columns']:
+            np.save(os.path.join(shard_dir, f'{column}.npy'), chunk[column].to_numpy())
+
+        shard = {'name': name, 'rows': len(chunk)}
+        if label_column is not None:
+            labels, counts = np.unique(chunk[label_column].to_numpy(), return_counts=True)
+            shard['label_counts'] = {str(k): int(v) for k, v in zip(labels, counts)}
+        manifest['shards'].append(shard)
+        manifest['total_rows'] += len(chunk)
+
+    # manifest 最后写入，中途失败的目录不会被当作完整数据集读取
+    tmp_path = os.path.join(out_dir, f'{MANIFEST_NAME}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+
+    return manifest
+
+
+class ShardedDataset:
+    """按 manifest 读取的分片数据集"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"不支持的 manifest 版本: {self.manifest.get('version')}")
+
+    @property
+    def columns(self) -> List[str]:
+        return self.manifest['columns']
+
+    @property
+    def n_shards(self) -> int:
+        return len(self.manifest['shards'])
+
+    def __len__(self) -> int:
+        return self.manifest['total_rows']
+
+    def label_counts(self) -> Dict[int, int]:
+        """全数据集各类别样本数（来自 manifest，无需读取数据）"""
+        totals: Dict[int, int] = {}
+        for shard in self.manifest['shards']:
+            for label, count in shard.get('label_counts', {}).items():
+                totals[int(label)] = totals.get(int(label), 0) + count
+        return totals
+
+    def read_shard(self, index: int, columns: Optional[List[str]] = None, mmap: bool = True) -> Dict[str, np.ndarray]:
+        """读取单个分片的指定列；mmap=True 时返回只读映射数组"""
+        shard_dir = os.path.join(self.path, self.manifest['shards'][index]['name'])
+        return {
+            column: np.load(os.path.join(shard_dir, f'{column}.npy'), mmap_mode='r' if mmap else None)
+            for column in (columns or self.columns)
+        }
+
+    def iter_shards(self, columns: Optional[List[str]] = None, mmap: bool = True,
+                    indices: Optional[Iterable[int]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """依次产出每个分片的列字典，任意时刻只持有一个分片"""
+        for index in (range(self.n_shards) if indices is None else indices):
+            yield self.read_shard(index, columns, mmap)
+
+    def iter_xy(self, feature_columns: List[str], label_column: str,
+                indices: Optional[Iterable[int]] = None) -> Iterator[tuple]:
+        """依次产出每个分片的 (X, y)，X 为 (rows, n_features) float64 矩阵"""
+        for shard in self.iter_shards(feature_columns + [label_column], indices=indices):
+            X = np.column_stack([np.asarray(shard[c], dtype=np.float64) for c in feature_columns])
+            yield X, np.asarray(shard[label_column])
+
+    def to_dataframe(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """把全部分片读入一个 DataFrame（数据集能放进内存时使用）"""
+        columns = columns or self.columns
+        parts = {c: [] for c in columns}
+        for shard in self.iter_shards(columns, mmap=False):
+            for c in columns:
+                parts[c].append(shard[c])
+        return pd.DataFrame({c: np.concatenate(parts[c]) for c in columns}, copy=False)
@@ -0,0 +1,125 @@
+"""
+编译型随机森林推理引擎
+
+在模型加载时把 sklearn RandomForestClassifier 的所有决策树展平成连续的
+NumPy 数组（feature / threshold / left / right / value），推理时对所有树
+同时做向量化遍历，绕开 predict_proba 的输入校验和 joblib 调度开销。
+
+单行推理的延迟主要由 sklearn 的固定调用成本决定，这里每次推理只有
+max_depth 轮数组索引操作。
+"""
+import numpy as np
+
+
+class CompiledForest:
+    """展平后的随机森林，predict_proba 结果与 sklearn 一致"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features,
+                 model_version=None):
+        """
+        Args:
+            feature: 每个节点的分裂特征索引 (int32)，叶子节点为0
+            threshold: 每个节点的分裂阈值 (float64)
+            left: 左子节点的全局索引 (int32)，叶子节点指向自身
+            right: 右子节点的全局索引 (int32)，叶子节点指向自身
+            value: 每个节点归一化后的类别概率 (n_nodes, n_classes)
+            roots: 每棵树根节点的全局索引 (int32)
+            max_depth: 所有树中的最大深度
+            n_features: 输入特征数
+            model_version: 模型版本标识（从 mmap 文件加载时由文件头提供）
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.model_version = model_version
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'CompiledForest':
+        """
+        从训练好的 RandomForestClassifier 构建
+
+        叶子节点的左右子节点指向自身，这样遍历可以固定执行 max_depth 轮，
+        不需要逐行判断是否已到达叶子。
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append((np.where(is_leaf, node_ids, tree.children_left) + offset).astype(np.int32))
+            rights.append((np.where(is_leaf, node_ids, tree.children_right) + offset).astype(np.int32))
+
+            # 与 DecisionTreeClassifier.predict_proba 相同的归一化方式
+            proba = tree.value[:, 0, :].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features)),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds)),
+            left=np.ascontiguousarray(np.concatenate(lefts)),
+            right=np.ascontiguousarray(np.concatenate(rights)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=model.n_features_in_
+        )
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        计算类别概率
+
+        Args:
+            X: (N, n_features) 特征矩阵
+
+        Returns:
+            (N, n_classes) 概率矩阵
+        """
+        # sklearn 的树在 float32 上比较阈值，这里保持一致以得到相同的分支
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(
+                f"特征数不匹配: 期望 {self.n_features}, 实际 {X.shape[1]}"
+            )
+        X = X.astype(np.float64)
+
+        n_rows = X.shape[0]
+        # nodes[t, i]: 第 t 棵树上第 i 行当前所在的节点
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        rows = np.arange(n_rows)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # 沿树的维度顺序累加后再平均，与 sklearn 的累加顺序一致
+        proba = self.value[nodes].sum(axis=0)
+        proba /= self.n_trees
+        return proba
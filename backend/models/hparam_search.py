@@ -0,0 +1,241 @@
+"""
+随机森林超参数搜索
+
+在进程池中并行评估候选参数。特征矩阵和标签只写入一次共享内存，
+分层交叉验证的折叠索引也只预先计算一次，都在 worker 初始化时传入；
+每个任务只传递参数字典，不再为每个任务重新 pickle 数据。
+
+每个候选记录交叉验证准确率、单行推理延迟（CompiledForest）和模型大小，
+最终按 准确率/延迟 的帕累托前沿挑选模型，而不只看准确率。
+
+用法:
+    python backend/models/hparam_search.py --samples 20000 --workers 4 --output search_results.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [4, 6, 10, None],
+    'min_samples_split': [2, 5, 10],
+}
+
+# worker 进程内的共享状态（由 _init_worker 设置）
+_worker_state: Dict = {}
+
+
+def expand_grid(param_grid: Dict[str, list]) -> List[Dict]:
+    """把参数网格展开成候选参数字典列表"""
+    names = sorted(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+
+
+def precompute_folds(y: np.ndarray, n_splits: int = 5, seed: int = 42) -> List[tuple]:
+    """预先计算分层 K 折的 (train_idx, test_idx)，所有候选共用"""
+    from sklearn.model_selection import StratifiedKFold
+
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    return [
+        (train.astype(np.int32), test.astype(np.int32))
+        for train, test in skf.split(np.zeros(len(y)), y)
+    ]
+
+
+class SharedArray:
+    """放在 multiprocessing.shared_memory 中的 NumPy 数组"""
+
+    def __init__(self, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)[...] = array
+
+    @property
+    def spec(self) -> tuple:
+        """worker 重新挂载所需的 (名称, 形状, dtype)"""
+        return (self._shm.name, self.shape, self.dtype)
+
+    @staticmethod
+    def attach(spec: tuple):
+        """在 worker 中按 spec 挂载，返回 (SharedMemory, 只读数组视图)"""
+        name, shape, dtype = spec
+        shm = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array.flags.writeable = False
+        return shm, array
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _init_worker(x_spec, y_spec, folds, latency_iters):
+    """进程池初始化：挂载共享内存，缓存折叠索引"""
+    # 保留 SharedMemory 对象的引用，防止视图底层的映射被回收
+    x_shm, X = SharedArray.attach(x_spec)
+    y_shm, y = SharedArray.attach(y_spec)
+    _worker_state.update(
+        X=X, y=y, folds=folds, latency_iters=latency_iters, handles=(x_shm, y_shm)
+    )
+
+
+def _measure_latency(compiled, X: np.ndarray, iters: int) -> Dict[str, float]:
+    """单行推理延迟（微秒）"""
+    rows = X[np.arange(iters) % len(X)]
+    for row in rows[:20]:
+        compiled.predict_proba(row)
+
+    samples = np.empty(iters)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        compiled.predict_proba(row)
+        samples[i] = time.perf_counter() - start
+
+    return {
+        'latency_p50_us': float(np.percentile(samples, 50) * 1e6),
+        'latency_p99_us': float(np.percentile(samples, 99) * 1e6),
+    }
+
+
+def evaluate_candidate(params: Dict) -> Dict:
+    """在 worker 中评估一个候选参数：交叉验证准确率 + 推理延迟 + 模型大小"""
+    from sklearn.ensemble import RandomForestClassifier
+    from models.forest_engine import CompiledForest
+
+    X, y, folds = _worker_state['X'], _worker_state['y'], _worker_state['folds']
+
+    scores = []
+    fit_time = 0.0
+    model = None
+    for train_idx, test_idx in folds:
+        model = RandomForestClassifier(random_state=42, class_weight='balanced', **params)
+        start = time.perf_counter()
+        model.fit(X[train_idx], y[train_idx])
+        fit_time += time.perf_counter() - start
+        scores.append(float(np.mean(model.predict(X[test_idx]) == y[test_idx])))
+
+    # 用最后一折的模型衡量推理延迟和大小（同一参数下各折的结构规模相近）
+    compiled = CompiledForest.from_sklearn(model)
+    model_bytes = sum(
+        getattr(compiled, name).nbytes for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+    )
+
+    result = {
+        'params': params,
+        'accuracy_mean': float(np.mean(scores)),
+        'accuracy_std': float(np.std(scores)),
+        'fit_time_s': fit_time / len(folds),
+        'n_nodes': compiled.n_nodes,
+        'model_bytes': int(model_bytes),
+    }
+    result.update(_measure_latency(compiled, X[folds[-1][1]], _worker_state['latency_iters']))
+    return result
+
+
+def pareto_front(results: List[Dict], accuracy_key='accuracy_mean', latency_key='latency_p50_us') -> List[Dict]:
+    """
+    准确率越高越好、延迟越低越好的帕累托前沿
+
+    按延迟升序扫描，只保留准确率严格高于之前所有候选的结果。
+    """
+    front = []
+    best_accuracy = -np.inf
+    for result in sorted(results, key=lambda r: (r[latency_key], -r[accuracy_key])):
+        if result[accuracy_key] > best_accuracy:
+            front.append(result)
+            best_accuracy = result[accuracy_key]
+    return front
+
+
+def run_search(X: np.ndarray, y: np.ndarray, param_grid: Optional[Dict[str, list]] = None,
+               n_splits: int = 5, max_workers: Optional[int] = None, latency_iters: int = 500) -> List[Dict]:
+    """
+    并行搜索超参数
+
+    Args:
+        X: (N, n_features) 特征矩阵
+        y: (N,) 标签
+        param_grid: 参数网格，默认 DEFAULT_PARAM_GRID
+        n_splits: 交叉验证折数
+        max_workers: 进程数，默认 CPU 数
+        latency_iters: 每个候选测量单行延迟的次数
+
+    Returns:
+        每个候选的结果，按准确率降序；帕累托前沿上的结果带 'pareto': True
+    """
+    candidates = expand_grid(param_grid or DEFAULT_PARAM_GRID)
+    folds = precompute_folds(y, n_splits)
+
+    shared_X = SharedArray(np.asarray(X, dtype=np.float64))
+    shared_y = SharedArray(np.asarray(y))
+    logger.info(
+        f"🔎 超参数搜索: {len(candidates)} 个候选 × {n_splits} 折, "
+        f"共享内存 {(shared_X._shm.size + shared_y._shm.size) / 2**20:.1f}MB"
+    )
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(shared_X.spec, shared_y.spec, folds, latency_iters),
+        ) as pool:
+            results = list(pool.map(evaluate_candidate, candidates))
+    finally:
+        shared_X.close()
+        shared_y.close()
+
+    front_ids = {id(r) for r in pareto_front(results)}
+    for result in results:
+        result['pareto'] = id(result) in front_ids
+
+    return sorted(results, key=lambda r: r['accuracy_mean'], reverse=True)
+
+
+def main(argv=None):
+    from models.train_model import FEATURE_COLUMNS, LABEL_COLUMN, generate_synthetic_training_data
+
+    parser = argparse.ArgumentParser(description='随机森林超参数搜索')
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='结果 JSON 输出路径')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    df = generate_synthetic_training_data(n_samples=args.samples)
+    results = run_search(
+        df[FEATURE_COLUMNS].to_numpy(), df[LABEL_COLUMN].to_numpy(),
+        n_splits=args.folds, max_workers=args.workers
+    )
+
+    logger.info(f"{'参数':58s} {'准确率':>8s} {'p50延迟':>10s} {'大小':>10s}")
+    for r in results:
+        marker = ' ★' if r['pareto'] else ''
+        logger.info(
+            f"{json.dumps(r['params']):58s} {r['accuracy_mean']:8.4f} "
+            f"{r['latency_p50_us']:8.1f}µs {r['model_bytes'] / 1024:8.1f}KB{marker}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"💾 搜索结果已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    # 以脚本方式运行时，确保 backend/ 在 sys.path 中
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main()
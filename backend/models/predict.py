@@ -1,41 +1,118 @@
 """
 ML模型推理模块
 """
+import hashlib
 import os
 import pickle
+import threading
 import numpy as np
-from typing import Dict
+from datetime import datetime, UTC
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 import logging
 
+from .artifact import ARTIFACT_SUFFIX, load_forest_artifact
+from .cache import PredictionCache, quantize_features
+from .forest_engine import CompiledForest
+
 logger = logging.getLogger('prophet-sentinel')
 
+# 模型校验/预热用的探针样本（与 train_model.py 中的测试用例一致）
+_PROBE_FEATURES = np.array([
+    [50000000, 0.1, 2, 0.4],
+    [10000000, -0.15, 5, 0.65],
+    [2000000, -0.35, 12, 0.88],
+], dtype=np.float64)
+
+
+class LoadedModel(NamedTuple):
+    """一次加载得到的完整模型状态，整体替换以保证热更新的原子性"""
+    model: Any                          # sklearn 模型（mmap 文件时为 None）
+    compiled: Optional[CompiledForest]  # 编译后的扁平数组森林
+    version: str
+    path: str
+    loaded_at: datetime
+
+
 class RiskPredictor:
     """风险预测器类"""
     
-    def __init__(self, model_path='backend/models/risk_model.pkl', demo_mode=False):
+    ENGINES = ('sklearn', 'compiled')
+    
+    def __init__(self, model_path='backend/models/risk_model.pkl', demo_mode=False, engine='compiled',
+                 cache: PredictionCache = None, cache_precision: int = 4):
         """
         初始化预测器
         
         Args:
             model_path: 模型文件路径
             demo_mode: 演示模式（使用模拟数据）
+            engine: 推理引擎，'sklearn' 使用原生 predict_proba，
+                    'compiled' 使用展平数组的 CompiledForest
+            cache: 预测结果缓存，None 表示不缓存
+            cache_precision: 缓存键中特征量化保留的有效数字位数
+        
+        model_path 以 .forest 结尾时按 mmap 格式只读映射，不再 unpickle，
+        推理固定使用 compiled 引擎。
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"未知推理引擎: {engine}，可选: {self.ENGINES}")
+        
         self.model_path = model_path
         self.demo_mode = demo_mode
-        self.model = None
+        self.engine = engine
+        self.cache = cache
+        self.cache_precision = cache_precision
+        
+        self._active: Optional[LoadedModel] = None
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+        self.reload_failures = 0
         
         if not demo_mode:
             self._load_model()
         else:
             logger.warning("⚠️ 运行在演示模式，使用模拟预测")
     
+    @property
+    def active_model(self) -> Optional[LoadedModel]:
+        """当前生效的模型状态"""
+        return self._active
+    
+    @property
+    def model(self):
+        """当前生效的 sklearn 模型（mmap 加载时为 None）"""
+        active = self._active
+        return active.model if active is not None else None
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        active = self._active
+        return active.version if active is not None else None
+    
+    def reset_after_fork(self):
+        """fork 之后换新的热更新锁和缓存锁：fork 时热更新线程可能正持有旧锁"""
+        self._reload_lock = threading.Lock()
+        if self.cache is not None:
+            self.cache.reset_after_fork()
+    
+    def model_info(self) -> Dict:
+        """当前模型版本与热更新状态"""
+        active = self._active
+        return {
+            'version': active.version if active is not None else None,
+            'path': active.path if active is not None else None,
+            'loaded_at': active.loaded_at.isoformat() if active is not None else None,
+            'engine': 'compiled' if active is not None and active.compiled is not None else 'sklearn',
+            'demo_mode': self.demo_mode,
+            'reloads': self.reloads,
+            'reload_failures': self.reload_failures,
+        }
+    
     def _load_model(self):
         """加载训练好的模型"""
         try:
             if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-                logger.info(f"✅ 模型加载成功: {self.model_path}")
+                self._activate(self._build_model(self.model_path))
             else:
                 logger.warning(f"⚠️ 模型文件不存在: {self.model_path}，切换到演示模式")
                 self.demo_mode = True
@@ -43,7 +120,114 @@ class RiskPredictor:
             logger.error(f"❌ 模型加载失败: {e}")
             self.demo_mode = True
     
-    def predict(self, metrics: Dict) -> Dict:
+    def _build_model(self, path: str) -> LoadedModel:
+        """从文件构建模型状态（不修改当前生效的模型）"""
+        if path.endswith(ARTIFACT_SUFFIX):
+            return self._build_from_artifact(path)
+        
+        with open(path, 'rb') as f:
+            raw = f.read()
+        model = pickle.loads(raw)
+        logger.info(f"✅ 模型加载成功: {path}")
+        
+        return LoadedModel(
+            model=model,
+            compiled=self._compile_model(model),
+            version=hashlib.sha256(raw).hexdigest()[:16],
+            path=path,
+            loaded_at=datetime.now(UTC)
+        )
+    
+    def _build_from_artifact(self, path: str) -> LoadedModel:
+        """只读 mmap 加载扁平数组模型，所有 worker 共享页缓存中的同一份数据（引擎在生效时切换）"""
+        compiled = load_forest_artifact(path)
+        logger.info(
+            f"✅ 模型映射成功: {path} "
+            f"(版本 {compiled.model_version}, {compiled.n_nodes} 个节点)"
+        )
+        return LoadedModel(
+            model=None,
+            compiled=compiled,
+            version=compiled.model_version,
+            path=path,
+            loaded_at=datetime.now(UTC)
+        )
+    
+    def _compile_model(self, model) -> Optional[CompiledForest]:
+        """按配置把模型编译为 CompiledForest，失败时回退到 sklearn 引擎"""
+        if self.engine != 'compiled':
+            return None
+        
+        try:
+            compiled = CompiledForest.from_sklearn(model)
+            logger.info(
+                f"⚡ 推理引擎: compiled ({compiled.n_trees} 棵树, "
+                f"{compiled.n_nodes} 个节点)"
+            )
+            return compiled
+        except Exception as e:
+            logger.warning(f"⚠️ 模型编译失败，使用 sklearn 引擎: {e}")
+            return None
+    
+    @staticmethod
+    def _predict_proba(active: LoadedModel, features: np.ndarray) -> np.ndarray:
+        """使用指定模型状态的推理引擎计算 (N, 2) 概率矩阵"""
+        if active.compiled is not None:
+            return active.compiled.predict_proba(features)
+        return active.model.predict_proba(features)
+    
+    def reload_model(self, path: str = None, warmup_rounds: int = 3) -> bool:
+        """
+        热更新模型
+        
+        在调用线程中加载、校验并预热新模型，全部通过后用一次引用赋值替换
+        当前模型。正在进行的预测持有旧模型的引用，不会被阻塞或看到半更新状态。
+        
+        Args:
+            path: 新模型文件路径，默认重新加载当前路径
+            warmup_rounds: 替换前的预热轮数
+        
+        Returns:
+            是否替换成功；失败时保留旧模型
+        """
+        path = path or self.model_path
+        
+        with self._reload_lock:
+            try:
+                candidate = self._build_model(path)
+                self._validate_model(candidate, warmup_rounds)
+            except Exception as e:
+                self.reload_failures += 1
+                logger.error(f"❌ 模型热更新失败，继续使用旧模型: {e}")
+                return False
+            
+            previous = self.model_version
+            self._activate(candidate)
+            self.reloads += 1
+        
+        logger.info(f"🔄 模型已热更新: {previous} → {candidate.version}")
+        return True
+    
+    def _activate(self, candidate: LoadedModel):
+        """候选模型构建并校验通过后，一次性替换当前模型及引擎、路径等相关状态"""
+        if candidate.model is None and self.engine != 'compiled':
+            logger.warning("⚠️ mmap 模型文件只支持 compiled 引擎，已自动切换")
+            self.engine = 'compiled'
+        self._active = candidate
+        self.model_path = candidate.path
+        self.demo_mode = False
+    
+    def _validate_model(self, candidate: LoadedModel, warmup_rounds: int):
+        """用探针样本校验输出形状与概率合法性，同时完成预热"""
+        for _ in range(max(1, warmup_rounds)):
+            proba = self._predict_proba(candidate, _PROBE_FEATURES)
+        
+        if proba.shape != (len(_PROBE_FEATURES), 2):
+            raise ValueError(f"模型输出形状异常: {proba.shape}")
+        if not np.all(np.isfinite(proba)) or not np.allclose(proba.sum(axis=1), 1.0):
+            raise ValueError("模型输出不是合法的概率分布")
+    
+    def predict(self, metrics: Dict, timeout: float = None) -> Dict:
         """
         预测风险分数
         
@@ -55,6 +239,8 @@ class RiskPredictor:
                     'whale_transfers': int,
                     'holder_concentration': float
                 }
+            timeout: 剩余时间预算（秒），与 MicroBatcher.predict 接口一致；
+                     本地推理不可中断，只在开始前检查预算是否已用完
         
         Returns:
             预测结果字典
@@ -63,28 +249,87 @@ class RiskPredictor:
                     'confidence': float (0-1)
                 }
         """
-        if self.demo_mode:
-            return self._demo_predict(metrics)
+        if timeout is not None and timeout <= 0:
+            raise TimeoutError("预测开始前截止时间已过")
+        return self.predict_batch([metrics])[0]
+    
+    def predict_batch(self, metrics_list: List[Dict]) -> List[Dict]:
+        """
+        批量预测风险分数
+        
+        将 N 个协议的指标组装成 (N, 4) 特征矩阵，只调用一次 predict_proba，
+        避免逐条预测带来的 N 次 sklearn 调度开销。
+        
+        Args:
+            metrics_list: 协议指标字典列表（格式同 predict）
+        
+        Returns:
+            预测结果字典列表，顺序与输入一致
+        """
+        if not metrics_list:
+            return []
+        
+        # 只读取一次当前模型，整批请求使用同一个版本
+        active = self._active
+        
+        if self.cache is None:
+            return self._predict_uncached(metrics_list, active)[0]
+        
+        # 先查缓存，只把未命中的行送入模型
+        keys = [self._cache_key(metrics, active) for metrics in metrics_list]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        
+        if missing:
+            fresh, from_model = self._predict_uncached([metrics_list[i] for i in missing], active)
+            for i, result in zip(missing, fresh):
+                # 规则降级的结果不缓存：否则模型恢复后同一版本的键仍一直命中降级分数
+                if from_model:
+                    self.cache.set(keys[i], result)
+                results[i] = result
+        
+        # 返回副本，避免调用方修改缓存中的字典
+        return [dict(result) for result in results]
+    
+    def _predict_uncached(self, metrics_list: List[Dict], active: Optional[LoadedModel]) -> Tuple[List[Dict], bool]:
+        """不经过缓存的批量预测，返回 (结果, 是否来自模型)；演示模式和预测失败时用规则算法"""
+        if self.demo_mode or active is None:
+            return [self._demo_predict(metrics) for metrics in metrics_list], False
         
         try:
-            # 准备特征向量
-            features = self._prepare_features(metrics)
+            # 准备特征矩阵
+            features = self._prepare_feature_matrix(metrics_list)
             
-            # 模型预测
-            proba = self.model.predict_proba([features])[0]
+            # 模型预测（单次调用）
+            proba = self._predict_proba(active, features)
             
-            # 转换为0-100分数
-            risk_score = int(proba[1] * 100)
-            confidence = float(np.max(proba))
-            
-            return {
-                'risk_score': risk_score,
-                'confidence': confidence
-            }
+            return self._scores_from_proba(proba), True
             
         except Exception as e:
-            logger.error(f"❌ 预测失败: {e}")
-            return self._demo_predict(metrics)
+            logger.error(f"❌ 批量预测失败: {e}")
+            return [self._demo_predict(metrics) for metrics in metrics_list], False
+    
+    def _cache_key(self, metrics: Dict, active: Optional[LoadedModel]) -> tuple:
+        """缓存键: (模型版本, 协议名, 量化后的特征向量)，模型热更新后旧条目自然失效"""
+        return (
+            active.version if active is not None else None,
+            metrics.get('protocol'),
+            quantize_features(self._prepare_features(metrics), self.cache_precision)
+        )
+    
+    @staticmethod
+    def _scores_from_proba(proba: np.ndarray) -> List[Dict]:
+        """将 (N, 2) 概率矩阵转换为0-100风险分数和置信度"""
+        risk_scores = (proba[:, 1] * 100).astype(int)
+        confidences = proba.max(axis=1)
+        
+        return [
+            {
+                'risk_score': int(risk_score),
+                'confidence': float(confidence)
+            }
+            for risk_score, confidence in zip(risk_scores, confidences)
+        ]
     
     def _prepare_features(self, metrics: Dict) -> np.array:
         """
@@ -102,6 +347,13 @@ class RiskPredictor:
         
         return np.array(features)
     
+    def _prepare_feature_matrix(self, metrics_list: List[Dict]) -> np.ndarray:
+        """准备 (N, 4) 特征矩阵，列顺序与 _prepare_features 一致"""
+        return np.array(
+            [self._prepare_features(metrics) for metrics in metrics_list],
+            dtype=np.float64
+        )
+    
     def _demo_predict(self, metrics: Dict) -> Dict:
         """
         演示模式预测（基于规则的简单算法）
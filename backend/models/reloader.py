@@ -0,0 +1,98 @@
+"""
+模型热更新监视器
+
+后台线程定期检查模型文件的 mtime/大小/inode，发现变化后调用
+RiskPredictor.reload_model 在请求路径之外加载、校验、预热新模型并原子替换。
+部署重新训练的模型只需覆盖文件（推荐写临时文件后 rename），无需重启 worker。
+"""
+import os
+import threading
+from datetime import datetime, UTC
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger('prophet-sentinel')
+
+
+class ModelReloader:
+    """按 interval 轮询模型文件并触发热更新"""
+
+    def __init__(self, predictor, interval: float = 3600.0):
+        """
+        Args:
+            predictor: 要热更新的 RiskPredictor
+            interval: 检查间隔（秒）
+        """
+        self.predictor = predictor
+        self.interval = interval
+
+        self._last_fingerprint = self._fingerprint()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+        self.checks = 0
+        self.last_checked_at: Optional[datetime] = None
+        self.last_reload_at: Optional[datetime] = None
+
+    def _fingerprint(self) -> Optional[Tuple[int, int, int]]:
+        """文件指纹；rename 替换会改变 inode，原地覆盖会改变 mtime/大小"""
+        try:
+            st = os.stat(self.predictor.model_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def check_now(self) -> bool:
+        """
+        立即检查一次
+
+        Returns:
+            是否发生了模型替换
+        """
+        self.checks += 1
+        self.last_checked_at = datetime.now(UTC)
+
+        fingerprint = self._fingerprint()
+        if fingerprint is None or fingerprint == self._last_fingerprint:
+            return False
+
+        # 无论成败都记录指纹：损坏的文件不会在每轮都重试，重新写入后会再次触发
+        self._last_fingerprint = fingerprint
+        logger.info(f"🔍 检测到模型文件变化: {self.predictor.model_path}")
+
+        if self.predictor.reload_model():
+            self.last_reload_at = datetime.now(UTC)
+            return True
+        return False
+
+    def start(self):
+        """启动后台线程；fork 之后在子进程中再次调用会重建线程"""
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+
+        self._stop = threading.Event()
+        self._thread_pid = pid
+        self._thread = threading.Thread(target=self._run, name='model-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_now()
+            except Exception as e:
+                logger.error(f"❌ 模型热更新检查失败: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'checks': self.checks,
+            'last_checked_at': self.last_checked_at.isoformat() if self.last_checked_at else None,
+            'last_reload_at': self.last_reload_at.isoformat() if self.last_reload_at else None,
+        }
@@ -6,6 +6,7 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
+import argparse
 import pickle
 import os
 import logging
@@ -13,7 +14,57 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_synthetic_training_data(n_samples=1000):
+FEATURE_COLUMNS = ['volume_24h', 'liquidity_change', 'whale_transfers', 'holder_concentration']
+LABEL_COLUMN = 'risk_label'
+
+# 每个特征在 (低风险, 高风险) 两类下的均匀分布区间 [low, high)
+_FEATURE_RANGES = {
+    'volume_24h': ((5000000, 100000000), (1000000, 10000000)),
+    'liquidity_change': ((-0.1, 0.3), (-0.5, -0.1)),       # 高风险: 流动性下降
+    'whale_transfers': ((0, 5), (5, 15)),                   # 高风险: 频繁鲸鱼活动（整数）
+    'holder_concentration': ((0.2, 0.6), (0.7, 0.95)),      # 高风险: 高集中度
+}
+_HIGH_RISK_RATIO = 0.3  # 30%高风险
+
+# 单次向量化生成的行数上限，控制临时数组的内存
+DEFAULT_BLOCK_SIZE = 1_000_000
+
+
+def _fill_block(rng, columns, start, stop):
+    """
+    向量化生成 [start, stop) 行，写入预分配的列数组
+    
+    先抽类别，再按类别选出每行的区间上下界，对每列只做一次均匀抽样。
+    """
+    n = stop - start
+    is_high_risk = rng.random(n) < _HIGH_RISK_RATIO
+    
+    for name, ((low_lo, low_hi), (high_lo, high_hi)) in _FEATURE_RANGES.items():
+        lo = np.where(is_high_risk, high_lo, low_lo)
+        hi = np.where(is_high_risk, high_hi, low_hi)
+        if name == 'whale_transfers':
+            columns[name][start:stop] = rng.integers(lo, hi)
+        else:
+            columns[name][start:stop] = lo + (hi - lo) * rng.random(n)
+    
+    columns[LABEL_COLUMN][start:stop] = is_high_risk
+
+
+def _allocate_columns(n):
+    columns = {name: np.empty(n, dtype=np.float64) for name in FEATURE_COLUMNS}
+    columns['whale_transfers'] = np.empty(n, dtype=np.int64)
+    columns[LABEL_COLUMN] = np.empty(n, dtype=np.int64)
+    return columns
+
+
+def _log_class_mix(labels):
+    n = len(labels)
+    n_high = int(np.count_nonzero(labels))
+    logger.info(f"   高风险样本: {n_high} ({n_high / n * 100:.1f}%)")
+    logger.info(f"   低风险样本: {n - n_high} ({(n - n_high) / n * 100:.1f}%)")
+
+
+def generate_synthetic_training_data(n_samples=1000, seed=42, block_size=DEFAULT_BLOCK_SIZE):
     """
     生成合成训练数据
     
@@ -26,55 +77,72 @@ def generate_synthetic_training_data(n_samples=1000):
     标签:
     - 0: 低风险
     - 1: 高风险
+    
+    所有特征用 NumPy 按列块向量化生成，直接写入预分配数组后构建 DataFrame，
+    不再为每个样本创建字典。
     """
     logger.info(f"🔧 生成 {n_samples} 条合成训练数据...")
     
-    np.random.seed(42)
-    
-    data = []
+    rng = np.random.default_rng(seed)
+    columns = _allocate_columns(n_samples)
+    for start in range(0, n_samples, block_size):
+        _fill_block(rng, columns, start, min(start + block_size, n_samples))
     
-    for _ in range(n_samples):
-        # 随机决定是否为高风险协议
-        is_high_risk = np.random.rand() > 0.7  # 30%高风险
-        
-        if is_high_risk:
-            # 高风险协议特征
-            volume = np.random.uniform(1000000, 10000000)
-            liquidity_change = np.random.uniform(-0.5, -0.1)  # 流动性下降
-            whale_transfers = np.random.randint(5, 15)  # 频繁鲸鱼活动
-            holder_concentration = np.random.uniform(0.7, 0.95)  # 高集中度
-            label = 1
-        else:
-            # 低风险协议特征
-            volume = np.random.uniform(5000000, 100000000)
-            liquidity_change = np.random.uniform(-0.1, 0.3)  # 流动性稳定或增长
-            whale_transfers = np.random.randint(0, 5)  # 少量鲸鱼活动
-            holder_concentration = np.random.uniform(0.2, 0.6)  # 分散持有
-            label = 0
-        
-        data.append({
-            'volume_24h': volume,
-            'liquidity_change': liquidity_change,
-            'whale_transfers': whale_transfers,
-            'holder_concentration': holder_concentration,
-            'risk_label': label
-        })
-    
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(columns, copy=False)
     logger.info(f"✅ 数据生成完成: {len(df)} 条记录")
-    logger.info(f"   高风险样本: {sum(df['risk_label'] == 1)} ({sum(df['risk_label'] == 1)/len(df)*100:.1f}%)")
-    logger.info(f"   低风险样本: {sum(df['risk_label'] == 0)} ({sum(df['risk_label'] == 0)/len(df)*100:.1f}%)")
+    _log_class_mix(columns[LABEL_COLUMN])
     
     return df
 
-def train_risk_model(df):
-    """训练RandomForest模型"""
+
+def iter_synthetic_training_data(n_samples, chunk_size=DEFAULT_BLOCK_SIZE, seed=42):
+    """
+    分块生成合成训练数据，每次产出一个不超过 chunk_size 行的 DataFrame
+    
+    任意时刻只有一个块在内存中，适合生成千万级以上的数据集。使用相同的
+    seed 且 chunk_size 等于 generate_synthetic_training_data 的 block_size 时，
+    拼接结果与一次性生成完全相同。
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_size):
+        stop = min(start + chunk_size, n_samples)
+        columns = _allocate_columns(stop - start)
+        _fill_block(rng, columns, 0, stop - start)
+        yield pd.DataFrame(columns, copy=False)
+
+
+def write_synthetic_training_data(out_dir, n_samples, chunk_size=DEFAULT_BLOCK_SIZE, seed=42):
+    """
+    分块生成并写入分区 CSV 文件（part-00000.csv, part-00001.csv, ...）
+    
+    Returns:
+        写入的文件路径列表
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    
+    for i, chunk in enumerate(iter_synthetic_training_data(n_samples, chunk_size, seed)):
+        path = os.path.join(out_dir, f'part-{i:05d}.csv')
+        chunk.to_csv(path, index=False)
+        paths.append(path)
+    
+    logger.info(f"💾 合成数据已分区写入: {out_dir} ({len(paths)} 个文件, {n_samples} 条记录)")
+    return paths
+
+def train_risk_model(df, n_jobs=None):
+    """
+    训练RandomForest模型
+    
+    Args:
+        df: 训练数据
+        n_jobs: 并行训练的进程/线程数，-1 表示使用全部 CPU
+    """
     logger.info("🤖 开始训练模型...")
     
     # 准备特征和标签
-    feature_columns = ['volume_24h', 'liquidity_change', 'whale_transfers', 'holder_concentration']
+    feature_columns = FEATURE_COLUMNS
     X = df[feature_columns]
-    y = df['risk_label']
+    y = df[LABEL_COLUMN]
     
     # 划分训练集和测试集
     X_train, X_test, y_train, y_test = train_test_split(
@@ -89,7 +157,8 @@ def train_risk_model(df):
         max_depth=10,
         min_samples_split=5,
         random_state=42,
-        class_weight='balanced'  # 处理类别不平衡
+        class_weight='balanced',  # 处理类别不平衡
+        n_jobs=n_jobs
     )
     
     model.fit(X_train, y_train)
@@ -116,36 +185,183 @@ def train_risk_model(df):
     
     return model, accuracy
 
+def _group_shards_by_classes(shards, classes):
+    """
+    按顺序把训练分片分组，使每组都包含全部类别
+    
+    warm_start 追加的树按当次 fit 的 y 确定 classes_，缺少某一类的分片会让这批树的
+    classes_ 与整个森林不一致。缺类的分片与后续分片合并；末尾仍缺类的并入前一组。
+    """
+    groups = []
+    current, seen = [], set()
+    for index, shard in enumerate(shards):
+        current.append(index)
+        seen.update(int(label) for label, count in shard['label_counts'].items() if count)
+        if seen >= classes:
+            groups.append(current)
+            current, seen = [], set()
+    if current:
+        if groups:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+    return groups
+
+def train_risk_model_streaming(dataset, n_estimators=100, holdout_shards=1, n_jobs=-1,
+                               max_depth=10, min_samples_split=5):
+    """
+    流式训练RandomForest模型（数据集可以大于内存）
+    
+    依次读取每个训练分片（mmap），通过 warm_start 在已有森林上为该分片追加
+    一批新树，因此任意时刻只有一个分片的数据在内存中。最后 holdout_shards
+    个分片作为测试集，同样按分片流式评估。缺少某一类别的分片会和相邻分片
+    合并后再训练（见 _group_shards_by_classes）。
+    
+    类别权重按 manifest 中全量训练分片的类别计数计算，等价于在完整数据上
+    使用 class_weight='balanced'。
+    
+    Args:
+        dataset: ShardedDataset
+        n_estimators: 目标树数量，平均分配到各训练分片
+        holdout_shards: 用作测试集的末尾分片数
+        n_jobs: 每个分片内并行建树的数量
+    
+    Returns:
+        (model, accuracy)
+    """
+    n_train = dataset.n_shards - holdout_shards
+    if n_train < 1:
+        raise ValueError(f"分片数不足: 共 {dataset.n_shards} 个，测试集需要 {holdout_shards} 个")
+    
+    logger.info(f"🤖 开始流式训练: {n_train} 个训练分片, {holdout_shards} 个测试分片")
+    
+    # 按训练分片的类别计数计算 balanced 权重: n / (k * count_c)
+    counts = {}
+    for shard in dataset.manifest['shards'][:n_train]:
+        for label, count in shard['label_counts'].items():
+            counts[int(label)] = counts.get(int(label), 0) + count
+    total = sum(counts.values())
+    class_weight = {label: total / (len(counts) * count) for label, count in counts.items()}
+    
+    groups = _group_shards_by_classes(dataset.manifest['shards'][:n_train], set(counts))
+    if len(groups) < n_train:
+        logger.info(f"   部分分片缺少类别，{n_train} 个训练分片合并为 {len(groups)} 组")
+    
+    trees_per_shard = max(1, -(-n_estimators // len(groups)))
+    model = RandomForestClassifier(
+        n_estimators=0,
+        max_depth=max_depth,
+        min_samples_split=min_samples_split,
+        random_state=42,
+        class_weight=class_weight,
+        warm_start=True,
+        n_jobs=n_jobs
+    )
+    
+    for i, group in enumerate(groups):
+        parts = list(dataset.iter_xy(FEATURE_COLUMNS, LABEL_COLUMN, indices=group))
+        X = np.concatenate([part[0] for part in parts])
+        y = np.concatenate([part[1] for part in parts])
+        model.n_estimators += trees_per_shard
+        model.fit(X, y)
+        logger.info(f"   分片组 {i + 1}/{len(groups)}: {len(y)} 行, 累计 {model.n_estimators} 棵树")
+    
+    correct = 0
+    evaluated = 0
+    for X, y in dataset.iter_xy(FEATURE_COLUMNS, LABEL_COLUMN, indices=range(n_train, dataset.n_shards)):
+        correct += int(np.count_nonzero(model.predict(X) == y))
+        evaluated += len(y)
+    accuracy = correct / evaluated if evaluated else float('nan')
+    
+    logger.info(f"🎯 流式训练完成! 准确率: {accuracy:.2%} ({evaluated} 条测试样本)")
+    return model, accuracy
+
 def save_model(model, path='backend/models/risk_model.pkl'):
-    """保存训练好的模型"""
+    """
+    保存训练好的模型
+    
+    先写临时文件再原子替换，运行中的服务热更新时不会读到写了一半的文件。
+    """
     os.makedirs(os.path.dirname(path), exist_ok=True)
     
-    with open(path, 'wb') as f:
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
         pickle.dump(model, f)
+    os.replace(tmp_path, path)
     
     logger.info(f"💾 模型已保存: {path}")
 
+def save_model_artifact(model, path='backend/models/risk_model.forest'):
+    """
+    保存可 mmap 共享的扁平数组模型
+    
+    gunicorn 多 worker 部署时优先加载该文件，所有 worker 共享同一份页缓存。
+    """
+    from models.artifact import save_forest_artifact
+    from models.forest_engine import CompiledForest
+    
+    header = save_forest_artifact(CompiledForest.from_sklearn(model), path)
+    logger.info(f"💾 mmap 模型已保存: {path} (版本 {header['model_version']})")
+    return header
+
 def save_training_data(df, path='data/processed/training_data.csv'):
     """保存训练数据"""
     os.makedirs(os.path.dirname(path), exist_ok=True)
     df.to_csv(path, index=False)
     logger.info(f"💾 训练数据已保存: {path}")
 
-def main():
+def save_training_data_shards(chunks, path='data/processed/training_data'):
+    """
+    保存为列式 NPY 分片数据集（带 manifest）
+    
+    Args:
+        chunks: DataFrame 或 DataFrame 迭代器
+    """
+    from models.data_store import write_shards
+    
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    manifest = write_shards(chunks, path, label_column=LABEL_COLUMN)
+    logger.info(f"💾 训练数据分片已保存: {path} ({len(manifest['shards'])} 个分片, {manifest['total_rows']} 条记录)")
+    return manifest
+
+def main(argv=None):
     """主训练流程"""
-    logger.info("🚀 Prophet Sentinel - 模型训练开始\n")
+    parser = argparse.ArgumentParser(description='Prophet Sentinel 模型训练')
+    parser.add_argument('--samples', type=int, default=2000, help='合成样本数')
+    parser.add_argument('--store', choices=['csv', 'npy'], default='csv',
+                        help='csv: 单文件 + 内存训练; npy: 列式分片 + 流式训练（支持大于内存的数据集）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_BLOCK_SIZE, help='npy 模式每个分片的行数')
+    parser.add_argument('--n-jobs', type=int, default=None, help='并行建树数，-1 为全部 CPU')
+    args = parser.parse_args(argv)
     
-    # 1. 生成训练数据
-    df = generate_synthetic_training_data(n_samples=2000)
+    logger.info("🚀 Prophet Sentinel - 模型训练开始\n")
     
-    # 2. 保存训练数据
-    save_training_data(df)
+    # 未指定 --n-jobs 时沿用各训练函数自己的默认值（流式训练默认使用全部 CPU）
+    train_kwargs = {} if args.n_jobs is None else {'n_jobs': args.n_jobs}
     
-    # 3. 训练模型
-    model, accuracy = train_risk_model(df)
+    if args.store == 'npy':
+        from models.data_store import ShardedDataset
+        
+        # 1-2. 分块生成并写入列式分片，不在内存中保留完整数据集
+        path = 'data/processed/training_data'
+        save_training_data_shards(iter_synthetic_training_data(args.samples, chunk_size=args.chunk_size), path)
+        
+        # 3. 流式训练模型
+        model, accuracy = train_risk_model_streaming(ShardedDataset(path), **train_kwargs)
+    else:
+        # 1. 生成训练数据
+        df = generate_synthetic_training_data(n_samples=args.samples)
+        
+        # 2. 保存训练数据
+        save_training_data(df)
+        
+        # 3. 训练模型
+        model, accuracy = train_risk_model(df, **train_kwargs)
     
-    # 4. 保存模型
+    # 4. 保存模型（pickle + mmap 扁平数组两种格式）
     save_model(model)
+    save_model_artifact(model)
     
     # 5. 测试预测
     logger.info("\n🧪 测试预测:")
@@ -173,6 +389,9 @@ def main():
     logger.info("可以运行 Flask 应用了: python backend/app.py\n")
 
 if __name__ == '__main__':
+    # 以脚本方式运行（python models/train_model.py）时，确保 backend/ 在 sys.path 中
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     main()
 
 
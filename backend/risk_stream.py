@@ -0,0 +1,319 @@
+"""
+风险分数推送流（Server-Sent Events）
+
+协议的 risk_score 或 alert_level 变化时生成一条增量事件，推送给所有订阅者，
+取代前端和 Telegram Bot 对 /api/predict_risk 的轮询。
+
+- 事件只编码一次：环形缓冲区保存最近 history 条已编码的 SSE 帧，所有连接共享
+- 每个连接只保存一个游标（已发送的序号），写得慢的连接不会让内存增长：
+  游标落后到环形缓冲区之外时，改为发送一次当前全部分数的快照（背压下合并）
+- 空闲时每 heartbeat 秒发送一行注释作为心跳，及时发现断开的连接
+- 同步订阅（WSGI）每个连接占一个线程；异步订阅（ASGI）按事件循环共用一个唤醒 future，不占线程
+- 事件 id 为 "纪元-序号"；客户端重连时带 Last-Event-ID，缓冲区内的事件直接补发，
+  纪元不同（服务重启或连到另一个 worker）或已被覆盖时发送快照
+"""
+import asyncio
+import collections
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, UTC
+from typing import AsyncIterator, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+# 空闲连接的心跳（SSE 注释行，客户端忽略）
+_HEARTBEAT = b": heartbeat\n\n"
+
+
+def _frame(event: str, event_id: str, data: dict) -> bytes:
+    payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+class RiskStream:
+    """风险分数变化的发布/订阅中心（线程安全）"""
+
+    def __init__(self, history: int = 1024, heartbeat: float = 15.0, max_subscribers: int = 5000,
+                 retry_ms: int = 3000):
+        """
+        Args:
+            history: 环形缓冲区保留的事件数，决定可补发的范围和慢连接允许的最大落后量
+            heartbeat: 空闲连接的心跳间隔（秒）
+            max_subscribers: 同时在线的订阅连接上限
+            retry_ms: 建议客户端断线后的重连间隔（SSE retry 字段）
+        """
+        self.history = history
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.retry_ms = retry_ms
+        self._reset()
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self.epoch = f"{os.getpid():x}{int(time.time() * 1000) % 0xFFFFFF:x}"
+        self.seq = 0
+        # (seq, 协议名小写, 已编码帧)
+        self._events: Deque[Tuple[int, str, bytes]] = collections.deque(maxlen=self.history)
+        # 协议名小写 -> (显示名, risk_score, alert_level)
+        self._state: Dict[str, Tuple[str, int, str]] = {}
+        # 事件循环 -> 该循环上异步订阅共用的唤醒 future
+        self._loop_waiters: Dict[asyncio.AbstractEventLoop, asyncio.Future] = {}
+        self._closed = False
+
+        self.subscribers = 0
+        self.published = 0
+        self.unchanged = 0
+        self.resumed = 0
+        self.snapshots = 0
+        self.lagged = 0
+        self.rejected = 0
+
+    def reset_after_fork(self):
+        """fork 之后换新的锁和纪元：各 worker 的序号互相独立，不能混用；保留当前分数供快照"""
+        state = self._state
+        self._reset()
+        self._state = dict(state)
+
+    # ------------------------------------------------------------------ 发布
+
+    def publish(self, protocol: str, response: dict) -> bool:
+        """
+        记录协议的最新风险响应；risk_score 或 alert_level 变化时推送增量
+
+        Returns:
+            是否生成了事件
+        """
+        if 'risk_score' not in response:
+            return False
+        key = protocol.lower()
+        risk_score = response['risk_score']
+        alert_level = response.get('alert_level')
+
+        with self._cond:
+            previous = self._state.get(key)
+            if previous is not None and previous[1:] == (risk_score, alert_level):
+                self.unchanged += 1
+                return False
+
+            self.seq += 1
+            self._state[key] = (protocol, risk_score, alert_level)
+            delta = {
+                'seq': self.seq,
+                'protocol': protocol,
+                'risk_score': risk_score,
+                'alert_level': alert_level,
+                'prev_risk_score': previous[1] if previous else None,
+                'prev_alert_level': previous[2] if previous else None,
+                'timestamp': response.get('timestamp') or datetime.now(UTC).isoformat(),
+            }
+            self._events.append((self.seq, key, _frame('risk', self._event_id(self.seq), delta)))
+            self.published += 1
+            self._cond.notify_all()
+            self._wake_loops()
+        return True
+
+    def close(self):
+        """结束所有订阅（进程退出时）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._wake_loops()
+
+    # ------------------------------------------------------------------ 订阅
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_last_event_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Last-Event-ID -> 可补发的起始游标；纪元不符或格式错误返回 None（需要快照）"""
+        if not last_event_id:
+            return None
+        epoch, _, seq = last_event_id.strip().rpartition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _snapshot(self, protocols: Optional[frozenset]) -> bytes:
+        """当前全部分数的快照帧（调用方持有锁）"""
+        scores = {
+            name: [risk_score, alert_level]
+            for key, (name, risk_score, alert_level) in self._state.items()
+            if protocols is None or key in protocols
+        }
+        self.snapshots += 1
+        return _frame('snapshot', self._event_id(self.seq), {'seq': self.seq, 'scores': scores})
+
+    def subscribe(self, last_event_id: Optional[str] = None,
+                  protocols: Optional[Iterable[str]] = None) -> Optional['Subscription']:
+        """
+        订阅事件流
+
+        Args:
+            last_event_id: 客户端上次收到的事件 id，用于断线续传
+            protocols: 只接收这些协议的事件（不区分大小写），None 表示全部
+
+        Returns:
+            Subscription；订阅数已达上限时返回 None
+        """
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self.subscribers += 1
+        wanted = frozenset(p.lower() for p in protocols) if protocols else None
+        return Subscription(self, last_event_id, wanted)
+
+    def _release(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def _open(self, last_event_id: Optional[str], wanted: Optional[frozenset]) -> Tuple[Optional[bytes], int]:
+        """订阅开始：可以续传时返回 (None, 游标)，否则返回 (快照, 当前序号)"""
+        with self._cond:
+            cursor = self.parse_last_event_id(last_event_id)
+            oldest = self._events[0][0] if self._events else self.seq + 1
+            if cursor is not None and oldest - 1 <= cursor <= self.seq:
+                self.resumed += 1
+                return None, cursor
+            return self._snapshot(wanted), self.seq
+
+    def _poll(self, cursor: int, wanted: Optional[frozenset]) -> Tuple[Optional[bytes], int]:
+        """
+        游标之后的待发送内容 (字节块, 新游标)，调用方持有锁
+
+        没有新事件时字节块为 None；新事件都被协议过滤掉时为 b""。
+        """
+        if self.seq == cursor:
+            return None, cursor
+        if self._events[0][0] > cursor + 1:
+            # 落后超过环形缓冲区：中间的事件已被覆盖，合并为一次快照
+            self.lagged += 1
+            return self._snapshot(wanted), self.seq
+        # 一次写出全部待发送事件（序号连续，从尾部取 seq - cursor 条）
+        pending = list(itertools.islice(reversed(self._events), self.seq - cursor))
+        return b"".join(
+            frame for _, key, frame in reversed(pending)
+            if wanted is None or key in wanted
+        ), self.seq
+
+    def _frames(self, last_event_id: Optional[str], wanted: Optional[frozenset]) -> Iterator[bytes]:
+        """同步订阅（WSGI）：每个连接占一个线程，在条件变量上等待"""
+        yield f"retry: {self.retry_ms}\n\n".encode()
+        chunk, cursor = self._open(last_event_id, wanted)
+        if chunk is not None:
+            yield chunk
+
+        while True:
+            with self._cond:
+                chunk, cursor = self._poll(cursor, wanted)
+                if chunk is None and not self._closed:
+                    self._cond.wait(self.heartbeat)
+                    chunk, cursor = self._poll(cursor, wanted)
+                if self._closed:
+                    return
+            # 锁外写：慢连接只阻塞自己的线程
+            yield chunk or _HEARTBEAT
+
+    async def _aframes(self, last_event_id: Optional[str], wanted: Optional[frozenset]) -> AsyncIterator[bytes]:
+        """异步订阅（ASGI）：不占线程，在所属事件循环的唤醒 future 上等待"""
+        yield f"retry: {self.retry_ms}\n\n".encode()
+        chunk, cursor = self._open(last_event_id, wanted)
+        if chunk is not None:
+            yield chunk
+
+        loop = asyncio.get_running_loop()
+        while True:
+            # 先取唤醒 future 再检查：检查之后的发布一定会唤醒它
+            waiter = self._loop_waiter(loop)
+            with self._cond:
+                if self._closed:
+                    return
+                chunk, cursor = self._poll(cursor, wanted)
+            if chunk is None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter), self.heartbeat)
+                    continue
+                except TimeoutError:
+                    pass
+            yield chunk or _HEARTBEAT
+
+    def _loop_waiter(self, loop: asyncio.AbstractEventLoop) -> asyncio.Future:
+        """事件循环内所有异步订阅共用的唤醒 future，下次发布时完成"""
+        with self._cond:
+            waiter = self._loop_waiters.get(loop)
+            if waiter is None or waiter.done():
+                waiter = self._loop_waiters[loop] = loop.create_future()
+            return waiter
+
+    def _wake_loops(self):
+        """唤醒所有事件循环上的异步订阅（调用方持有锁）"""
+        for loop in list(self._loop_waiters):
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:
+                # 事件循环已关闭
+                del self._loop_waiters[loop]
+
+    def _wake(self, loop: asyncio.AbstractEventLoop):
+        with self._cond:
+            waiter = self._loop_waiters.pop(loop, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'epoch': self.epoch,
+                'seq': self.seq,
+                'subscribers': self.subscribers,
+                'max_subscribers': self.max_subscribers,
+                'published': self.published,
+                'unchanged': self.unchanged,
+                'resumed': self.resumed,
+                'snapshots': self.snapshots,
+                'lagged': self.lagged,
+                'rejected': self.rejected,
+                'history': len(self._events),
+            }
+
+
+class Subscription:
+    """
+    单个订阅连接，逐块产出 SSE 字节
+
+    同步迭代用于 WSGI（app.py），异步迭代用于 ASGI（asgi.py），二选一；
+    close() 归还订阅名额（可重复调用）。
+    """
+
+    def __init__(self, stream: RiskStream, last_event_id: Optional[str], wanted: Optional[frozenset]):
+        self._stream = stream
+        self._last_event_id = last_event_id
+        self._wanted = wanted
+        self._frames = None
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self._frames is None:
+            self._frames = self._stream._frames(self._last_event_id, self._wanted)
+        return next(self._frames)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._frames is None:
+            self._frames = self._stream._aframes(self._last_event_id, self._wanted)
+        return await self._frames.__anext__()
+
+    def close(self):
+        # WSGI 服务器在连接结束（包括客户端断开）时调用；异步生成器随任务取消结束
+        if not self._closed:
+            self._closed = True
+            if inspect.isgenerator(self._frames):
+                self._frames.close()
+            self._stream._release()
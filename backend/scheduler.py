@@ -0,0 +1,244 @@
+"""
+协议风险分数预取调度器
+
+后台线程按固定间隔为注册表中的所有协议刷新链上指标并打分，结果写入
+ScoreStore；/api/predict_risk 命中存储时直接返回，请求延迟只剩一次字典查找，
+RPC 和模型推理都移出了请求路径。
+
+- 指标按块分给有界线程池并发拉取（每块走 SolanaService 的批量路径）
+- 只有指标或模型版本发生变化的协议才重新打分，且整批一次 predict_batch
+- 超过 max_age 的分数视为过期，调用方回退到按需计算
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('prophet-sentinel')
+
+_FEATURES = ('volume_24h', 'liquidity_change', 'whale_transfers', 'holder_concentration')
+
+
+def metrics_fingerprint(model_version: Optional[str], metrics: dict) -> tuple:
+    """(模型版本, 特征值...)：两者都不变时风险分数不变，可以复用上一次的结果"""
+    return (model_version,) + tuple(metrics.get(f) for f in _FEATURES)
+
+
+class ScoreStore:
+    """线程安全的协议分数存储（协议名不区分大小写）"""
+
+    def __init__(self, max_age: Optional[float] = None,
+                 on_put: Optional[Callable[[str, dict], object]] = None,
+                 protocols: Optional[Iterable[str]] = None):
+        """
+        Args:
+            max_age: 分数最长有效期（秒），None 表示不过期
+            on_put: 写入新响应后的回调 (protocol, response)，如推送风险变化
+            protocols: 只保存这些协议（不区分大小写），其它协议的写入被忽略、也不触发 on_put；
+                       协议名来自请求参数时必须设置，否则存储大小不受限制。None 表示不限制
+        """
+        self.max_age = max_age
+        self.on_put = on_put
+        self.protocols = frozenset(p.lower() for p in protocols) if protocols is not None else None
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.ignored = 0
+
+    def reset_after_fork(self):
+        """fork 之后换新的锁：fork 时其它线程可能正持有旧锁；保留已有分数"""
+        self._lock = threading.Lock()
+
+    def put(self, protocol: str, response: dict, fingerprint: tuple):
+        if self.protocols is not None and protocol.lower() not in self.protocols:
+            self.ignored += 1
+            return
+        entry = {
+            'response': response,
+            'fingerprint': fingerprint,
+            'updated_at': time.monotonic(),
+        }
+        with self._lock:
+            self._entries[protocol.lower()] = entry
+        if self.on_put is not None:
+            self.on_put(protocol, response)
+
+    def touch(self, protocol: str):
+        """指标未变化时刷新有效期，不替换响应"""
+        with self._lock:
+            entry = self._entries.get(protocol.lower())
+            if entry is not None:
+                entry['updated_at'] = time.monotonic()
+
+    def fingerprint(self, protocol: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(protocol.lower())
+        return entry['fingerprint'] if entry is not None else None
+
+    def peek(self, protocol: str) -> Optional[tuple]:
+        """返回 (响应, 距上次刷新的秒数)，不论是否过期；不计入命中统计"""
+        with self._lock:
+            entry = self._entries.get(protocol.lower())
+        if entry is None:
+            return None
+        return entry['response'], time.monotonic() - entry['updated_at']
+
+    def get(self, protocol: str) -> Optional[dict]:
+        """返回未过期的响应；未命中或过期返回 None"""
+        entry = self.lookup(protocol)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, protocol: str) -> Optional[Tuple[dict, tuple, float]]:
+        """返回未过期的 (响应, 指纹, 距上次刷新的秒数)；未命中或过期返回 None"""
+        with self._lock:
+            entry = self._entries.get(protocol.lower())
+
+        age = time.monotonic() - entry['updated_at'] if entry is not None else None
+        if entry is None or (self.max_age is not None and age > self.max_age):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry['response'], entry['fingerprint'], age
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_age': self.max_age,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'ignored': self.ignored,
+        }
+
+
+class PrefetchScheduler:
+    """定期刷新所有协议的指标与风险分数"""
+
+    def __init__(self, solana_service, predictor, store: ScoreStore, protocols: Iterable[str],
+                 build_response: Callable[[str, dict, dict], dict],
+                 interval: float = 60.0, max_workers: int = 4, chunk_size: int = 25):
+        """
+        Args:
+            solana_service: SolanaService（提供 get_many_protocol_metrics）
+            predictor: RiskPredictor（提供 predict_batch 和 model_version）
+            store: 分数写入的 ScoreStore
+            protocols: 需要保持预热的协议名
+            build_response: (protocol, metrics, prediction) -> 响应字典
+            interval: 刷新间隔（秒）
+            max_workers: 并发拉取指标的线程数
+            chunk_size: 每个线程单次批量拉取的协议数
+        """
+        self.solana_service = solana_service
+        self.predictor = predictor
+        self.store = store
+        self.protocols = list(protocols)
+        self.build_response = build_response
+        self.interval = interval
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+        self.runs = 0
+        self.rescored = 0
+        self.unchanged = 0
+        self.fetch_failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_ms: Optional[float] = None
+
+    def _fetch_chunk(self, chunk: List[str]) -> Dict[str, dict]:
+        try:
+            return self.solana_service.get_many_protocol_metrics(chunk)
+        except Exception as e:
+            # 单块失败不影响其它块；这些协议保留上一轮的分数
+            self.fetch_failures += 1
+            logger.warning(f"⚠️ 预取指标失败 ({len(chunk)} 个协议): {e}")
+            return {}
+
+    def _fingerprint(self, metrics: dict) -> tuple:
+        return metrics_fingerprint(self.predictor.model_version, metrics)
+
+    def refresh_once(self) -> int:
+        """
+        执行一轮刷新
+
+        Returns:
+            本轮重新打分的协议数
+        """
+        start = time.perf_counter()
+        chunks = [self.protocols[i:i + self.chunk_size] for i in range(0, len(self.protocols), self.chunk_size)]
+
+        metrics_by_protocol: Dict[str, dict] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='prefetch') as pool:
+            for result in pool.map(self._fetch_chunk, chunks):
+                metrics_by_protocol.update(result)
+
+        changed = []
+        for protocol, metrics in metrics_by_protocol.items():
+            fingerprint = self._fingerprint(metrics)
+            if fingerprint == self.store.fingerprint(protocol):
+                self.store.touch(protocol)
+                self.unchanged += 1
+            else:
+                changed.append((protocol, metrics, fingerprint))
+
+        if changed:
+            predictions = self.predictor.predict_batch([metrics for _, metrics, _ in changed])
+            for (protocol, metrics, fingerprint), prediction in zip(changed, predictions):
+                self.store.put(protocol, self.build_response(protocol, metrics, prediction), fingerprint)
+
+        self.rescored += len(changed)
+        self.runs += 1
+        self.last_run_at = datetime.now(UTC)
+        self.last_run_ms = round((time.perf_counter() - start) * 1000, 2)
+        return len(changed)
+
+    def start(self):
+        """启动后台线程（立即执行第一轮）；fork 之后在子进程中再次调用会重建线程"""
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+
+        self._stop = threading.Event()
+        self._thread_pid = pid
+        self._thread = threading.Thread(target=self._run, name='prefetch-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh_once()
+            except Exception as e:
+                logger.error(f"❌ 预取调度失败: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stats(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'protocols': len(self.protocols),
+            'runs': self.runs,
+            'rescored': self.rescored,
+            'unchanged': self.unchanged,
+            'fetch_failures': self.fetch_failures,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_run_ms': self.last_run_ms,
+            'store': self.store.stats(),
+        }
@@ -1,9 +1,23 @@
+from .backfill import BackfillCheckpoint, SignatureBackfill
+from .concentration import ConcentrationAccumulator, holder_concentration
+from .ingestion import StreamIngestor
+from .protocol_registry import PROTOCOL_REGISTRY, ProtocolAccounts
+from .rpc_client import AsyncRpcClient, RpcError
+from .rpc_router import RpcRouter
 from .solana_service import SolanaService
 from .sustainability import calculate_sustainability_score
 
 __all__ = [
+    "AsyncRpcClient",
+    "BackfillCheckpoint",
+    "ConcentrationAccumulator",
+    "PROTOCOL_REGISTRY",
+    "ProtocolAccounts",
+    "RpcError",
+    "RpcRouter",
+    "SignatureBackfill",
     "SolanaService",
+    "StreamIngestor",
     "calculate_sustainability_score",
+    "holder_concentration",
 ]
-
-
@@ -0,0 +1,144 @@
+"""
+SPL Token account layouts
+-------------------------
+Decoders for the raw account data returned by ``getMultipleAccounts``
+with ``{"encoding": "base64"}``.
+
+Mint (82 bytes):           supply u64 @ 36, decimals u8 @ 44
+Token account (165 bytes): mint [32] @ 0, owner [32] @ 32, amount u64 @ 64
+
+Single accounts are read in place with ``struct.unpack_from``, which
+accepts ``bytes`` or a ``memoryview`` without slicing. ``AccountDecoder``
+bulk-decodes a ``getMultipleAccounts`` result into a NumPy structured
+array (``MINT_DTYPE`` / ``TOKEN_ACCOUNT_DTYPE``): each base64 blob is
+decoded once into a reusable buffer and the array is a view over it, so
+every field is a column (``records["amount"]``) with no per-field
+``bytes`` objects. Accounts longer than the base layout (e.g. Token-2022
+extensions) contribute their base-layout prefix.
+"""
+
+from __future__ import annotations
+
+import binascii
+import struct
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+MINT_SIZE = 82
+TOKEN_ACCOUNT_SIZE = 165
+
+_U64 = struct.Struct("<Q")
+_MINT_SUPPLY_OFFSET = 36
+_MINT_DECIMALS_OFFSET = 44
+_TOKEN_AMOUNT_OFFSET = 64
+
+# COption<T> is a u32 tag followed by T; pubkeys are raw 32-byte fields
+_PUBKEY = ("u1", (32,))
+
+MINT_DTYPE = np.dtype({
+    "names": ["mint_authority_option", "mint_authority", "supply", "decimals",
+              "is_initialized", "freeze_authority_option", "freeze_authority"],
+    "formats": ["<u4", _PUBKEY, "<u8", "u1", "u1", "<u4", _PUBKEY],
+    "offsets": [0, 4, 36, 44, 45, 46, 50],
+    "itemsize": MINT_SIZE,
+})
+
+TOKEN_ACCOUNT_DTYPE = np.dtype({
+    "names": ["mint", "owner", "amount", "delegate_option", "delegate", "state",
+              "is_native_option", "is_native", "delegated_amount",
+              "close_authority_option", "close_authority"],
+    "formats": [_PUBKEY, _PUBKEY, "<u8", "<u4", _PUBKEY, "u1",
+                "<u4", "<u8", "<u8", "<u4", _PUBKEY],
+    "offsets": [0, 32, 64, 72, 76, 108, 109, 113, 121, 129, 133],
+    "itemsize": TOKEN_ACCOUNT_SIZE,
+})
+
+
+def account_bytes(account: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    """Raw data of an account from a base64-encoded RPC response, ``None`` if missing."""
+    if account is None:
+        return None
+    data, encoding = account["data"]
+    if encoding != "base64":
+        raise ValueError(f"Unsupported account encoding: {encoding}")
+    return binascii.a2b_base64(data)
+
+
+def decode_mint(data: bytes | memoryview) -> Dict[str, int]:
+    if len(data) < MINT_SIZE:
+        raise ValueError(f"Mint account data too short: {len(data)} bytes")
+    return {
+        "supply": _U64.unpack_from(data, _MINT_SUPPLY_OFFSET)[0],
+        "decimals": data[_MINT_DECIMALS_OFFSET],
+    }
+
+
+def decode_token_account_amount(data: bytes | memoryview) -> int:
+    if len(data) < TOKEN_ACCOUNT_SIZE:
+        raise ValueError(f"Token account data too short: {len(data)} bytes")
+    return _U64.unpack_from(data, _TOKEN_AMOUNT_OFFSET)[0]
+
+
+class AccountDecoder:
+    """Bulk decoder of one account layout into a reusable buffer.
+
+    The arrays returned by ``decode_many`` are views over the decoder's
+    buffer and are overwritten by the next call; ``.copy()`` them (or
+    take the columns you need) to keep them.
+    """
+
+    def __init__(self, dtype: np.dtype, capacity: int = 100) -> None:
+        self.dtype = dtype
+        self.itemsize = dtype.itemsize
+        # Base64 length of one account when no padding is needed (size divisible by 3)
+        self._concat_length = self.itemsize * 4 // 3 if self.itemsize % 3 == 0 else None
+        self._buffer = bytearray(capacity * self.itemsize)
+
+    def _reserve(self, count: int) -> memoryview:
+        needed = count * self.itemsize
+        if len(self._buffer) < needed:
+            # A new buffer rather than a resize: arrays from earlier calls may still view the old one
+            self._buffer = bytearray(max(needed, 2 * len(self._buffer)))
+        return memoryview(self._buffer)
+
+    def decode_many(self, accounts: Sequence[Optional[Dict[str, Any]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Decode a ``getMultipleAccounts`` value list.
+
+        Returns:
+            (records, present): structured array of ``len(accounts)`` rows
+            (zeroed where missing or too short) and a boolean mask of the
+            rows that held a valid account
+        """
+        count = len(accounts)
+        present = np.zeros(count, dtype=bool)
+
+        # Fast path: unpadded base64 blobs of exactly one layout concatenate into a single decode
+        if self._concat_length is not None and all(
+            account is not None and account["data"][1] == "base64"
+            and len(account["data"][0]) == self._concat_length
+            for account in accounts
+        ):
+            raw = binascii.a2b_base64("".join(account["data"][0] for account in accounts))
+            present[:] = True
+            return np.frombuffer(raw, dtype=self.dtype, count=count), present
+
+        view = self._reserve(count)
+        size = self.itemsize
+        zero = bytes(size)
+        for i, account in enumerate(accounts):
+            raw = account_bytes(account)
+            start = i * size
+            if raw is None or len(raw) < size:
+                view[start:start + size] = zero
+            else:
+                view[start:start + size] = memoryview(raw)[:size]
+                present[i] = True
+        return np.frombuffer(self._buffer, dtype=self.dtype, count=count), present
+
+    def columns(self, accounts: Sequence[Optional[Dict[str, Any]]], *fields: str) -> Dict[str, np.ndarray]:
+        """Contiguous copies of selected fields, plus the ``present`` mask."""
+        records, present = self.decode_many(accounts)
+        result = {field: np.ascontiguousarray(records[field]) for field in fields}
+        result["present"] = present
+        return result
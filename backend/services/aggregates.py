@@ -0,0 +1,166 @@
+"""
+Incremental feature aggregates
+------------------------------
+Per-protocol state that keeps the four model features current as
+on-chain events arrive, at O(1) amortised cost per event.
+
+24h windows are time-bucketed ring buffers: each slot holds one bucket's
+total and a running sum is adjusted as events land and as buckets fall
+out of the window, so reading a window never rescans history.
+
+Feature definitions match ``SolanaService._build_metrics``:
+
+- volume_24h: successful program transactions in the window times
+  ``avg_trade_usd``
+- whale_transfers: balance changes of the top whale accounts in the window
+- liquidity_change: latest reserve against the reserve at the start of the window
+- holder_concentration: tracked top-holder balances over mint supply
+"""
+
+from __future__ import annotations
+
+import collections
+import math
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+WINDOW_SECONDS = 24 * 3600
+BUCKET_SECONDS = 60
+
+
+class RollingWindow:
+    """Sum of values over a sliding time window, kept in a ring of buckets."""
+
+    __slots__ = ("bucket_seconds", "n_buckets", "total", "_values", "_head")
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS, bucket_seconds: float = BUCKET_SECONDS) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, math.ceil(window_seconds / bucket_seconds))
+        self.total = 0
+        self._values = [0] * self.n_buckets
+        self._head: Optional[int] = None  # newest bucket id seen
+
+    def _advance(self, bucket: int) -> None:
+        head = self._head
+        if head is None:
+            self._head = bucket
+            return
+        if bucket <= head:
+            return
+        # Clear the slots that the new buckets reuse; never more than one lap
+        for b in range(head + 1, head + 1 + min(bucket - head, self.n_buckets)):
+            slot = b % self.n_buckets
+            self.total -= self._values[slot]
+            self._values[slot] = 0
+        self._head = bucket
+
+    def add(self, timestamp: float, value=1) -> None:
+        bucket = int(timestamp // self.bucket_seconds)
+        self._advance(bucket)
+        if bucket <= self._head - self.n_buckets:
+            return  # older than the window
+        self._values[bucket % self.n_buckets] += value
+        self.total += value
+
+    def sum(self, now: float):
+        self._advance(int(now // self.bucket_seconds))
+        return self.total
+
+
+class FeatureAggregator:
+    """Streaming state for one protocol."""
+
+    def __init__(
+        self,
+        protocol: str,
+        avg_trade_usd: float,
+        window_seconds: float = WINDOW_SECONDS,
+        bucket_seconds: float = BUCKET_SECONDS,
+    ) -> None:
+        self.protocol = protocol
+        self.avg_trade_usd = avg_trade_usd
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, math.ceil(window_seconds / bucket_seconds))
+
+        self.transactions = RollingWindow(window_seconds, bucket_seconds)
+        self.whale_transfers = RollingWindow(window_seconds, bucket_seconds)
+
+        self.supply = 0
+        self.holder_balances: Dict[str, int] = {}
+        self.holder_total = 0
+        self.whales: frozenset = frozenset()
+        self.reserve_account: Optional[str] = None
+        # [bucket id, first reserve, last reserve] per bucket with updates, oldest first
+        self._reserves: Deque[list] = collections.deque()
+
+        self.events = 0
+
+    def seed(
+        self,
+        holders: Iterable[Tuple[str, int]],
+        supply: int,
+        whales: Iterable[str],
+        reserve_account: Optional[str],
+        reserve: Optional[int],
+        now: float,
+    ) -> None:
+        """Initial snapshot (from RPC) that later events update."""
+        self.holder_balances = dict(holders)
+        self.holder_total = sum(self.holder_balances.values())
+        self.supply = supply
+        self.whales = frozenset(whales)
+        self.reserve_account = reserve_account
+        if reserve is not None:
+            self._record_reserve(now, reserve)
+
+    def on_transaction(self, timestamp: float, failed: bool = False) -> None:
+        self.events += 1
+        if not failed:
+            self.transactions.add(timestamp)
+
+    def on_supply(self, timestamp: float, supply: int) -> None:
+        self.events += 1
+        self.supply = supply
+
+    def on_token_account(self, timestamp: float, address: str, amount: int) -> None:
+        self.events += 1
+        previous = self.holder_balances.get(address)
+        if previous is not None:
+            self.holder_balances[address] = amount
+            self.holder_total += amount - previous
+            if address in self.whales and amount != previous:
+                self.whale_transfers.add(timestamp)
+        if address == self.reserve_account:
+            self._record_reserve(timestamp, amount)
+
+    def on_transfer(self, timestamp: float, address: str) -> None:
+        """Historical balance change (backfill); the balance snapshot is already current."""
+        if address in self.whales:
+            self.whale_transfers.add(timestamp)
+
+    def _record_reserve(self, timestamp: float, reserve: int) -> None:
+        bucket = int(timestamp // self.bucket_seconds)
+        if self._reserves and self._reserves[-1][0] >= bucket:
+            self._reserves[-1][2] = reserve
+        else:
+            self._reserves.append([bucket, reserve, reserve])
+
+    def _liquidity_change(self, now: float) -> float:
+        oldest = int(now // self.bucket_seconds) - self.n_buckets + 1
+        # Keep the last bucket before the window: its final reserve is the baseline
+        while len(self._reserves) > 1 and self._reserves[1][0] < oldest:
+            self._reserves.popleft()
+        if not self._reserves:
+            return 0.0
+        first = self._reserves[0]
+        baseline = first[2] if first[0] < oldest else first[1]
+        current = self._reserves[-1][2]
+        return round(current / baseline - 1, 4) if baseline else 0.0
+
+    def metrics(self, now: float) -> Dict[str, object]:
+        return {
+            "protocol": self.protocol,
+            "volume_24h": round(self.transactions.sum(now) * self.avg_trade_usd, 2),
+            "liquidity_change": self._liquidity_change(now),
+            "whale_transfers": int(self.whale_transfers.sum(now)),
+            "holder_concentration": round(self.holder_total / self.supply, 3) if self.supply else 0.0,
+        }
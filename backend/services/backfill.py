@@ -0,0 +1,339 @@
+"""
+SignatureBackfill
+-----------------
+Concurrent, resumable walk of an address's transaction history, for
+cold-starting the streaming feature aggregates.
+
+``getSignaturesForAddress`` pages (newest first, ``before`` cursor) are
+walked back to ``since``; the next page is requested while the current
+one's transactions are fetched with ``getTransaction`` under a bounded
+number of concurrent calls, each retried with jittered exponential
+backoff. Parsed transactions are yielded as they arrive by an async
+generator, so a consumer (``feed`` into a ``FeatureAggregator``) never
+holds the history in memory.
+
+Progress is tracked in a ``BackfillCheckpoint``: the page cursor plus the
+signatures already yielded from the current page, saved after every
+page. A run that fails or is interrupted resumes where it stopped without
+yielding a transaction twice; a run that completed records the newest
+signature it saw and the next run only catches up to it.
+
+When a live subscription covers the newest history, ``pin_head`` bounds
+a fresh walk at the newest signature seen at subscribe time and ``skip``
+holds signatures the live side already counted; ``feed`` adds the ones
+it applies near the head, so the overlap is counted once either way.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .rpc_client import AsyncRpcClient, RpcError
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000  # getSignaturesForAddress maximum
+
+
+class TokenTransfer(NamedTuple):
+    account: str
+    mint: str
+    delta: int  # raw units; negative when tokens leave ``account``
+
+
+class BackfillTransaction(NamedTuple):
+    signature: str
+    block_time: Optional[int]
+    failed: bool
+    transfers: Tuple[TokenTransfer, ...]
+
+
+class BackfillCheckpoint:
+    """Resume state of one address's backfill, persisted as JSON."""
+
+    def __init__(
+        self,
+        address: str,
+        before: Optional[str] = None,
+        until: Optional[str] = None,
+        head: Optional[str] = None,
+        page_done: Iterable[str] = (),
+        processed: int = 0,
+        complete: bool = False,
+    ) -> None:
+        self.address = address
+        self.before = before  # cursor: last signature of the last finished page
+        self.until = until  # newest signature of the last completed pass
+        self.head = head  # newest signature of the current pass
+        self.page_done = set(page_done)  # yielded signatures of the unfinished page
+        self.processed = processed
+        self.complete = complete
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "before": self.before,
+            "until": self.until,
+            "head": self.head,
+            "page_done": sorted(self.page_done),
+            "processed": self.processed,
+            "complete": self.complete,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BackfillCheckpoint":
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path: str, address: str) -> "BackfillCheckpoint":
+        """Checkpoint stored at ``path``, or a fresh one when there is none for ``address``."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(address)
+        if data.get("address") != address:
+            return cls(address)
+        return cls.from_dict(data)
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+
+def parse_transaction(signature: str, tx: Dict[str, Any], mint: Optional[str] = None) -> BackfillTransaction:
+    """Token balance changes of a ``getTransaction`` result (``json`` or ``jsonParsed``)."""
+    meta = tx.get("meta") or {}
+    keys = [k["pubkey"] if isinstance(k, dict) else k for k in tx["transaction"]["message"]["accountKeys"]]
+
+    balances: Dict[Tuple[int, str], List[int]] = {}
+    for position, field in ((0, "preTokenBalances"), (1, "postTokenBalances")):
+        for entry in meta.get(field) or ():
+            if mint is not None and entry["mint"] != mint:
+                continue
+            amounts = balances.setdefault((entry["accountIndex"], entry["mint"]), [0, 0])
+            amounts[position] = int(entry["uiTokenAmount"]["amount"])
+
+    transfers = tuple(
+        TokenTransfer(keys[index], token, post - pre)
+        for (index, token), (pre, post) in balances.items()
+        if post != pre
+    )
+    return BackfillTransaction(signature, tx.get("blockTime"), meta.get("err") is not None, transfers)
+
+
+class SignatureBackfill:
+    def __init__(
+        self,
+        client: AsyncRpcClient,
+        address: str,
+        mint: Optional[str] = None,
+        since: Optional[float] = None,
+        checkpoint: Optional[BackfillCheckpoint] = None,
+        checkpoint_path: Optional[str] = None,
+        page_size: int = PAGE_SIZE,
+        max_parallel: int = 16,
+        max_retries: int = 4,
+        backoff: float = 0.2,
+        skip: Optional[Set[str]] = None,
+    ) -> None:
+        """
+        Args:
+            client: RPC client used for all calls
+            address: account whose history is walked (usually a program id)
+            mint: only report balance changes of this mint
+            since: unix time; older signatures end the walk (None walks everything)
+            checkpoint: resume state; loaded from ``checkpoint_path`` when omitted
+            checkpoint_path: JSON file the checkpoint is saved to after each page
+            page_size: signatures per getSignaturesForAddress page
+            max_parallel: getTransaction calls in flight at once
+            max_retries: retries per call after the first failure
+            backoff: base delay in seconds, doubled on every retry
+            skip: signatures already counted elsewhere (the live stream); shared, not copied
+        """
+        self.client = client
+        self.address = address
+        self.mint = mint
+        self.since = since
+        self.checkpoint_path = checkpoint_path
+        if checkpoint is None:
+            checkpoint = (
+                BackfillCheckpoint.load(checkpoint_path, address) if checkpoint_path
+                else BackfillCheckpoint(address)
+            )
+        self.checkpoint = checkpoint
+        self.page_size = page_size
+        self.max_parallel = max_parallel
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.skip = skip
+        # Newest signature entry at subscribe time; yielded with the first page
+        self._pinned: Optional[Dict[str, Any]] = None
+        # ``feed`` records applied signatures at least this new in ``skip``
+        self.overlap_since: Optional[float] = None
+
+        self.pages = 0
+        self.fetched = 0
+        self.retries = 0
+        self.missing = 0
+        self.skipped = 0
+
+    async def _with_retries(self, method: str, params: list) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.client.call(method, params)
+            except RpcError as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                logger.debug(f"{method} failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _fetch_page(self, before: Optional[str]) -> List[Dict[str, Any]]:
+        options: Dict[str, Any] = {"limit": self.page_size, "commitment": "confirmed"}
+        if before is not None:
+            options["before"] = before
+        if self.checkpoint.until is not None:
+            options["until"] = self.checkpoint.until
+        page = await self._with_retries("getSignaturesForAddress", [self.address, options])
+        self.pages += 1
+        return page
+
+    async def _fetch_transaction(self, semaphore: asyncio.Semaphore, info: Dict[str, Any]) -> Optional[BackfillTransaction]:
+        signature = info["signature"]
+        if info.get("err") is not None:
+            # Failed transactions move no tokens; the signature entry is enough
+            return BackfillTransaction(signature, info.get("blockTime"), True, ())
+        async with semaphore:
+            tx = await self._with_retries(
+                "getTransaction",
+                [signature, {"encoding": "json", "maxSupportedTransactionVersion": 0, "commitment": "confirmed"}],
+            )
+        self.fetched += 1
+        if tx is None:
+            self.missing += 1  # pruned by the node or not yet confirmed
+            return None
+        return parse_transaction(signature, tx, self.mint)
+
+    @property
+    def in_progress(self) -> bool:
+        """A pass has started and not completed; resuming it keeps its bounds."""
+        cp = self.checkpoint
+        return not cp.complete and (cp.before is not None or cp.head is not None)
+
+    async def pin_head(self) -> Optional[str]:
+        """Bound the next pass at the newest signature now; returns it (None when nothing is newer).
+
+        Signatures newer than the pinned one are left to the live stream.
+        After a completed pass this starts a catch-up pass down to its head;
+        a pass in progress keeps its own bounds.
+        """
+        cp = self.checkpoint
+        if self.in_progress:
+            return None
+        if cp.complete:
+            cp.before, cp.until, cp.head, cp.complete = None, cp.head, None, False
+        options = {"limit": 1, "commitment": "confirmed"}
+        if cp.until is not None:
+            options["until"] = cp.until
+        newest = await self._with_retries("getSignaturesForAddress", [self.address, options])
+        if not newest:
+            return None
+        self._pinned = newest[0]
+        cp.before = cp.head = self._pinned["signature"]
+        return cp.head
+
+    def _save(self) -> None:
+        if self.checkpoint_path:
+            self.checkpoint.save(self.checkpoint_path)
+
+    async def transactions(self) -> AsyncIterator[BackfillTransaction]:
+        """Yield parsed transactions newest page first (completion order within a page)."""
+        cp = self.checkpoint
+        if cp.complete:
+            # New pass from the head, stopping at the newest signature already covered
+            cp.before, cp.until, cp.head, cp.complete = None, cp.head, None, False
+
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        next_page: Optional[asyncio.Task] = asyncio.ensure_future(self._fetch_page(cp.before))
+        pending: List[asyncio.Task] = []
+        try:
+            while next_page is not None:
+                raw = await next_page
+                if self._pinned is not None:
+                    # ``before`` excludes the pinned signature itself; walk it with the first page
+                    raw = [self._pinned] + raw
+                page = [s for s in raw if self.since is None or (s.get("blockTime") or 0) >= self.since]
+                finished = len(raw) < self.page_size + (self._pinned is not None) or len(page) < len(raw)
+                # Request the next page while this one's transactions are fetched
+                next_page = None if finished else asyncio.ensure_future(self._fetch_page(raw[-1]["signature"]))
+
+                if cp.head is None and page:
+                    cp.head = page[0]["signature"]
+                if self.skip:
+                    self.skipped += sum(1 for info in page if info["signature"] in self.skip)
+                pending = [
+                    asyncio.ensure_future(self._fetch_transaction(semaphore, info))
+                    for info in page
+                    if info["signature"] not in cp.page_done and not (self.skip and info["signature"] in self.skip)
+                ]
+                for fut in asyncio.as_completed(pending):
+                    tx = await fut
+                    if tx is None:
+                        continue
+                    cp.page_done.add(tx.signature)
+                    cp.processed += 1
+                    yield tx
+
+                if page:
+                    cp.before = page[-1]["signature"]
+                cp.page_done.clear()
+                self._pinned = None
+                if finished:
+                    if cp.head is None:
+                        cp.head = cp.until  # nothing new: the next pass still stops there
+                    cp.complete = True
+                self._save()
+        finally:
+            for task in pending + ([next_page] if next_page is not None else []):
+                task.cancel()
+            if not cp.complete:
+                self._save()  # keep the signatures already yielded from this page
+
+    async def feed(self, aggregator) -> int:
+        """Apply the history to a ``FeatureAggregator``; returns transactions applied."""
+        applied = 0
+        async for tx in self.transactions():
+            if self.skip is not None:
+                if tx.signature in self.skip:
+                    self.skipped += 1  # counted by the live stream while this page was fetched
+                    continue
+                if tx.block_time is None or self.overlap_since is None or tx.block_time >= self.overlap_since:
+                    self.skip.add(tx.signature)
+            timestamp = tx.block_time if tx.block_time is not None else time.time()
+            aggregator.on_transaction(timestamp, failed=tx.failed)
+            for transfer in tx.transfers:
+                aggregator.on_transfer(timestamp, transfer.account)
+            applied += 1
+        return applied
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "processed": self.checkpoint.processed,
+            "complete": self.checkpoint.complete,
+            "pages": self.pages,
+            "fetched": self.fetched,
+            "retries": self.retries,
+            "missing": self.missing,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,364 @@
+"""
+StreamIngestor
+--------------
+Websocket ingestion of on-chain events into per-protocol
+``FeatureAggregator`` state, so features no longer require rescanning
+history by polling.
+
+For each protocol the ingestor snapshots the mint supply and largest
+holders over RPC, then subscribes to:
+
+- ``logsSubscribe`` mentioning the protocol program (one notification per
+  transaction)
+- ``accountSubscribe`` on the mint (supply) and on the top holder token
+  accounts (balances, whale transfers and the liquidity reserve)
+
+It runs as a task on ``SolanaService.loop`` and reconnects (re-snapshotting
+first) with exponential backoff when the socket drops.
+
+With ``backfill`` enabled, the last 24h of each program's history is
+replayed into the aggregators by ``SignatureBackfill`` once the first
+subscriptions are live, so window features are complete from the start.
+The walk is bounded at the newest signature seen at subscribe time, and
+transactions both sides see (confirmed between subscribing and pinning
+that bound) are counted once. After a reconnect, a catch-up pass walks
+back to the previous pass's bound, so events missed during the gap are
+applied too; until it completes the window counts as partial. A backfill
+that fails resumes from its checkpoint on the next reconnect.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+
+from .accounts import account_bytes, decode_mint, decode_token_account_amount
+from .aggregates import WINDOW_SECONDS, FeatureAggregator
+from .backfill import SignatureBackfill
+from .protocol_registry import lookup_protocol
+from .rpc_client import RpcError
+from .solana_service import TOP_HOLDERS, WHALE_ACCOUNTS
+
+logger = logging.getLogger(__name__)
+
+# Block times vs. the local clock: backfilled transactions this close to
+# the subscription time may also arrive as live notifications
+OVERLAP_SLACK_SECONDS = 60.0
+
+
+class StreamIngestor:
+    def __init__(
+        self,
+        solana_service,
+        ws_url: str,
+        protocols: Iterable[str],
+        clock: Callable[[], float] = time.time,
+        max_backoff: float = 30.0,
+        backfill: bool = False,
+        backfill_parallel: int = 16,
+    ) -> None:
+        """
+        Args:
+            solana_service: SolanaService whose loop, RPC client and registry are used
+            ws_url: websocket endpoint of the RPC node
+            protocols: protocol names to follow
+            clock: timestamp source for events (notifications carry no block time)
+            max_backoff: upper bound of the reconnect delay in seconds
+            backfill: replay the last 24h of program history after subscribing
+            backfill_parallel: getTransaction calls in flight per protocol backfill
+        """
+        self.service = solana_service
+        self.ws_url = ws_url
+        self.protocols = list(protocols)
+        self.clock = clock
+        self.max_backoff = max_backoff
+        self.backfill = backfill
+        self.backfill_parallel = backfill_parallel
+        self.backfills: Dict[str, SignatureBackfill] = {}
+        self._backfill_tasks: Dict[str, asyncio.Task] = {}
+        # protocol -> signatures counted by either side while the backfill overlaps the stream;
+        # tracked from subscribing, since notifications can beat the backfill's bound
+        self._counted: Dict[str, Set[str]] = {p.lower(): set() for p in self.protocols} if backfill else {}
+        # protocols missing events (no pass yet, or a disconnect since) until a pass bounded
+        # on the current connection completes
+        self._gap: Set[str] = set()
+        self._connection = 0
+        self._pinned_connection: Dict[str, int] = {}
+        self._subscribed_at: Optional[float] = None
+
+        self.aggregators: Dict[str, FeatureAggregator] = {}
+        # subscription id -> (aggregator, kind, address)
+        self._subscriptions: Dict[int, Tuple[FeatureAggregator, str, str]] = {}
+
+        self._task: Optional[asyncio.Future] = None
+        self._task_pid: Optional[int] = None
+        self.connected = False
+
+        self.events = 0
+        self.decode_errors = 0
+        self.reconnects = 0
+        self.duplicates = 0
+
+    # ------------------------------------------------------------- lifecycle
+
+    def start(self) -> None:
+        """Schedule ingestion on the service loop; after fork, call again in the child."""
+        pid = os.getpid()
+        if self._task is not None and self._task_pid == pid and not self._task.done():
+            return
+        self.connected = False  # state inherited across fork is stale until resubscribed
+        self._task_pid = pid
+        self._task = asyncio.run_coroutine_threadsafe(self.run(), self.service.loop)
+
+    def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self.connected = False
+
+    def wait_ready(self, timeout: float = 10.0) -> bool:
+        """Block until every subscription is confirmed (for tests and warmup)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.connected:
+                return True
+            if self._task is not None and self._task.done():
+                self._task.result()
+            time.sleep(0.01)
+        return False
+
+    # --------------------------------------------------------------- session
+
+    async def run(self) -> None:
+        backoff = 0.5
+        try:
+            async with aiohttp.ClientSession() as session:
+                while True:
+                    try:
+                        await self._bootstrap()
+                        async with session.ws_connect(self.ws_url, heartbeat=30, max_msg_size=0) as ws:
+                            self._begin_connection()
+                            await self._subscribe(ws)
+                            self.connected = True
+                            backoff = 0.5
+                            logger.info(f"Streaming {len(self._subscriptions)} subscriptions from {self.ws_url}")
+                            self._start_backfill()
+                            async for msg in ws:
+                                if msg.type == aiohttp.WSMsgType.TEXT:
+                                    self.handle_message(msg.data)
+                                elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                                    break
+                    except asyncio.CancelledError:
+                        raise
+                    except (aiohttp.ClientError, RpcError, OSError, asyncio.TimeoutError) as e:
+                        logger.warning(f"Stream ingestion disconnected: {e}")
+                    except Exception:
+                        # e.g. an unexpected snapshot shape; retrying beats ending ingestion for good
+                        logger.exception("Stream ingestion failed, reconnecting")
+                    self.connected = False
+                    self.reconnects += 1
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            for task in self._backfill_tasks.values():
+                task.cancel()
+
+    def _begin_connection(self) -> None:
+        """Before subscribing: every protocol misses events from here until a pass bounded on
+        this connection completes, and live signatures are recorded for the overlap."""
+        self._subscribed_at = self.clock()
+        if not self.backfill:
+            return
+        self._connection += 1
+        for key, counted in self._counted.items():
+            task = self._backfill_tasks.get(key)
+            if task is None or task.done():
+                counted.clear()  # only the coming pass can overlap this connection
+            self._gap.add(key)
+
+    def _start_backfill(self) -> None:
+        """Start the history backfill, or a catch-up pass after a reconnect, per protocol.
+
+        A pass still running finishes its walk and then catches up itself.
+        """
+        if not self.backfill:
+            return
+        for name in self.protocols:
+            task = self._backfill_tasks.get(name.lower())
+            if task is None or task.done():
+                self._backfill_tasks[name.lower()] = asyncio.ensure_future(self._backfill_protocol(name))
+
+    async def _backfill_protocol(self, name: str) -> int:
+        """Run passes for ``name`` until one bounded on the current connection completes."""
+        key = name.lower()
+        job = self.backfills.get(key)
+        if job is None:
+            entry = lookup_protocol(name, self.service.registry)
+            job = SignatureBackfill(
+                self.service.client, entry.program_id, mint=entry.mint,
+                max_parallel=self.backfill_parallel, skip=self._counted[key],
+            )
+            self.backfills[key] = job
+        applied = 0
+        try:
+            while key in self._gap:
+                job.since = self.clock() - WINDOW_SECONDS
+                if not job.in_progress:
+                    # Subscriptions are confirmed: anything newer than the pinned head arrives live
+                    self._pinned_connection[key] = self._connection
+                    job.overlap_since = self._subscribed_at - OVERLAP_SLACK_SECONDS
+                    await job.pin_head()
+                applied += await job.feed(self.aggregators[key])
+                if self._pinned_connection.get(key) == self._connection:
+                    self._gap.discard(key)
+        except (RpcError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"History backfill of {name} stopped, will resume on reconnect: {e}")
+            return applied
+        logger.info(f"History backfill of {name} applied {applied} transactions")
+        return applied
+
+    def wait_backfilled(self, timeout: float = 60.0) -> bool:
+        """Block until every protocol's window is filled by a completed pass (for tests and warmup)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if len(self.backfills) == len(self.protocols) and all(
+                self.covers_window(name) for name in self.protocols
+            ):
+                return True
+            time.sleep(0.01)
+        return False
+
+    async def _bootstrap(self) -> None:
+        """Snapshot supply and top holders for every protocol over RPC."""
+        entries = [lookup_protocol(p, self.service.registry) for p in self.protocols]
+        client = self.service.client
+        calls: List[Tuple[str, list]] = []
+        for entry in entries:
+            calls.append(("getTokenSupply", [entry.mint]))
+            calls.append(("getTokenLargestAccounts", [entry.mint]))
+        results = await self.service.batch_calls(calls)
+
+        now = self.clock()
+        for i, (name, entry) in enumerate(zip(self.protocols, entries)):
+            supply = int(results[2 * i]["value"]["amount"])
+            holders = [(h["address"], int(h["amount"])) for h in results[2 * i + 1]["value"][:TOP_HOLDERS]]
+            aggregator = self.aggregators.get(name.lower())
+            if aggregator is None:
+                aggregator = FeatureAggregator(name, self.service.avg_trade_usd)
+                self.aggregators[name.lower()] = aggregator
+            if entry.pool is not None:
+                balance = await client.call("getTokenAccountBalance", [entry.pool])
+                reserve_account, reserve = entry.pool, int(balance["value"]["amount"])
+            else:
+                reserve_account, reserve = holders[0] if holders else (None, None)
+            aggregator.seed(
+                holders, supply,
+                whales=[address for address, _ in holders[:WHALE_ACCOUNTS]],
+                reserve_account=reserve_account,
+                reserve=reserve,
+                now=now,
+            )
+
+    async def _subscribe(self, ws) -> None:
+        pending: Dict[int, Tuple[FeatureAggregator, str, str]] = {}
+        request_id = 0
+        for name in self.protocols:
+            entry = lookup_protocol(name, self.service.registry)
+            aggregator = self.aggregators[name.lower()]
+            targets = [("logs", entry.program_id), ("mint", entry.mint)]
+            targets += [("token", address) for address in aggregator.holder_balances]
+            if aggregator.reserve_account is not None and aggregator.reserve_account not in aggregator.holder_balances:
+                targets.append(("token", aggregator.reserve_account))
+            for kind, address in targets:
+                request_id += 1
+                if kind == "logs":
+                    method, params = "logsSubscribe", [{"mentions": [address]}, {"commitment": "confirmed"}]
+                else:
+                    method, params = "accountSubscribe", [address, {"encoding": "base64", "commitment": "confirmed"}]
+                await ws.send_str(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+                pending[request_id] = (aggregator, kind, address)
+
+        self._subscriptions = {}
+        while pending:
+            raw = await ws.receive_str(timeout=self.service.rpc_timeout)
+            response = json.loads(raw)
+            if "method" in response:
+                self.handle_message(raw)  # notification for an already confirmed subscription
+            elif response.get("id") in pending:
+                target = pending.pop(response["id"])
+                if "error" in response:
+                    raise RpcError(f"Subscription failed: {response['error']}")
+                self._subscriptions[response["result"]] = target
+
+    # ---------------------------------------------------------------- events
+
+    def handle_message(self, raw: str) -> None:
+        """Apply one websocket notification; O(1) per event."""
+        try:
+            message = json.loads(raw)
+            params = message["params"]
+            target = self._subscriptions.get(params["subscription"])
+            if target is None:
+                return
+            aggregator, kind, address = target
+            value = params["result"]["value"]
+            now = self.clock()
+
+            if kind == "logs":
+                counted = self._counted.get(aggregator.protocol.lower())
+                if counted is not None:
+                    signature = value.get("signature")
+                    if signature in counted:
+                        self.duplicates += 1  # already applied by the backfill
+                        return
+                    if aggregator.protocol.lower() in self._gap:
+                        counted.add(signature)
+                aggregator.on_transaction(now, failed=value.get("err") is not None)
+            elif kind == "mint":
+                aggregator.on_supply(now, decode_mint(account_bytes(value))["supply"])
+            else:
+                aggregator.on_token_account(now, address, decode_token_account_amount(account_bytes(value)))
+            self.events += 1
+        except (KeyError, TypeError, ValueError) as e:
+            self.decode_errors += 1
+            logger.debug(f"Undecodable stream message: {e}")
+
+    def covers_window(self, protocol: str) -> bool:
+        """Whether the aggregates of ``protocol`` span the full 24h window.
+
+        With ``backfill`` that is once a pass bounded on the current connection
+        completed (the first one, or the catch-up after a reconnect); without
+        it, once the current connection has streamed for a whole window (a
+        reconnect starts over, since the gap's events are lost).
+        """
+        if self.backfill:
+            key = protocol.lower()
+            return key in self.backfills and key not in self._gap and self.backfills[key].checkpoint.complete
+        return self._subscribed_at is not None and self.clock() - self._subscribed_at >= WINDOW_SECONDS
+
+    def metrics(self, protocol: str) -> Optional[Dict[str, Any]]:
+        """Live features for ``protocol``, or ``None`` when not streaming it or the window is partial."""
+        if not self.connected:
+            return None
+        aggregator = self.aggregators.get(protocol.lower())
+        if aggregator is None or not self.covers_window(protocol):
+            return None  # partial windows would under-report; callers fall back to polling
+        return {**aggregator.metrics(self.clock()), "protocol": protocol}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ws_url": self.ws_url,
+            "connected": self.connected,
+            "protocols": len(self.aggregators),
+            "subscriptions": len(self._subscriptions),
+            "events": self.events,
+            "decode_errors": self.decode_errors,
+            "reconnects": self.reconnects,
+            "duplicates": self.duplicates,
+            "backfill": {name: job.stats() for name, job in self.backfills.items()} if self.backfill else None,
+        }
@@ -0,0 +1,167 @@
+"""
+MetricsCache
+------------
+Stale-while-revalidate cache with single-flight fetches, for protocol
+metrics that are expensive to compute over RPC.
+
+For each key:
+
+- younger than ``soft_ttl``: served from cache (``hits``)
+- between ``soft_ttl`` and ``hard_ttl``: the cached value is served
+  immediately (``stale_served``) and one background refresh is started
+- missing or older than ``hard_ttl``: the caller waits for a fetch
+
+Concurrent callers waiting for the same key share a single in-flight
+fetch (``coalesced``) instead of each issuing their own. Keys missing
+from a ``get_many`` call are fetched together in one ``fetch_many`` call.
+
+All methods must run on one event loop; callers in other threads go
+through ``asyncio.run_coroutine_threadsafe`` (as ``SolanaService`` does),
+which is what makes the in-flight table safe without locks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FetchMany = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class MetricsCache:
+    def __init__(
+        self,
+        soft_ttl: float = 30.0,
+        hard_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if hard_ttl < soft_ttl:
+            raise ValueError("hard_ttl must be >= soft_ttl")
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self._clock = clock
+
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_served = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Cached ``(value, age_seconds)`` regardless of TTL, or ``None``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], self._clock() - entry[1]
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def forget_inflight(self) -> None:
+        """Drop in-flight tasks belonging to a loop that no longer runs (e.g. after fork)."""
+        self._inflight.clear()
+        self._background.clear()
+
+    async def get(self, key: Hashable, fetch_many: FetchMany) -> Any:
+        return (await self.get_many([key], fetch_many))[key]
+
+    async def get_many(self, keys: Sequence[Hashable], fetch_many: FetchMany) -> Dict[Hashable, Any]:
+        now = self._clock()
+        results: Dict[Hashable, Any] = {}
+        stale: List[Hashable] = []
+        waiting: Dict[Hashable, asyncio.Task] = {}
+        missing: List[Hashable] = []
+
+        for key in dict.fromkeys(keys):
+            entry = self._entries.get(key)
+            age = now - entry[1] if entry is not None else None
+
+            if age is not None and age < self.soft_ttl:
+                self.hits += 1
+                results[key] = entry[0]
+            elif age is not None and age < self.hard_ttl:
+                self.stale_served += 1
+                results[key] = entry[0]
+                if key not in self._inflight:
+                    stale.append(key)
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if stale:
+            task = self._start_fetch(stale, fetch_many)
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+
+        if missing:
+            task = self._start_fetch(missing, fetch_many)
+            waiting.update((key, task) for key in missing)
+
+        # shield: a caller giving up must not cancel a fetch other callers share
+        for task in set(waiting.values()):
+            values = await asyncio.shield(task)
+            results.update((key, values[key]) for key, t in waiting.items() if t is task)
+
+        return results
+
+    def _start_fetch(self, keys: List[Hashable], fetch_many: FetchMany) -> asyncio.Task:
+        async def run() -> Dict[Hashable, Any]:
+            try:
+                values = await fetch_many(keys)
+                fetched_at = self._clock()
+                for key in keys:
+                    self._entries[key] = (values[key], fetched_at)
+                return values
+            finally:
+                for key in keys:
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+
+        task = asyncio.get_running_loop().create_task(run())
+        # Mark the exception retrieved even if every waiter was cancelled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight.update((key, task) for key in keys)
+        return task
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            self.refreshes += 1
+        else:
+            # Keep serving the stale value; the next stale read retries
+            self.refresh_failures += 1
+            logger.warning(f"Background metrics refresh failed: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_served + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "soft_ttl": self.soft_ttl,
+            "hard_ttl": self.hard_ttl,
+            "hits": self.hits,
+            "stale_served": self.stale_served,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "inflight": len(self._inflight),
+            "hit_rate": round((self.hits + self.stale_served) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,497 @@
+"""
+MockRpcServer
+-------------
+Local stand-in for a Solana JSON-RPC endpoint, used by tests and
+benchmarks so they run offline.
+
+Responses are deterministic functions of the requested address (and of
+``epoch``, which callers can bump to simulate on-chain state changing).
+Addresses are served as SPL mints unless they are known token accounts
+(largest-holder accounts it has handed out, or ones registered with
+``add_token_account``). JSON-RPC batch requests are supported.
+
+Every HTTP request is delayed by ``latency_ms`` to model network round
+trips. A ``slow_rate`` fraction of requests takes ``slow_latency_ms``
+instead (tail latency) and an ``http_error_rate`` fraction is answered
+with HTTP 503, for exercising multi-endpoint routing.
+
+Signature history is paginated (``before``/``until``) and each signature
+resolves through ``getTransaction``; transactions of programs registered
+with ``add_program`` move balances between holders of the program's mint.
+``inject_errors`` makes the next calls of a method fail, to exercise
+client retries.
+
+A websocket endpoint at ``ws_url`` accepts ``logsSubscribe`` and
+``accountSubscribe`` and pushes notifications when ``replay`` is called
+with a recorded event stream (see ``record_events``).
+
+The server runs its own event loop in a daemon thread:
+
+    with MockRpcServer(latency_ms=20) as server:
+        service = SolanaService(demo_mode=False, rpc_url=server.url)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+TOKEN_DECIMALS = 6
+LARGEST_ACCOUNTS = 20
+
+
+def _b58encode(data: bytes) -> str:
+    n = int.from_bytes(data, "big")
+    out = []
+    while n:
+        n, rem = divmod(n, 58)
+        out.append(_B58_ALPHABET[rem])
+    pad = len(data) - len(data.lstrip(b"\0"))
+    return "1" * pad + "".join(reversed(out))
+
+
+def _digest(*parts: Any) -> bytes:
+    return hashlib.sha256("|".join(str(p) for p in parts).encode()).digest()
+
+
+def _unit(*parts: Any) -> float:
+    """Deterministic float in [0, 1) derived from ``parts``."""
+    return int.from_bytes(_digest(*parts)[:8], "big") / 2**64
+
+
+class MockRpcServer:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        slow_rate: float = 0.0,
+        slow_latency_ms: float = 0.0,
+        http_error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.slow_rate = slow_rate
+        self.slow_latency_ms = slow_latency_ms
+        self.http_error_rate = http_error_rate
+        self._rng = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.epoch = 0
+
+        # token account address -> (mint, raw amount), filled as holders are generated
+        self._token_accounts: Dict[str, tuple] = {}
+        self._signature_cache: Dict[tuple, List[str]] = {}
+        self._signature_index: Dict[str, tuple] = {}  # signature -> (address, epoch, index)
+        # address -> (signature count, seconds of history); default ~48h of activity
+        self._history: Dict[str, tuple] = {}
+        # address -> block times of transactions added on top of the history (negative indices)
+        self._added: Dict[str, List[int]] = {}
+        self._programs: Dict[str, str] = {}  # program id -> mint
+        self._injected_errors: Dict[str, int] = {}
+        self._started = int(time.time())
+
+        self.http_requests = 0
+        self.rpc_calls = 0
+        self.method_counts: Dict[str, int] = {}
+        self.connections: set = set()
+
+        # websocket clients: (ws, {(kind, target): [subscription ids]})
+        self._ws_clients: List[tuple] = []
+        self._next_subscription = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._ready = threading.Event()
+
+    # ------------------------------------------------------------------ state
+
+    def token_supply(self, mint: str) -> int:
+        units = 10 ** 8 + int(_unit("supply", mint) * 9 * 10 ** 9)
+        return units * 10 ** TOKEN_DECIMALS
+
+    def largest_accounts(self, mint: str) -> List[Dict[str, Any]]:
+        """Top holders: a geometric split of a mint-specific share of supply."""
+        supply = self.token_supply(mint)
+        top_share = 0.05 + 0.7 * _unit("concentration", mint, self.epoch)
+        ratio = 0.8
+        weights = [ratio ** i for i in range(LARGEST_ACCOUNTS)]
+        top10 = sum(weights[:10])
+
+        accounts = []
+        for i, weight in enumerate(weights):
+            address = _b58encode(_digest("holder", mint, i))
+            amount = int(supply * top_share * weight / top10)
+            self._token_accounts[address] = (mint, amount)
+            accounts.append({
+                "address": address,
+                "amount": str(amount),
+                "decimals": TOKEN_DECIMALS,
+                "uiAmount": amount / 10 ** TOKEN_DECIMALS,
+                "uiAmountString": str(amount / 10 ** TOKEN_DECIMALS),
+            })
+        return accounts
+
+    def token_account_amount(self, address: str) -> int:
+        if address in self._token_accounts:
+            return self._token_accounts[address][1]
+        return int((0.5 + _unit("balance", address, self.epoch)) * 10 ** 9) * 10 ** TOKEN_DECIMALS
+
+    def add_token_account(self, address: str, mint: str, amount: int) -> None:
+        self._token_accounts[address] = (mint, amount)
+
+    def account_info(self, address: str) -> Dict[str, Any]:
+        """Base64 account in SPL Token layout (mint or token account)."""
+        if address in self._token_accounts:
+            mint, amount = self._token_accounts[address]
+            data = bytearray(165)
+            data[0:32] = _digest("mint-key", mint)
+            data[32:64] = _digest("owner", address)
+            struct.pack_into("<Q", data, 64, amount)
+            data[108] = 1  # initialized
+        else:
+            data = bytearray(82)
+            struct.pack_into("<Q", data, 36, self.token_supply(address))
+            data[44] = TOKEN_DECIMALS
+            data[45] = 1  # is_initialized
+        return {
+            "data": [base64.b64encode(bytes(data)).decode(), "base64"],
+            "executable": False,
+            "lamports": 2_039_280,
+            "owner": "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA",
+            "rentEpoch": 0,
+            "space": len(data),
+        }
+
+    def set_history(self, address: str, count: int, span_seconds: float = 2 * 86400) -> None:
+        """Give ``address`` ``count`` signatures spread over the last ``span_seconds``."""
+        self._history[address] = (count, span_seconds)
+
+    def add_transactions(self, address: str, count: int) -> List[str]:
+        """Confirm ``count`` new transactions of ``address`` now; returns their signatures, newest first.
+
+        They are not pushed to websocket subscribers (as if sent while a client was disconnected).
+        """
+        added = self._added.setdefault(address, [])
+        added.extend([int(time.time())] * count)
+        return [self._signature(address, -i) for i in range(len(added), len(added) - count, -1)]
+
+    def add_program(self, program_id: str, mint: str) -> None:
+        """Make transactions of ``program_id`` carry token balance changes of ``mint`` holders."""
+        self._programs[program_id] = mint
+
+    def inject_errors(self, method: str, count: int) -> None:
+        """Fail the next ``count`` calls of ``method`` with a transient server error."""
+        self._injected_errors[method] = self._injected_errors.get(method, 0) + count
+
+    def _history_of(self, address: str) -> tuple:
+        if address in self._history:
+            return self._history[address]
+        return int(_unit("activity", address, self.epoch) * 1000), 2 * 86400
+
+    def signatures(
+        self, address: str, limit: int = 1000, before: Optional[str] = None, until: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """One page of signatures, newest first, spread evenly over the history span."""
+        count, _ = self._history_of(address)
+        added = len(self._added.get(address, ()))
+        start = self._signature_position(address, before) + 1 if before else 0
+        stop = self._signature_position(address, until) if until else count + added
+        return [self._signature_info(address, i - added) for i in range(start, min(stop, start + limit))]
+
+    def _signature_position(self, address: str, signature: str) -> int:
+        entry = self._signature_index.get(signature)
+        if entry is None or entry[:2] != (address, self.epoch):
+            raise ValueError(f"unknown signature {signature}")
+        return entry[2] + len(self._added.get(address, ()))
+
+    def _signature_info(self, address: str, index: int) -> Dict[str, Any]:
+        count, span = self._history_of(address)
+        if index < 0:
+            block_time = self._added[address][-index - 1]
+        else:
+            block_time = int(self._started - index * span / max(count, 1))
+        return {
+            "signature": self._signature(address, index),
+            "slot": 250_000_000 - index,
+            "err": {"InstructionError": [0, "Custom"]} if _unit("failed", address, index) < 0.05 else None,
+            "memo": None,
+            "blockTime": block_time,
+            "confirmationStatus": "finalized",
+        }
+
+    def _signature(self, address: str, index: int) -> str:
+        if index < 0:  # added by add_transactions
+            signature = _b58encode(_digest("new-sig", address, self.epoch, index) * 2)
+            self._signature_index[signature] = (address, self.epoch, index)
+            return signature
+        # base58 encoding dominates the mock's CPU time; cache per (address, epoch)
+        key = (address, self.epoch)
+        cached = self._signature_cache.setdefault(key, [])
+        while len(cached) <= index:
+            signature = _b58encode(_digest("sig", address, self.epoch, len(cached)) * 2)
+            self._signature_index[signature] = (address, self.epoch, len(cached))
+            cached.append(signature)
+        return cached[index]
+
+    def transaction(self, signature: str) -> Optional[Dict[str, Any]]:
+        """``getTransaction`` result (``json`` encoding), or ``None`` for unknown signatures."""
+        entry = self._signature_index.get(signature)
+        if entry is None:
+            return None
+        address, _, index = entry
+        info = self._signature_info(address, index)
+        account_keys = [_b58encode(_digest("fee-payer", signature)), address]
+        pre_balances: List[Dict[str, Any]] = []
+        post_balances: List[Dict[str, Any]] = []
+
+        mint = self._programs.get(address)
+        if mint is not None and info["err"] is None:
+            holders = self.largest_accounts(mint)
+            source = holders[int(_unit("from", signature) * len(holders))]["address"]
+            target = holders[int(_unit("to", signature) * len(holders))]["address"]
+            if source != target:
+                amount = int(self._token_accounts[source][1] * 0.01 * _unit("amount", signature))
+                for holder, delta in ((source, -amount), (target, amount)):
+                    balance = self._token_accounts[holder][1]
+                    account_keys.append(holder)
+                    for balances, value in ((pre_balances, balance - delta), (post_balances, balance)):
+                        balances.append({
+                            "accountIndex": len(account_keys) - 1,
+                            "mint": mint,
+                            "owner": _b58encode(_digest("owner", holder)),
+                            "uiTokenAmount": {"amount": str(value), "decimals": TOKEN_DECIMALS},
+                        })
+
+        return {
+            "slot": info["slot"],
+            "blockTime": info["blockTime"],
+            "meta": {
+                "err": info["err"],
+                "fee": 5000,
+                "preTokenBalances": pre_balances,
+                "postTokenBalances": post_balances,
+            },
+            "transaction": {
+                "signatures": [signature],
+                "message": {"accountKeys": account_keys, "instructions": []},
+            },
+        }
+
+    # --------------------------------------------------------------- handlers
+
+    def _context(self) -> Dict[str, int]:
+        return {"slot": 250_000_000 + self.epoch}
+
+    def _dispatch(self, method: str, params: list) -> Any:
+        if method == "getHealth":
+            return "ok"
+        if method == "getSlot":
+            return self._context()["slot"]
+        if method == "getTokenSupply":
+            amount = self.token_supply(params[0])
+            return {"context": self._context(), "value": {
+                "amount": str(amount),
+                "decimals": TOKEN_DECIMALS,
+                "uiAmount": amount / 10 ** TOKEN_DECIMALS,
+                "uiAmountString": str(amount / 10 ** TOKEN_DECIMALS),
+            }}
+        if method == "getTokenLargestAccounts":
+            return {"context": self._context(), "value": self.largest_accounts(params[0])}
+        if method == "getMultipleAccounts":
+            return {"context": self._context(), "value": [self.account_info(a) for a in params[0]]}
+        if method == "getTokenAccountBalance":
+            amount = self.token_account_amount(params[0])
+            return {"context": self._context(), "value": {
+                "amount": str(amount),
+                "decimals": TOKEN_DECIMALS,
+                "uiAmount": amount / 10 ** TOKEN_DECIMALS,
+                "uiAmountString": str(amount / 10 ** TOKEN_DECIMALS),
+            }}
+        if method == "getSignaturesForAddress":
+            options = params[1] if len(params) > 1 else {}
+            return self.signatures(
+                params[0], options.get("limit", 1000), options.get("before"), options.get("until")
+            )
+        if method == "getTransaction":
+            return self.transaction(params[0])
+        raise LookupError(method)
+
+    def _handle_call(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        self.rpc_calls += 1
+        method = call.get("method", "")
+        self.method_counts[method] = self.method_counts.get(method, 0) + 1
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": call.get("id")}
+        if self._injected_errors.get(method):
+            self._injected_errors[method] -= 1
+            response["error"] = {"code": -32005, "message": "Node is behind"}
+            return response
+        try:
+            response["result"] = self._dispatch(method, call.get("params") or [])
+        except LookupError:
+            response["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+        except (IndexError, TypeError, ValueError) as e:
+            response["error"] = {"code": -32602, "message": f"Invalid params: {e}"}
+        return response
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        body = await request.json()  # before the delay: hedging clients drop losing requests
+        latency_ms = self.slow_latency_ms if self._rng.random() < self.slow_rate else self.latency_ms
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if self._rng.random() < self.http_error_rate:
+            return web.Response(status=503, text="Service Unavailable")
+
+        if isinstance(body, list):
+            return web.json_response([self._handle_call(call) for call in body])
+        return web.json_response(self._handle_call(body))
+
+    # -------------------------------------------------------------- websocket
+
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        subscriptions: Dict[tuple, List[int]] = {}
+        client = (ws, subscriptions)
+        self._ws_clients.append(client)
+        try:
+            async for msg in ws:
+                call = json.loads(msg.data)
+                method, params = call.get("method"), call.get("params") or []
+                if method == "logsSubscribe":
+                    target = ("logs", params[0]["mentions"][0])
+                elif method == "accountSubscribe":
+                    target = ("account", params[0])
+                else:
+                    await ws.send_json({"jsonrpc": "2.0", "id": call.get("id"), "error": {
+                        "code": -32601, "message": f"Method not found: {method}"}})
+                    continue
+                self._next_subscription += 1
+                subscriptions.setdefault(target, []).append(self._next_subscription)
+                await ws.send_json({"jsonrpc": "2.0", "id": call.get("id"), "result": self._next_subscription})
+        finally:
+            self._ws_clients.remove(client)
+        return ws
+
+    def record_events(self, registry, n_events: int, seed: int = 0) -> List[tuple]:
+        """Synthetic recording of ``(kind, target, value_json)`` notifications for ``registry``.
+
+        Mix: ~70% program transactions (5% failed), ~25% balance changes of
+        top-holder token accounts, ~5% mint supply updates.
+        """
+        rng = random.Random(seed)
+        entries = list(registry.values())
+        holders = {e.mint: [h["address"] for h in self.largest_accounts(e.mint)[:10]] for e in entries}
+        events = []
+        for _ in range(n_events):
+            entry = rng.choice(entries)
+            roll = rng.random()
+            if roll < 0.70:
+                value = {
+                    "signature": _b58encode(_digest("stream", rng.random()) * 2),
+                    "err": {"InstructionError": [0, "Custom"]} if rng.random() < 0.05 else None,
+                    "logs": [f"Program {entry.program_id} invoke [1]", f"Program {entry.program_id} success"],
+                }
+                events.append(("logs", entry.program_id, json.dumps(value)))
+            elif roll < 0.95:
+                address = rng.choice(holders[entry.mint])
+                mint, amount = self._token_accounts[address]
+                self._token_accounts[address] = (mint, max(0, int(amount * rng.uniform(0.9, 1.1))))
+                events.append(("account", address, json.dumps(self.account_info(address))))
+            else:
+                events.append(("account", entry.mint, json.dumps(self.account_info(entry.mint))))
+        return events
+
+    def replay(self, events, timeout: Optional[float] = None) -> int:
+        """Push recorded events to subscribed websocket clients; returns notifications sent."""
+        return asyncio.run_coroutine_threadsafe(self._replay(events), self._loop).result(timeout)
+
+    async def _replay(self, events) -> int:
+        sent = 0
+        slot = self._context()["slot"]
+        for kind, target, value_json in events:
+            method = "logsNotification" if kind == "logs" else "accountNotification"
+            for ws, subscriptions in list(self._ws_clients):
+                for subscription in subscriptions.get((kind, target), ()):
+                    await ws.send_str(
+                        f'{{"jsonrpc":"2.0","method":"{method}","params":{{"result":{{"context":'
+                        f'{{"slot":{slot}}},"value":{value_json}}},"subscription":{subscription}}}}}'
+                    )
+                    sent += 1
+        return sent
+
+    def drop_ws_clients(self) -> None:
+        """Close every websocket connection (to exercise client reconnects)."""
+        async def close_all():
+            for ws, _ in list(self._ws_clients):
+                await ws.close()
+        asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(10)
+
+    # -------------------------------------------------------------- lifecycle
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    def reset_counters(self) -> None:
+        self.http_requests = 0
+        self.rpc_calls = 0
+        self.method_counts = {}
+        self.connections = set()
+
+    def start(self) -> "MockRpcServer":
+        self._thread = threading.Thread(target=self._serve, name="mock-rpc", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout=10):
+            raise RuntimeError("Mock RPC server failed to start")
+        return self
+
+    def _serve(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        app.router.add_get("/ws", self._handle_ws)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+
+        self._ready.set()
+        self._loop.run_forever()
+
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def stop(self) -> None:
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+        self._loop = None
+        self._thread = None
+
+    def __enter__(self) -> "MockRpcServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,43 @@
+"""
+Protocol registry
+-----------------
+On-chain identifiers for the protocols the API scores.
+
+Each entry names the protocol's main program and its governance/utility
+token mint. ``pool`` is the token account whose balance is tracked as the
+protocol's liquidity reserve; when it is ``None`` the mint's largest token
+account is used instead (for DEX tokens that is normally a pool vault).
+"""
+
+from __future__ import annotations
+
+from typing import Dict, NamedTuple, Optional
+
+
+class ProtocolAccounts(NamedTuple):
+    name: str
+    program_id: str
+    mint: str
+    pool: Optional[str] = None
+
+
+PROTOCOL_REGISTRY: Dict[str, ProtocolAccounts] = {
+    p.name.lower(): p
+    for p in (
+        ProtocolAccounts("Jupiter", "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QvyVTZcQ4", "JUPyiwrYJFskUPiHa7hkeR8VUtAeFoSYbKedZNsDvCN"),
+        ProtocolAccounts("Orca", "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc", "orcaEKTdK7LKz57vaAYr9QeNsVEPfiu6QeMU1kektZE"),
+        ProtocolAccounts("Raydium", "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8", "4k3Dyjzvzp8eMZWUXbBCjEvwSkkk59S5iCNLY3QrkX6R"),
+        ProtocolAccounts("Serum", "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin", "SRMuApVNdxXokk5GT7XD5cUUgXMBCoAz2LHeuAoKWRt"),
+        ProtocolAccounts("Marinade", "MarBmsSgKXdrN1egZf5sqe1TMai9K1rChYNDJgjq7aD", "MNDEFzGvMt87ueuHvVU9VcTqsAP5b3fTGPsHuuPA5ey"),
+        ProtocolAccounts("Solend", "So1endDq2YkqhipRh3WViPa8hdiSpxWy6z3Z6tMCpAo", "SLNDpmoWTVADgEdndyvWzroNL7zSi1dF9PC3xHGtPwp"),
+    )
+}
+
+
+def lookup_protocol(protocol: str, registry: Optional[Dict[str, ProtocolAccounts]] = None) -> ProtocolAccounts:
+    """Case-insensitive registry lookup; raises ``KeyError`` for unknown protocols."""
+    registry = PROTOCOL_REGISTRY if registry is None else registry
+    try:
+        return registry[protocol.lower()]
+    except KeyError:
+        raise KeyError(f"Unknown protocol: {protocol}") from None
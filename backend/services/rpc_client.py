@@ -0,0 +1,154 @@
+"""
+AsyncRpcClient
+--------------
+Minimal asyncio JSON-RPC client for Solana RPC endpoints.
+
+One ``aiohttp.ClientSession`` (and therefore one keep-alive connection
+pool) is shared by every call made through the client. Concurrency is
+bounded by a semaphore so a burst of protocol fetches cannot open more
+sockets than the RPC provider allows, and every call carries its own
+timeout.
+
+The session is bound to the event loop that first uses it; call
+``close()`` from that same loop when shutting down.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+
+class RpcError(Exception):
+    """JSON-RPC error response or transport failure."""
+
+    def __init__(self, message: str, code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+class AsyncRpcClient:
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 10.0,
+        max_connections: int = 32,
+        max_concurrency: int = 64,
+        keepalive_timeout: float = 30.0,
+    ) -> None:
+        """
+        Args:
+            url: JSON-RPC HTTP endpoint
+            timeout: default per-call timeout in seconds
+            max_connections: size of the keep-alive connection pool
+            max_concurrency: maximum number of in-flight HTTP requests
+            keepalive_timeout: idle time before a pooled connection is closed
+        """
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ids = itertools.count(1)
+
+        self.requests = 0
+        self.calls = 0
+        self.errors = 0
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _post(self, payload: Any, timeout: Optional[float]) -> Any:
+        session = self._ensure_session()
+        client_timeout = aiohttp.ClientTimeout(total=self.timeout if timeout is None else timeout)
+
+        async with self._semaphore:
+            self.requests += 1
+            try:
+                async with session.post(self.url, json=payload, timeout=client_timeout) as resp:
+                    if resp.status != 200:
+                        raise RpcError(f"HTTP {resp.status} from {self.url}", code=resp.status)
+                    return await resp.json(content_type=None)
+            except asyncio.TimeoutError as e:
+                self.errors += 1
+                raise RpcError(f"RPC request to {self.url} timed out") from e
+            except aiohttp.ClientError as e:
+                self.errors += 1
+                raise RpcError(f"RPC transport error: {e}") from e
+
+    @staticmethod
+    def _unwrap(response: Dict[str, Any]) -> Any:
+        if "error" in response and response["error"] is not None:
+            error = response["error"]
+            raise RpcError(error.get("message", "RPC error"), code=error.get("code"))
+        return response.get("result")
+
+    async def call(self, method: str, params: Optional[list] = None, timeout: Optional[float] = None) -> Any:
+        """Issue a single JSON-RPC call and return its ``result``."""
+        self.calls += 1
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or []}
+        return self._unwrap(await self._post(payload, timeout))
+
+    async def batch(self, calls: Sequence[Tuple[str, list]], timeout: Optional[float] = None) -> List[Any]:
+        """Send several calls as one JSON-RPC batch request.
+
+        Returns results in the order of ``calls``. A call that failed on the
+        server yields an ``RpcError`` instance in its slot instead of raising,
+        so one bad call does not discard the rest of the batch.
+        """
+        if not calls:
+            return []
+
+        self.calls += len(calls)
+        ids = [next(self._ids) for _ in calls]
+        payload = [
+            {"jsonrpc": "2.0", "id": call_id, "method": method, "params": params or []}
+            for call_id, (method, params) in zip(ids, calls)
+        ]
+        responses = await self._post(payload, timeout)
+        if not isinstance(responses, list):
+            # Servers answer a rejected batch with a single error object
+            self._unwrap(responses)
+            raise RpcError("Malformed batch response")
+
+        by_id = {response.get("id"): response for response in responses}
+        results: List[Any] = []
+        for call_id in ids:
+            response = by_id.get(call_id)
+            if response is None:
+                results.append(RpcError(f"Missing response for request id {call_id}"))
+                continue
+            try:
+                results.append(self._unwrap(response))
+            except RpcError as e:
+                results.append(e)
+        return results
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "requests": self.requests,
+            "calls": self.calls,
+            "errors": self.errors,
+            "max_connections": self.max_connections,
+            "max_concurrency": self.max_concurrency,
+        }
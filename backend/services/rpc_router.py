@@ -0,0 +1,331 @@
+"""
+RpcRouter
+---------
+Drop-in replacement for ``AsyncRpcClient`` that spreads calls over
+several weighted RPC endpoints, so one slow or failing node no longer
+sets the tail latency.
+
+Per endpoint the router keeps a latency EWMA, an error-rate EWMA, a
+window of recent latencies and a circuit breaker:
+
+- the primary endpoint of a call is drawn with probability proportional
+  to ``weight / latency_ewma * (1 - error_rate)``
+- if the primary has not answered after its ``hedge_percentile`` latency,
+  a duplicate request goes to the best other endpoint; the first answer
+  wins and the loser is cancelled (Solana reads are idempotent)
+- a cancelled loser never reports its latency, so its elapsed time is
+  recorded as a lower-bound sample and the loss counts as a soft failure
+  (error-rate EWMA only, never the breaker); a node that keeps losing
+  races loses selection share instead of staying primary at full weight
+- transport failures, HTTP errors and "node behind" responses fail over
+  to the next endpoint immediately; other JSON-RPC errors describe the
+  request, not the node, and are raised as-is
+- ``failure_threshold`` consecutive endpoint failures open the breaker
+  for ``cooldown`` seconds; afterwards one probe request is let through
+  (half-open) and its outcome closes or re-opens the breaker
+
+Which endpoint answered each call is counted in ``wins`` (and
+``hedge_wins`` when the hedge beat the primary); cancelled losers are
+counted in ``losses``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import random
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from .rpc_client import AsyncRpcClient, RpcError
+
+EndpointSpec = Union[str, Tuple[str, float]]
+
+# JSON-RPC error codes that mean the node, not the request, is at fault
+_NODE_ERROR_CODES = {-32005, -32004, -32603}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def parse_endpoints(spec: str) -> List[Tuple[str, float]]:
+    """``"url|weight,url,..."`` -> ``[(url, weight), ...]`` (weight defaults to 1)."""
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.partition("|")
+        endpoints.append((url.strip(), float(weight) if weight else 1.0))
+    return endpoints
+
+
+def is_endpoint_failure(error: RpcError) -> bool:
+    code = error.code
+    return code is None or code >= 400 or code in _NODE_ERROR_CODES
+
+
+class Endpoint:
+    def __init__(self, url: str, weight: float, client: AsyncRpcClient, initial_latency: float, window: int) -> None:
+        self.url = url
+        self.weight = weight
+        self.client = client
+        self.latency_ewma = initial_latency
+        self.error_rate = 0.0
+        self.latencies: Deque[float] = collections.deque(maxlen=window)
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.wins = 0
+        self.hedge_wins = 0
+        self.losses = 0
+        self.trips = 0
+
+    def available(self, now: float, cooldown: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return now - self.opened_at >= cooldown
+        return not self.probe_in_flight
+
+    def score(self) -> float:
+        return self.weight / max(self.latency_ewma, 1e-4) * (1.0 - self.error_rate)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "state": self.state,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2),
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+            "wins": self.wins,
+            "hedge_wins": self.hedge_wins,
+            "losses": self.losses,
+            "trips": self.trips,
+        }
+
+
+class RpcRouter:
+    def __init__(
+        self,
+        endpoints: Sequence[EndpointSpec],
+        timeout: float = 10.0,
+        max_connections: int = 32,
+        max_concurrency: int = 64,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        initial_hedge_delay: float = 0.25,
+        ewma_alpha: float = 0.2,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        latency_window: int = 128,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            endpoints: URLs or ``(url, weight)`` pairs
+            timeout: default per-call timeout in seconds (per attempt)
+            max_connections: keep-alive pool size of each endpoint
+            max_concurrency: in-flight HTTP requests per endpoint
+            hedge_percentile: primary latency percentile after which a hedge is sent
+            hedge_min_samples: latency samples needed before the percentile is trusted
+            initial_hedge_delay: hedge delay in seconds until then
+            ewma_alpha: weight of the newest sample in the latency and error EWMAs
+            failure_threshold: consecutive failures that open an endpoint's breaker
+            cooldown: seconds an open breaker rejects traffic before a probe
+            latency_window: recent latencies kept per endpoint for the percentile
+            clock: monotonic time source (breaker cooldowns)
+        """
+        if not endpoints:
+            raise ValueError("RpcRouter needs at least one endpoint")
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.initial_hedge_delay = initial_hedge_delay
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+
+        self.endpoints: List[Endpoint] = []
+        for spec in endpoints:
+            url, weight = (spec, 1.0) if isinstance(spec, str) else spec
+            client = AsyncRpcClient(url, timeout=timeout, max_connections=max_connections,
+                                    max_concurrency=max_concurrency)
+            self.endpoints.append(Endpoint(url, weight, client, initial_hedge_delay, latency_window))
+
+        self.calls = 0
+        self.hedges = 0
+        self.failovers = 0
+
+    @property
+    def url(self) -> str:
+        return ",".join(endpoint.url for endpoint in self.endpoints)
+
+    @property
+    def requests(self) -> int:
+        return sum(endpoint.client.requests for endpoint in self.endpoints)
+
+    @property
+    def errors(self) -> int:
+        return sum(endpoint.failures for endpoint in self.endpoints)
+
+    # --------------------------------------------------------------- routing
+
+    def _candidates(self) -> List[Endpoint]:
+        """Primary (weighted draw) followed by the other usable endpoints, best first."""
+        now = self._clock()
+        usable = [e for e in self.endpoints if e.available(now, self.cooldown)]
+        if not usable:
+            # Every breaker is open: fail open on the endpoint that tripped longest ago
+            return sorted(self.endpoints, key=lambda e: e.opened_at)
+
+        scores = [e.score() for e in usable]
+        if sum(scores) > 0:
+            primary = random.choices(usable, weights=scores)[0]
+        else:
+            primary = usable[0]
+        rest = sorted((e for e in usable if e is not primary), key=Endpoint.score, reverse=True)
+        return [primary] + rest
+
+    def _hedge_delay(self, endpoint: Endpoint) -> float:
+        if len(endpoint.latencies) < self.hedge_min_samples:
+            return self.initial_hedge_delay
+        return endpoint.percentile(self.hedge_percentile)
+
+    def _launch(self, endpoint: Endpoint, send: Callable[[AsyncRpcClient], Awaitable[Any]]) -> asyncio.Task:
+        if endpoint.state != CLOSED:
+            endpoint.state = HALF_OPEN
+            endpoint.probe_in_flight = True
+        endpoint.requests += 1
+        return asyncio.ensure_future(send(endpoint.client))
+
+    def _record_success(self, endpoint: Endpoint, latency: float) -> None:
+        a = self.ewma_alpha
+        endpoint.latency_ewma += a * (latency - endpoint.latency_ewma)
+        endpoint.error_rate *= 1 - a
+        endpoint.latencies.append(latency)
+        endpoint.successes += 1
+        endpoint.consecutive_failures = 0
+        endpoint.probe_in_flight = False
+        endpoint.state = CLOSED
+
+    def _record_failure(self, endpoint: Endpoint) -> None:
+        endpoint.error_rate += self.ewma_alpha * (1 - endpoint.error_rate)
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.probe_in_flight = False
+        if endpoint.state == HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+            if endpoint.state != OPEN:
+                endpoint.trips += 1
+            endpoint.state = OPEN
+            endpoint.opened_at = self._clock()
+
+    def _record_loss(self, endpoint: Endpoint, elapsed: float) -> None:
+        # The true latency is at least ``elapsed``: only ever pull the EWMA up
+        a = self.ewma_alpha
+        endpoint.latency_ewma += a * max(0.0, elapsed - endpoint.latency_ewma)
+        endpoint.error_rate += a * (1 - endpoint.error_rate)
+        endpoint.latencies.append(elapsed)
+        endpoint.losses += 1
+
+    async def _route(self, send: Callable[[AsyncRpcClient], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        candidates = self._candidates()
+        in_flight: Dict[asyncio.Task, Tuple[Endpoint, float, bool]] = {}
+        next_index = 0
+        last_error: Optional[RpcError] = None
+
+        def launch(hedge: bool) -> None:
+            nonlocal next_index
+            endpoint = candidates[next_index]
+            next_index += 1
+            in_flight[self._launch(endpoint, send)] = (endpoint, loop.time(), hedge)
+
+        launch(hedge=False)
+        hedge_at = loop.time() + self._hedge_delay(candidates[0])
+        hedged = False
+        answered = False
+        try:
+            while in_flight:
+                wait_for = None
+                if not hedged and next_index < len(candidates):
+                    wait_for = max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait(in_flight, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    launch(hedge=True)
+                    continue
+
+                for task in done:
+                    endpoint, started, hedge = in_flight.pop(task)
+                    try:
+                        result = task.result()
+                    except RpcError as e:
+                        if not is_endpoint_failure(e):
+                            self._record_success(endpoint, loop.time() - started)
+                            raise
+                        self._record_failure(endpoint)
+                        last_error = e
+                        continue
+                    self._record_success(endpoint, loop.time() - started)
+                    endpoint.wins += 1
+                    if hedge:
+                        endpoint.hedge_wins += 1
+                    answered = True
+                    return result
+
+                if not in_flight and next_index < len(candidates):
+                    self.failovers += 1
+                    hedge_at = loop.time() + self._hedge_delay(candidates[next_index])
+                    launch(hedge=False)
+            raise last_error or RpcError("No RPC endpoint available")
+        finally:
+            for task in in_flight:
+                task.cancel()
+            now = loop.time()
+            for endpoint, started, _ in in_flight.values():
+                endpoint.probe_in_flight = False
+                if answered:
+                    self._record_loss(endpoint, now - started)
+
+    # ------------------------------------------------------ client interface
+
+    async def call(self, method: str, params: Optional[list] = None, timeout: Optional[float] = None) -> Any:
+        """Issue a single JSON-RPC call on the best endpoint (hedged, with failover)."""
+        self.calls += 1
+        return await self._route(lambda client: client.call(method, params, timeout))
+
+    async def batch(self, calls: Sequence[Tuple[str, list]], timeout: Optional[float] = None) -> List[Any]:
+        """``AsyncRpcClient.batch`` semantics; the whole batch is routed as one request."""
+        if not calls:
+            return []
+        self.calls += len(calls)
+        return await self._route(lambda client: client.batch(calls, timeout))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(endpoint.client.close() for endpoint in self.endpoints))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "calls": self.calls,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
@@ -5,38 +5,400 @@ Lightweight wrapper to fetch Solana protocol metrics.
 
 In demo mode, returns deterministic synthetic data so the API can run
 without external dependencies.
+
+Outside demo mode, metrics are computed from JSON-RPC calls made through
+a pooled ``AsyncRpcClient`` (or, when several endpoints are configured,
+an ``RpcRouter`` that hedges and fails over between them). The client
+lives on a dedicated event-loop thread owned by the service, so
+synchronous callers (Flask views) can use ``get_protocol_metrics`` while
+asyncio callers await ``fetch_protocol_metrics`` directly on that loop.
+
+``get_many_protocol_metrics`` fetches several protocols at once: the
+accounts they need are deduplicated, account data is read with chunked
+``getMultipleAccounts`` calls and everything else is packed into JSON-RPC
+batch requests, so N protocols cost a handful of HTTP round trips instead
+of 8*N.
+
+Protocols followed by an attached ``StreamIngestor`` are answered from its
+live websocket aggregates. Otherwise both entry points read through a
+``MetricsCache``: values are served stale-while-revalidate between the
+soft and hard TTL, and concurrent requests for the same protocol share
+one in-flight fetch.
 """
 
 from __future__ import annotations
 
+import asyncio
+import collections
 import os
 import random
+import threading
 import time
-from typing import Dict, Any
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .accounts import MINT_DTYPE, TOKEN_ACCOUNT_DTYPE, AccountDecoder
+from .metrics_cache import MetricsCache
+from .protocol_registry import PROTOCOL_REGISTRY, ProtocolAccounts, lookup_protocol
+from .rpc_client import AsyncRpcClient, RpcError
+from .rpc_router import EndpointSpec, RpcRouter, parse_endpoints
+
+DEFAULT_RPC_URL = "https://api.mainnet-beta.solana.com"
+
+WINDOW_SECONDS = 24 * 3600
+PROGRAM_SIGNATURE_LIMIT = 1000
+WHALE_ACCOUNTS = 5
+WHALE_SIGNATURE_LIMIT = 10
+TOP_HOLDERS = 10
+DEMO_METRICS_PERIOD = 3600  # demo metrics change once per hour
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
 
 
 class SolanaService:
-    def __init__(self, demo_mode: bool | None = None) -> None:
+    def __init__(
+        self,
+        demo_mode: bool | None = None,
+        rpc_url: str | Sequence[EndpointSpec] | None = None,
+        rpc_timeout: float | None = None,
+        max_connections: int | None = None,
+        max_concurrency: int | None = None,
+        batch_size: int | None = None,
+        accounts_per_request: int | None = None,
+        metrics_soft_ttl: float | None = None,
+        metrics_hard_ttl: float | None = None,
+        registry: Dict[str, ProtocolAccounts] | None = None,
+    ) -> None:
         # Allow env override; default to demo so the backend works out of the box
         if demo_mode is None:
             env_flag = os.getenv("SOLANA_DEMO_MODE", "true").lower()
             demo_mode = env_flag in ("1", "true", "yes", "y")
         self.demo_mode = demo_mode
 
-        # Placeholder for real client initialization (RPC/websocket, etc.)
+        # One URL, or several as "url|weight,url|weight" (or a list) for the multi-endpoint router
+        rpc_url = rpc_url or os.getenv("SOLANA_RPC_URL", DEFAULT_RPC_URL)
+        if isinstance(rpc_url, str):
+            self.rpc_endpoints = parse_endpoints(rpc_url)
+        else:
+            self.rpc_endpoints = [(spec, 1.0) if isinstance(spec, str) else tuple(spec) for spec in rpc_url]
+        self.rpc_url = ",".join(url for url, _ in self.rpc_endpoints)
+        self.rpc_timeout = rpc_timeout if rpc_timeout is not None else _env_float("SOLANA_RPC_TIMEOUT", 10.0)
+        self.max_connections = max_connections or int(os.getenv("SOLANA_RPC_MAX_CONNECTIONS", 32))
+        self.max_concurrency = max_concurrency or int(os.getenv("SOLANA_RPC_MAX_CONCURRENCY", 64))
+        # Calls per JSON-RPC batch request, and addresses per getMultipleAccounts call (RPC max 100)
+        self.batch_size = batch_size or int(os.getenv("SOLANA_RPC_BATCH_SIZE", 50))
+        self.accounts_per_request = accounts_per_request or int(os.getenv("SOLANA_RPC_ACCOUNTS_PER_REQUEST", 100))
+        # Transaction count -> USD volume until a price/volume source is wired in
+        self.avg_trade_usd = _env_float("SOLANA_AVG_TRADE_USD", 100_000.0)
+        self.registry = PROTOCOL_REGISTRY if registry is None else registry
+
+        soft_ttl = metrics_soft_ttl if metrics_soft_ttl is not None else _env_float("SOLANA_METRICS_SOFT_TTL", 30.0)
+        hard_ttl = metrics_hard_ttl if metrics_hard_ttl is not None else _env_float("SOLANA_METRICS_HARD_TTL", 300.0)
+        self.metrics_cache = MetricsCache(soft_ttl=soft_ttl, hard_ttl=max(soft_ttl, hard_ttl))
+        # Optional StreamIngestor; when it follows a protocol its live features win over RPC
+        self.ingestor = None
+
+        self._client: Optional[AsyncRpcClient | RpcRouter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+        # protocol -> [(timestamp, reserve)] observations inside the 24h window
+        self._reserve_history: Dict[str, Deque[Tuple[float, float]]] = {}
+
+        # Reusable getMultipleAccounts decode buffers (used on self.loop only)
+        self._mint_decoder = AccountDecoder(MINT_DTYPE, capacity=self.accounts_per_request)
+        self._token_decoder = AccountDecoder(TOKEN_ACCOUNT_DTYPE, capacity=self.accounts_per_request)
+
+    # ------------------------------------------------------------ connection
+
+    @property
+    def client(self) -> AsyncRpcClient | RpcRouter:
+        if self._client is None:
+            if len(self.rpc_endpoints) > 1:
+                self._client = RpcRouter(
+                    self.rpc_endpoints,
+                    timeout=self.rpc_timeout,
+                    max_connections=self.max_connections,
+                    max_concurrency=self.max_concurrency,
+                    hedge_percentile=_env_float("SOLANA_RPC_HEDGE_PERCENTILE", 95.0),
+                    failure_threshold=int(os.getenv("SOLANA_RPC_BREAKER_FAILURES", 5)),
+                    cooldown=_env_float("SOLANA_RPC_BREAKER_COOLDOWN", 30.0),
+                )
+            else:
+                self._client = AsyncRpcClient(
+                    self.rpc_url,
+                    timeout=self.rpc_timeout,
+                    max_connections=self.max_connections,
+                    max_concurrency=self.max_concurrency,
+                )
+        return self._client
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop that owns the RPC client, started on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="solana-rpc", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coro, timeout: float | None = None) -> Any:
+        """Run ``coro`` on the service loop and block until it finishes.
+
+        Raises ``TimeoutError`` after ``timeout`` seconds and cancels the
+        coroutine; fetches shared through the metrics cache keep running
+        and still fill the cache for later callers.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def reset_after_fork(self) -> None:
+        """Drop connection state inherited from the parent process.
+
+        Sockets and event loops must not be shared across a fork; they are
+        recreated lazily in the child on first use.
+        """
+        self._client = None
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self.metrics_cache.forget_inflight()
+
+    def close(self) -> None:
+        """Close pooled connections and stop the service loop."""
+        if self._loop is None:
+            return
+        if self._client is not None:
+            self.run(self._client.close(), timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        self._loop.close()
         self._client = None
+        self._loop = None
+        self._loop_thread = None
+
+    # --------------------------------------------------------------- metrics
+
+    def get_protocol_metrics(self, protocol: str, timeout: float | None = None) -> Dict[str, Any]:
+        """Metrics for one protocol; raises ``TimeoutError`` if not ready within ``timeout`` seconds."""
+        if self.demo_mode:
+            return self._generate_demo_metrics(protocol)
 
-    def get_protocol_metrics(self, protocol: str) -> Dict[str, Any]:
+        return self.run(self.cached_protocol_metrics([protocol]), timeout)[protocol]
+
+    async def aget_protocol_metrics(self, protocol: str, timeout: float | None = None) -> Dict[str, Any]:
+        """``get_protocol_metrics`` for coroutines on another event loop (ASGI handlers).
+
+        The fetch runs on ``self.loop`` as usual; the caller awaits it
+        without holding a thread. A timeout cancels the fetch.
+        """
         if self.demo_mode:
             return self._generate_demo_metrics(protocol)
 
-        # In real implementation, fetch on-chain or analytics API data here.
-        # To keep the backend functional without network, fall back to demo.
-        return self._generate_demo_metrics(protocol)
+        future = asyncio.run_coroutine_threadsafe(self.cached_protocol_metrics([protocol]), self.loop)
+        return (await asyncio.wait_for(asyncio.wrap_future(future), timeout))[protocol]
+
+    def metrics_ttl(self, protocol: str) -> float:
+        """Seconds until this protocol's metrics may change (demo bucket or SWR soft TTL)."""
+        if self.demo_mode:
+            return DEMO_METRICS_PERIOD - time.time() % DEMO_METRICS_PERIOD
+
+        cached = self.metrics_cache.peek(protocol.lower())
+        if cached is None:
+            return self.metrics_cache.soft_ttl
+        return max(0.0, self.metrics_cache.soft_ttl - cached[1])
+
+    async def fetch_protocol_metrics(self, protocol: str) -> Dict[str, Any]:
+        """Fetch one protocol's metrics; must run on ``self.loop``."""
+        accounts = lookup_protocol(protocol, self.registry)
+        client = self.client
+
+        supply, largest, program_sigs = await asyncio.gather(
+            client.call("getTokenSupply", [accounts.mint]),
+            client.call("getTokenLargestAccounts", [accounts.mint]),
+            client.call("getSignaturesForAddress", [accounts.program_id, {"limit": PROGRAM_SIGNATURE_LIMIT}]),
+        )
+        holders = largest["value"]
+
+        calls = [
+            client.call("getSignaturesForAddress", [holder["address"], {"limit": WHALE_SIGNATURE_LIMIT}])
+            for holder in holders[:WHALE_ACCOUNTS]
+        ]
+        if accounts.pool is not None:
+            calls.append(client.call("getTokenAccountBalance", [accounts.pool]))
+        results = await asyncio.gather(*calls)
+
+        if accounts.pool is not None:
+            reserve = int(results.pop()["value"]["amount"])
+        else:
+            reserve = int(holders[0]["amount"]) if holders else 0
+
+        return self._build_metrics(
+            protocol,
+            supply=int(supply["value"]["amount"]),
+            holder_amounts=[int(h["amount"]) for h in holders],
+            reserve=reserve,
+            program_signatures=program_sigs,
+            whale_signatures=results,
+        )
+
+    def get_many_protocol_metrics(
+        self, protocols: Iterable[str], timeout: float | None = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Metrics for several protocols, keyed by the names passed in."""
+        protocols = list(dict.fromkeys(protocols))
+        if self.demo_mode:
+            return {p: self._generate_demo_metrics(p) for p in protocols}
+
+        return self.run(self.cached_protocol_metrics(protocols), timeout)
+
+    async def cached_protocol_metrics(self, protocols: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Metrics through the SWR cache, keyed by the names passed in; must run on ``self.loop``."""
+        for protocol in protocols:
+            lookup_protocol(protocol, self.registry)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        if self.ingestor is not None:
+            for protocol in protocols:
+                live = self.ingestor.metrics(protocol)
+                if live is not None:
+                    results[protocol] = live
+
+        pending = [p for p in protocols if p not in results]
+        if pending:
+            values = await self.metrics_cache.get_many([p.lower() for p in pending], self._fetch_uncached)
+            results.update((p, {**values[p.lower()], "protocol": p}) for p in pending)
+        return {p: results[p] for p in protocols}
+
+    async def _fetch_uncached(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        if len(keys) == 1:
+            return {keys[0]: await self.fetch_protocol_metrics(keys[0])}
+        return await self.fetch_many_protocol_metrics(keys)
+
+    async def fetch_many_protocol_metrics(self, protocols: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Batched counterpart of ``fetch_protocol_metrics``; must run on ``self.loop``."""
+        entries = {p: lookup_protocol(p, self.registry) for p in protocols}
+
+        mints = list(dict.fromkeys(a.mint for a in entries.values()))
+        programs = list(dict.fromkeys(a.program_id for a in entries.values()))
+        pools = list(dict.fromkeys(a.pool for a in entries.values() if a.pool is not None))
+
+        # Round 1: account data for mints and pools, largest holders, program activity
+        step = self.accounts_per_request
+        mint_chunks = [mints[i:i + step] for i in range(0, len(mints), step)]
+        pool_chunks = [pools[i:i + step] for i in range(0, len(pools), step)]
+        account_chunks = mint_chunks + pool_chunks
+        calls = [("getMultipleAccounts", [chunk, {"encoding": "base64"}]) for chunk in account_chunks]
+        calls += [("getTokenLargestAccounts", [mint]) for mint in mints]
+        calls += [("getSignaturesForAddress", [p, {"limit": PROGRAM_SIGNATURE_LIMIT}]) for p in programs]
+        results = await self.batch_calls(calls)
+
+        # Decoded columnar per chunk; only the supply/amount columns are kept
+        supplies: Dict[str, int] = {}
+        reserves: Dict[str, int] = {}
+        for index, (chunk, result) in enumerate(zip(account_chunks, results)):
+            decoder, field, target = (
+                (self._mint_decoder, "supply", supplies) if index < len(mint_chunks)
+                else (self._token_decoder, "amount", reserves)
+            )
+            records, present = decoder.decode_many(result["value"])
+            target.update(
+                (address, value)
+                for address, value, ok in zip(chunk, records[field].tolist(), present.tolist()) if ok
+            )
+        results = results[len(account_chunks):]
+        largest = {mint: r["value"] for mint, r in zip(mints, results[:len(mints)])}
+        program_sigs = dict(zip(programs, results[len(mints):]))
+
+        # Round 2: activity of the whale accounts (depends on round 1)
+        whales = list(dict.fromkeys(
+            holder["address"] for holders in largest.values() for holder in holders[:WHALE_ACCOUNTS]
+        ))
+        whale_sigs = dict(zip(whales, await self.batch_calls(
+            [("getSignaturesForAddress", [w, {"limit": WHALE_SIGNATURE_LIMIT}]) for w in whales]
+        )))
+
+        metrics = {}
+        for protocol, entry in entries.items():
+            if entry.mint not in supplies:
+                raise RpcError(f"Mint account not found: {entry.mint}")
+            holders = largest[entry.mint]
+            if entry.pool is not None:
+                reserve = reserves.get(entry.pool, 0)
+            else:
+                reserve = int(holders[0]["amount"]) if holders else 0
+
+            metrics[protocol] = self._build_metrics(
+                protocol,
+                supply=supplies[entry.mint],
+                holder_amounts=[int(h["amount"]) for h in holders],
+                reserve=reserve,
+                program_signatures=program_sigs[entry.program_id],
+                whale_signatures=[whale_sigs[h["address"]] for h in holders[:WHALE_ACCOUNTS]],
+            )
+        return metrics
+
+    async def batch_calls(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        """Split ``calls`` into JSON-RPC batches of ``batch_size``, send them concurrently."""
+        chunks = [calls[i:i + self.batch_size] for i in range(0, len(calls), self.batch_size)]
+        responses = await asyncio.gather(*(self.client.batch(chunk) for chunk in chunks))
+
+        results = [result for response in responses for result in response]
+        for result in results:
+            if isinstance(result, RpcError):
+                raise result
+        return results
+
+    def _build_metrics(
+        self,
+        protocol: str,
+        supply: int,
+        holder_amounts: List[int],
+        reserve: int,
+        program_signatures: List[Dict[str, Any]],
+        whale_signatures: List[List[Dict[str, Any]]],
+        now: float | None = None,
+    ) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        since = now - WINDOW_SECONDS
+
+        def recent(signatures):
+            return sum(1 for s in signatures if (s.get("blockTime") or 0) >= since and s.get("err") is None)
+
+        volume_24h = round(recent(program_signatures) * self.avg_trade_usd, 2)
+        whale_transfers = sum(recent(sigs) for sigs in whale_signatures)
+        holder_concentration = round(sum(holder_amounts[:TOP_HOLDERS]) / supply, 3) if supply else 0.0
+
+        return {
+            "protocol": protocol,
+            "volume_24h": volume_24h,
+            "liquidity_change": self._liquidity_change(protocol, reserve, now),
+            "whale_transfers": whale_transfers,
+            "holder_concentration": holder_concentration,
+        }
+
+    def _liquidity_change(self, protocol: str, reserve: float, now: float) -> float:
+        """Change of the reserve against the oldest observation in the 24h window."""
+        history = self._reserve_history.setdefault(protocol.lower(), collections.deque())
+        while history and history[0][0] < now - WINDOW_SECONDS:
+            history.popleft()
+        history.append((now, reserve))
+
+        baseline = history[0][1]
+        return round(reserve / baseline - 1, 4) if baseline else 0.0
 
     def _generate_demo_metrics(self, protocol: str) -> Dict[str, Any]:
         # Seed with protocol for stable-but-varied values across protocols
-        seed = hash((protocol.lower(), int(time.time() // 3600))) & 0xFFFFFFFF
+        seed = hash((protocol.lower(), int(time.time() // DEMO_METRICS_PERIOD))) & 0xFFFFFFFF
         rng = random.Random(seed)
 
         volume_24h = round(rng.uniform(1_000_000, 150_000_000), 2)
@@ -51,5 +413,3 @@ class SolanaService:
             "whale_transfers": whale_transfers,
             "holder_concentration": holder_concentration,
         }
-
-
@@ -0,0 +1,79 @@
+"""
+请求截止时间（deadline）工具
+
+路由在收到请求时创建 Deadline，把剩余预算逐级传给 SolanaService 和预测器；
+某一阶段超时时由 DeadlineStats 按阶段计数，调用方回退到最近一次的分数。
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """某个阶段在截止时间之前没有完成"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """基于单调时钟的截止时间"""
+
+    def __init__(self, budget: float, clock=time.monotonic):
+        """
+        Args:
+            budget: 总预算（秒）
+            clock: 单调时钟
+        """
+        self.budget = budget
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self) -> float:
+        """剩余秒数（不小于 0）"""
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self._clock() >= self.expires_at
+
+    def check(self, stage: str):
+        """已经超时则抛出 DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+
+class DeadlineStats:
+    """按阶段统计截止时间未满足的次数（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.misses: Dict[str, int] = {}
+        self.stale_served = 0
+        self.unavailable = 0
+
+    def reset_after_fork(self):
+        """fork 之后换新的锁，计数保留"""
+        self._lock = threading.Lock()
+
+    def record_miss(self, stage: str, served_stale: Optional[bool] = None):
+        """
+        Args:
+            stage: 超时的阶段（如 'metrics'、'predict'）
+            served_stale: True 表示返回了旧分数，False 表示没有可用的旧分数
+        """
+        with self._lock:
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            if served_stale is True:
+                self.stale_served += 1
+            elif served_stale is False:
+                self.unavailable += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'misses': dict(self.misses),
+                'total_misses': sum(self.misses.values()),
+                'stale_served': self.stale_served,
+                'unavailable': self.unavailable,
+            }
@@ -0,0 +1,222 @@
+"""
+跨 worker 共享的令牌桶限流
+
+所有 worker（gunicorn fork 出的进程、uvicorn spawn 出的进程）按路径映射同一个文件，
+令牌桶存放在共享页面中，同一客户端无论落到哪个 worker 都消耗同一个桶。
+
+文件布局（小端）:
+    64 字节  头部: 魔数 b'PSRATELM'、格式版本、组数、容量、速率
+    ...      n_groups 组，每组 8 个槽位（组相联），每个槽位 24 字节:
+             键指纹 (uint64, 0 表示空)、令牌数 (float64)、上次更新的单调时钟 (float64)
+
+- 键（客户端 IP）的 64 位指纹决定所在的组，只在组内查找，
+  并发只锁这一组的字节范围（fcntl 记录锁），不同组互不影响
+- 组内没有空位时替换令牌最多的槽位：桶已补满的键与新键状态相同，替换不丢信息
+- 拒绝是精确可缓存的：令牌只会随时间补充，其它 worker 只会消耗，
+  所以本进程记住 "在 t 之前不会有令牌"，期间的请求不访问共享内存也不加锁
+
+开销（scripts/benchmarks/bench_rate_limit.py，单核）：放行一次要加锁并读写共享页面，约 4–6µs CPU；
+只有命中本进程拒绝缓存的请求在 1µs 以内。放行路径并未达到亚微秒。
+
+文件名带命名空间（默认 master 进程 PID），同一台机器上的多个部署不共享桶；
+gunicorn master 退出时（on_exit）删除默认路径下的文件。
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+MAGIC = b'PSRATELM'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<8sIIdd')
+_HEADER_SIZE = 64
+_WAYS = 8
+_SLOT = struct.Struct('<Qdd')
+_GROUP = struct.Struct('<' + 'Qdd' * _WAYS)
+_GROUP_SIZE = _GROUP.size
+
+# 本进程缓存的键数上限（指纹与拒绝截止时间），超过后清空重建
+_LOCAL_CACHE_LIMIT = 100_000
+
+
+def default_rate_limit_path(namespace: Optional[str] = None) -> str:
+    """
+    默认共享文件路径：优先放在 /dev/shm（内存文件系统），否则放在临时目录
+
+    Args:
+        namespace: 文件名后缀；默认取父进程 PID，即 gunicorn / uvicorn 的 master，
+                   同一 master 下的 worker 得到同一路径，master 用自己的 PID 找到并删除它
+    """
+    if namespace is None:
+        namespace = str(os.getppid())
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else os.environ.get('TMPDIR', '/tmp')
+    return os.path.join(directory, f'prophet-sentinel-ratelimit-{namespace}')
+
+
+class SharedRateLimiter:
+    """基于共享内存文件的令牌桶限流器（跨进程、跨线程安全）"""
+
+    def __init__(self, path: str, capacity: float, per_seconds: float = 60.0, slots: int = 65536,
+                 clock=time.monotonic):
+        """
+        Args:
+            path: 共享文件路径；各 worker 使用同一路径
+            capacity: 桶容量，即 per_seconds 内允许的请求数（也是允许的突发量）
+            per_seconds: 补满一个空桶所需的秒数
+            slots: 槽位总数（向上取整到 8 的倍数），决定可同时跟踪的客户端数
+            clock: 单调时钟（所有进程必须使用同一个系统时钟）
+        """
+        self.path = path
+        self.capacity = float(capacity)
+        self.rate = self.capacity / per_seconds
+        self.n_groups = max(1, -(-slots // _WAYS))
+        self._clock = clock
+        self._size = _HEADER_SIZE + self.n_groups * _GROUP_SIZE
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._initialize()
+        self._mm = mmap.mmap(self._fd, self._size)
+        self._reset_local()
+
+    def _initialize(self):
+        """头部与当前配置不一致（首次创建、容量或速率变更）时清零整个文件"""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            expected = _HEADER.pack(MAGIC, FORMAT_VERSION, self.n_groups, self.capacity, self.rate)
+            if os.fstat(self._fd).st_size != self._size or os.pread(self._fd, _HEADER.size, 0) != expected:
+                # 原地清零而不截断：其它进程可能仍映射着旧文件，截断会让它们访问时收到 SIGBUS
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, expected.ljust(_HEADER_SIZE, b'\0') + bytes(self._size - _HEADER_SIZE), 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+    def _reset_local(self):
+        # fcntl 记录锁属于进程，同一进程的线程之间另用线程锁互斥
+        self._thread_lock = threading.Lock()
+        # 键 -> (指纹, 上次所在槽位的偏移)
+        self._fingerprints: Dict[str, Tuple[int, int]] = {}
+        self._blocked: Dict[str, float] = {}
+        self.allowed = 0
+        self.denied = 0
+        self.denied_local = 0
+        self.evictions = 0
+
+    def reset_after_fork(self):
+        """fork 之后重建线程锁并清空本进程的缓存；映射和文件描述符可以继续使用"""
+        self._reset_local()
+
+    def _locate(self, key: str) -> Tuple[int, int]:
+        """键的 (指纹, 上次所在槽位的偏移；未知时为 0)"""
+        cached = self._fingerprints.get(key)
+        if cached is None:
+            if len(self._fingerprints) >= _LOCAL_CACHE_LIMIT:
+                self._fingerprints.clear()
+            digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+            cached = (int.from_bytes(digest, 'little') or 1, 0)
+        return cached
+
+    def acquire(self, key: str) -> float:
+        """
+        为 key 消耗一个令牌
+
+        Returns:
+            0.0 表示放行；否则为拒绝，值为距下一个令牌的秒数（用于 Retry-After）
+        """
+        now = self._clock()
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if now < blocked_until:
+                self.denied += 1
+                self.denied_local += 1
+                return blocked_until - now
+            # 不加锁：gthread 的其它线程可能同时发现过期并已删除
+            self._blocked.pop(key, None)
+
+        fingerprint, slot_offset = self._locate(key)
+        offset = _HEADER_SIZE + (fingerprint % self.n_groups) * _GROUP_SIZE
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _GROUP_SIZE, offset)
+            try:
+                wait, slot_offset = self._take(offset, slot_offset, fingerprint, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _GROUP_SIZE, offset)
+        self._fingerprints[key] = (fingerprint, slot_offset)
+
+        if wait:
+            self.denied += 1
+            if len(self._blocked) >= _LOCAL_CACHE_LIMIT:
+                self._blocked.clear()
+            self._blocked[key] = now + wait
+        else:
+            self.allowed += 1
+        return wait
+
+    def _take(self, offset: int, slot_offset: int, fingerprint: int, now: float) -> Tuple[float, int]:
+        """
+        在已加锁的组内找到（或分配）槽位并尝试取一个令牌
+
+        Returns:
+            (等待秒数, 槽位偏移)
+        """
+        if slot_offset:
+            # 先查上次的槽位（没有被其它键替换时只需读 24 字节）
+            stored, tokens, updated = _SLOT.unpack_from(self._mm, slot_offset)
+            if stored == fingerprint:
+                return self._consume(slot_offset, fingerprint, tokens, updated, now), slot_offset
+
+        group = _GROUP.unpack_from(self._mm, offset)
+        victim, victim_tokens = 0, -1.0
+        for way in range(_WAYS):
+            stored, tokens, updated = group[way * 3: way * 3 + 3]
+            if stored == fingerprint:
+                slot = way
+                break
+            if stored == 0:
+                tokens = self.capacity
+            else:
+                tokens = self._refill(tokens, updated, now)
+            if tokens > victim_tokens:
+                victim, victim_tokens = way, tokens
+        else:
+            # 新键：占用空位或令牌最多的槽位
+            slot, tokens, updated = victim, self.capacity, now
+            if group[victim * 3] != 0 and victim_tokens < self.capacity:
+                self.evictions += 1
+
+        slot_offset = offset + slot * _SLOT.size
+        return self._consume(slot_offset, fingerprint, tokens, updated, now), slot_offset
+
+    def _consume(self, slot_offset: int, fingerprint: int, tokens: float, updated: float, now: float) -> float:
+        tokens = self._refill(tokens, updated, now)
+        if tokens >= 1.0:
+            _SLOT.pack_into(self._mm, slot_offset, fingerprint, tokens - 1.0, now)
+            return 0.0
+        _SLOT.pack_into(self._mm, slot_offset, fingerprint, tokens, now)
+        return (1.0 - tokens) / self.rate
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        elapsed = now - updated
+        if elapsed < 0:
+            # 时钟早于记录（例如重启后沿用了旧文件），视为已补满
+            return self.capacity
+        return min(self.capacity, tokens + elapsed * self.rate)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def stats(self) -> Dict:
+        return {
+            'capacity': self.capacity,
+            'rate_per_second': round(self.rate, 4),
+            'slots': self.n_groups * _WAYS,
+            'allowed': self.allowed,
+            'denied': self.denied,
+            'denied_local': self.denied_local,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,66 @@
+"""
+响应编码与条件请求工具
+
+- dumps: 安装了 orjson 时用它直接编码为 bytes，否则退回标准库 json（紧凑格式）
+- FastJSONProvider: Flask 的 JSON provider，jsonify 走同一个编码器
+- weak_etag / etag_matches: 弱 ETag 的生成与 If-None-Match 比较（RFC 9110 §8.8.3、§13.1.2）
+"""
+import hashlib
+import json
+from typing import Any, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 是可选依赖
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """编码为 UTF-8 JSON 字节（紧凑格式，不转义非 ASCII 字符）"""
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=DefaultJSONProvider.default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        obj, default=DefaultJSONProvider.default, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify 使用 dumps 编码，响应体直接是字节，不经过 str 中转"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def weak_etag(*parts: Any) -> str:
+    """
+    由若干可 repr 的部分生成弱 ETag（W/"..."）
+
+    用于由这些部分决定语义、但字节不一定相同的表示（如带生成时间戳的响应）
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较：忽略 W/ 前缀，支持 * 和逗号分隔列表）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(
+        candidate.strip().removeprefix('W/') == opaque
+        for candidate in if_none_match.split(',')
+    )
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Cell, ResponsiveContainer } from 'recharts';
-import { getPredictRisk } from '../services/api';
+import { getRiskHeatmap, subscribeRiskStream } from '../services/api';
 import './RiskHeatmap.css';
 
 function RiskHeatmap({ onProtocolClick }) {
@@ -9,36 +9,17 @@ function RiskHeatmap({ onProtocolClick }) {
   const [error, setError] = useState(null);
   const [lastUpdate, setLastUpdate] = useState(null);
 
-  const PROTOCOLS = ['Jupiter', 'Orca', 'Raydium', 'Serum', 'Marinade', 'Solend'];
-
   const fetchAllRisks = async () => {
     setLoading(true);
     setError(null);
     
     try {
-      const results = await Promise.all(
-        PROTOCOLS.map(async (protocol) => {
-          try {
-            const data = await getPredictRisk(protocol);
-            return {
-              name: protocol,
-              risk_score: data.risk_score,
-              sustainable_score: data.sustainable_score,
-              alert_level: data.alert_level,
-              metrics: data.metrics
-            };
-          } catch (err) {
-            console.error(`获取 ${protocol} 数据失败:`, err);
-            return {
-              name: protocol,
-              risk_score: 0,
-              sustainable_score: 0,
-              alert_level: 'unknown',
-              error: true
-            };
-          }
-        })
-      );
+      // 单次请求：后端一轮指标拉取 + 一次模型调用
+      const results = (await getRiskHeatmap()).map(item => (
+        item.risk_score === null
+          ? { ...item, risk_score: 0, sustainable_score: 0, alert_level: 'unknown', error: true }
+          : item
+      ));
       
       setProtocols(results);
       setLastUpdate(new Date());
@@ -49,12 +30,31 @@ function RiskHeatmap({ onProtocolClick }) {
     }
   };
 
+  // 推送的分数变化合并到已有数据（可持续性评分等其余字段保留）
+  const applyScores = (scores) => {
+    const byName = {};
+    Object.entries(scores).forEach(([name, score]) => { byName[name.toLowerCase()] = score; });
+    setProtocols(prev => prev.map(item => {
+      const score = byName[item.name.toLowerCase()];
+      return score ? { ...item, risk_score: score[0], alert_level: score[1], error: false } : item;
+    }));
+    setLastUpdate(new Date());
+  };
+
   useEffect(() => {
     fetchAllRisks();
     
-    // 每30秒自动刷新
-    const interval = setInterval(fetchAllRisks, 30000);
-    return () => clearInterval(interval);
+    // 订阅服务端推送，取代定时轮询；服务端不提供推送时回退到每30秒轮询
+    let pollTimer = null;
+    const source = subscribeRiskStream(
+      snapshot => applyScores(snapshot.scores),
+      delta => applyScores({ [delta.protocol]: [delta.risk_score, delta.alert_level] }),
+      () => { pollTimer = setInterval(fetchAllRisks, 30000); }
+    );
+    return () => {
+      source.close();
+      if (pollTimer) clearInterval(pollTimer);
+    };
   }, []);
 
   const getColor = (score) => {
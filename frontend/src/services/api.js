@@ -57,6 +57,65 @@ export const getPredictRisk = async (protocol) => {
   }
 };
 
+/**
+ * 批量获取协议风险预测（单次请求）
+ * @param {string[]} protocols - 协议名称列表
+ * @returns {Promise} 包含 results 数组的风险数据
+ */
+export const getPredictRiskBatch = async (protocols) => {
+  try {
+    const response = await api.post('/api/predict_risk/batch', { protocols });
+    return response.data;
+  } catch (error) {
+    console.error('批量获取风险失败:', error);
+    throw error;
+  }
+};
+
+/**
+ * 获取风险热图（后端一次批量打分全部协议）
+ * @returns {Promise} 协议数据数组 [{name, risk_score, sustainable_score, alert_level, stale}]
+ */
+export const getRiskHeatmap = async () => {
+  try {
+    const response = await api.get('/api/risk_heatmap');
+    const { columns, rows } = response.data;
+    // 矩阵格式 -> 对象数组
+    return rows.map(row => {
+      const item = {};
+      columns.forEach((column, i) => { item[column] = row[i]; });
+      item.name = item.protocol;
+      return item;
+    });
+  } catch (error) {
+    console.error('获取风险热图失败:', error);
+    throw error;
+  }
+};
+
+/**
+ * 订阅风险变化推送（SSE），断线后浏览器自动带 Last-Event-ID 重连续传
+ * @param {Function} onSnapshot - 收到全量快照 {seq, scores: {协议: [risk_score, alert_level]}}
+ * @param {Function} onDelta - 收到增量 {seq, protocol, risk_score, alert_level, prev_risk_score, prev_alert_level}
+ * @param {Function} onUnavailable - 服务端拒绝推送（单线程 worker 部署或连接数已满，返回 503）且浏览器不再重连时调用
+ * @returns {EventSource} 调用 close() 取消订阅
+ */
+export const subscribeRiskStream = (onSnapshot, onDelta, onUnavailable) => {
+  const source = new EventSource(`${API_BASE_URL}/api/stream/risk`);
+  source.addEventListener('snapshot', event => onSnapshot(JSON.parse(event.data)));
+  source.addEventListener('risk', event => onDelta(JSON.parse(event.data)));
+  source.onerror = () => {
+    // 非 200 响应时 EventSource 直接进入 CLOSED，不会自动重连
+    if (source.readyState === EventSource.CLOSED) {
+      console.warn('⚠️ 风险推送不可用，改为定时轮询');
+      if (onUnavailable) onUnavailable();
+    } else {
+      console.warn('⚠️ 风险推送连接中断，自动重连中...');
+    }
+  };
+  return source;
+};
+
 /**
  * 获取支持的协议列表
  * @returns {Promise} 协议列表
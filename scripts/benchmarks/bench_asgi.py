@@ -0,0 +1,153 @@
+"""
+gunicorn 服务模式对比：sync worker、gthread worker 与 ASGI（UvicornWorker + asgi:application）
+
+三种模式使用相同的 worker 进程数（内存预算相同，同时统计各模式 worker 的 RSS 总和），
+后端连接本地 JSON-RPC 替身服务器（固定往返延迟），关闭指标缓存、预测缓存与预取，
+使每个 /api/predict_risk 请求都完整执行 拉取指标 → 推理。
+用 aiohttp 以固定并发持续施压，统计吞吐、p50/p99 延迟以及超时（504/旧分数）数量。
+
+用法:
+    python scripts/benchmarks/bench_asgi.py [--workers 2] [--threads 8] [--concurrency 64] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import aiohttp
+import numpy as np
+
+from bench_utils import backend_path, ensure_model_file
+
+from services.mock_rpc import MockRpcServer
+
+PROTOCOLS = ['Jupiter', 'Orca', 'Raydium', 'Serum', 'Marinade', 'Solend']
+
+
+def wait_until_ready(proc, n_workers, timeout=300):
+    """读取 gunicorn 日志，直到 n_workers 个 worker 都报告初始化完成"""
+    ready = 0
+    deadline = time.monotonic() + timeout
+    for line in proc.stderr:
+        if '初始化完成' in line:
+            ready += 1
+            if ready == n_workers:
+                return
+        if time.monotonic() > deadline:
+            break
+    raise RuntimeError('gunicorn 未在超时内就绪')
+
+
+def workers_rss_mb(master_pid: int) -> float:
+    """master 的所有子进程（worker）的 RSS 总和"""
+    total = 0
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                ppid = int(f.read().rpartition(')')[2].split()[1])
+            if ppid != master_pid:
+                continue
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+async def load(base, concurrency, duration):
+    """固定并发持续请求，返回 (成功请求延迟, 超时数, 错误数, 实际时长)"""
+    latencies, timeouts, errors = [], 0, 0
+    names = itertools.cycle(PROTOCOLS)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        started = time.perf_counter()
+        stop_at = started + duration
+
+        async def client():
+            nonlocal timeouts, errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    async with session.get(f'{base}/api/predict_risk', params={'protocol': next(names)}) as resp:
+                        body = await resp.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                if resp.status == 504 or body.get('stale'):
+                    timeouts += 1
+                elif resp.status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return np.asarray(latencies), timeouts, errors, time.perf_counter() - started
+
+
+def run_mode(label, extra_args, extra_env, args, env):
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py'] + extra_args,
+        cwd=backend_path, env=dict(env, **extra_env), stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True,
+    )
+    try:
+        wait_until_ready(proc, args.workers)
+        # 继续读取日志，避免管道写满阻塞 gunicorn
+        threading.Thread(target=proc.stderr.read, daemon=True).start()
+        base = f'http://127.0.0.1:{args.port}'
+        asyncio.run(load(base, args.workers, 1))  # 建立连接
+        latencies, timeouts, errors, elapsed = asyncio.run(load(base, args.concurrency, args.duration))
+        rss = workers_rss_mb(proc.pid)
+        ms = latencies * 1000 if len(latencies) else np.zeros(1)
+        print(
+            f"  {label:8s} 吞吐={len(latencies) / elapsed:7.1f} req/s  "
+            f"p50={np.percentile(ms, 50):7.1f}ms  p99={np.percentile(ms, 99):7.1f}ms  "
+            f"超时={timeouts:5d}  错误={errors:3d}  worker RSS={rss:6.1f}MB"
+        )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sync / gthread / ASGI 服务模式压测')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='gthread 模式每个 worker 的线程数')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--model', default='backend/models/risk_model.pkl')
+    args = parser.parse_args()
+
+    model_path = os.path.abspath(ensure_model_file(args.model))
+    with MockRpcServer(latency_ms=args.latency_ms) as rpc:
+        env = dict(
+            os.environ,
+            GUNICORN_WORKERS=str(args.workers),
+            GUNICORN_ACCESS_LOG='/dev/null',
+            PORT=str(args.port),
+            MODEL_PATH=model_path,
+            MODEL_ARTIFACT_PATH='',
+            MODEL_RELOAD_ENABLED='false',
+            SOLANA_DEMO_MODE='false',
+            SOLANA_RPC_URL=rpc.url,
+            SOLANA_METRICS_SOFT_TTL='0',
+            SOLANA_METRICS_HARD_TTL='0',
+            PREFETCH_ENABLED='false',
+            PREDICTION_CACHE_SIZE='0',
+            WARMUP_ROUNDS='1',
+            PYTHONUNBUFFERED='1',
+        )
+        print(f"{args.workers} 个 worker, 并发 {args.concurrency}, mock RPC 往返延迟 {args.latency_ms}ms, "
+              f"每种模式 {args.duration}s")
+        run_mode('sync', ['-k', 'sync', 'app:app'], {'GUNICORN_THREADS': '1'}, args, env)
+        run_mode('gthread', ['-k', 'gthread', 'app:app'], {'GUNICORN_THREADS': str(args.threads)}, args, env)
+        run_mode('asgi', ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:application'], {}, args, env)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+历史回填基准：串行与有界并发 getTransaction 对比
+
+在本地 JSON-RPC 替身服务器（固定往返延迟）上回填一个程序最近 24 小时的
+签名历史，统计不同并发度下的耗时与吞吐（transactions/s）。
+
+用法:
+    python scripts/benchmarks/bench_backfill.py [--latency-ms 20] [--history 4000]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import bench_utils  # noqa: F401  (sys.path)
+
+from services.aggregates import FeatureAggregator
+from services.backfill import SignatureBackfill
+from services.mock_rpc import MockRpcServer
+from services.protocol_registry import PROTOCOL_REGISTRY
+from services.rpc_client import AsyncRpcClient
+
+
+async def backfill_once(server, entry, parallel, since):
+    client = AsyncRpcClient(server.url, max_connections=max(parallel, 1), max_concurrency=max(parallel, 1))
+    try:
+        job = SignatureBackfill(client, entry.program_id, mint=entry.mint, since=since, max_parallel=parallel)
+        aggregator = FeatureAggregator(entry.name, avg_trade_usd=100_000)
+        start = time.perf_counter()
+        applied = await job.feed(aggregator)
+        return applied, time.perf_counter() - start, job.pages
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='签名历史回填基准')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--history', type=int, default=4000, help='48 小时内的签名数')
+    parser.add_argument('--parallel', default='1,8,32,64')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    entry = PROTOCOL_REGISTRY['jupiter']
+    with MockRpcServer(latency_ms=args.latency_ms) as server:
+        server.add_program(entry.program_id, entry.mint)
+        server.set_history(entry.program_id, args.history)
+        since = time.time() - 86400
+        print(f"mock RPC 往返延迟 {args.latency_ms}ms, 48 小时内 {args.history} 个签名")
+        for parallel in (int(p) for p in args.parallel.split(',')):
+            server.reset_counters()
+            applied, elapsed, pages = asyncio.run(backfill_once(server, entry, parallel, since))
+            print(
+                f"  并发 {parallel:3d}  {applied:5d} 笔交易  {pages} 页  "
+                f"耗时 {elapsed * 1000:8.1f}ms  {applied / elapsed:8.1f} tx/s"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+微批处理基准：不同窗口 / 批大小下的吞吐量与尾延迟
+
+用法:
+    python scripts/benchmarks/bench_batching.py [--threads 16] [--requests 4000] [--engine sklearn]
+"""
+import argparse
+import logging
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from bench_utils import ensure_model_file, latency_summary
+
+from models.batcher import MicroBatcher
+from models.predict import RiskPredictor
+
+
+def run(backend, n_threads, n_requests):
+    """n_threads 个线程并发调用 backend.predict，返回 (吞吐量, 延迟样本)"""
+    per_thread = n_requests // n_threads
+    latencies = [[] for _ in range(n_threads)]
+    metrics = {'volume_24h': 5e7, 'liquidity_change': -0.1, 'whale_transfers': 4, 'holder_concentration': 0.5}
+    
+    def worker(i):
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            backend.predict(metrics)
+            latencies[i].append(time.perf_counter() - start)
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * n_threads / elapsed, np.concatenate([np.asarray(l) for l in latencies])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='微批处理吞吐/延迟基准')
+    parser.add_argument('--model', default='backend/models/risk_model.pkl')
+    parser.add_argument('--engine', default='sklearn', choices=RiskPredictor.ENGINES)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--windows', default='0.5,2,5')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore', category=UserWarning)
+    
+    predictor = RiskPredictor(model_path=ensure_model_file(args.model), engine=args.engine)
+    
+    qps, lat = run(predictor, args.threads, args.requests)
+    print(f"engine={args.engine} threads={args.threads}")
+    print(f"  无微批        {qps:8.0f} req/s  {latency_summary(lat)}")
+    
+    for window_ms in (float(w) for w in args.windows.split(',')):
+        batcher = MicroBatcher(predictor, window_ms=window_ms, max_batch_size=64)
+        qps, lat = run(batcher, args.threads, args.requests)
+        stats = batcher.stats()
+        batcher.close()
+        print(
+            f"  窗口 {window_ms:4.1f}ms    {qps:8.0f} req/s  {latency_summary(lat)}  "
+            f"平均批大小={stats['mean_batch_size']}"
+        )
+
+
+if __name__ == '__main__':
+    main()
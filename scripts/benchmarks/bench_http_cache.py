@@ -0,0 +1,134 @@
+"""
+轮询负载下的条件请求基准：ETag / If-None-Match 节省的字节数与 CPU
+
+模拟 --clients 个客户端轮询全部协议 --rounds 轮（指标在测试窗口内不变，与演示指标
+每小时刷新一次、线上指标按 soft TTL 刷新的情况一致），对比三种方式：
+- 改动前：与改动前 /api/predict_risk 相同的处理（每次打分，jsonify 标准库编码，新 timestamp）
+- 无条件轮询：orjson 编码并按 ETag 复用已编码响应，客户端不带 If-None-Match
+- 条件轮询：客户端带上次的 ETag，未变化时服务端返回 304
+
+分别在按需计算路径（关闭预取）和预取路径（分数存储命中）上测量，
+直接调用 WSGI 应用（请求 environ 预先构造，不计入），统计每个请求的 CPU 时间
+（Flask 分发 + 路由 + 编码；重复 --repeat 次取最小值）和响应字节数（状态行 + 响应头 + 响应体）。
+
+用法:
+    python scripts/benchmarks/bench_http_cache.py [--clients 20] [--rounds 20]
+"""
+import argparse
+import logging
+import time
+
+from bench_utils import ensure_model_file, latency_summary, time_calls
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.test import EnvironBuilder
+
+import app as app_module
+from models.cache import PredictionCache
+from models.predict import RiskPredictor
+from scheduler import PrefetchScheduler, ScoreStore
+from utils.responses import FastJSONProvider
+
+
+_legacy_json = DefaultJSONProvider(app_module.app)
+
+
+def call_wsgi(app, environ):
+    """返回 (状态行, 响应头, 响应体, CPU 秒数)"""
+    captured = []
+
+    def start_response(status, headers, exc_info=None):
+        captured.extend((status, headers))
+
+    start = time.thread_time()
+    result = app(environ, start_response)
+    body = b''.join(result)
+    if hasattr(result, 'close'):
+        result.close()
+    return captured[0], captured[1], body, time.thread_time() - start
+
+
+def legacy_predict_risk():
+    """改动前的 /api/predict_risk（不含截止时间处理）"""
+    protocol = request.args.get('protocol', 'Jupiter')
+    prefetched = app_module._score_store.get(protocol) if app_module._score_store is not None else None
+    if prefetched is not None:
+        return _legacy_json.response(prefetched)
+    metrics = app_module.get_solana_service().get_protocol_metrics(protocol)
+    prediction = app_module.get_prediction_backend().predict(metrics)
+    return _legacy_json.response(app_module._build_risk_response(protocol, metrics, prediction))
+
+
+def poll(app, path, protocols, n_clients, rounds, conditional):
+    """返回 (每请求 CPU 微秒, 每请求字节数, 304 比例)"""
+    etags = {}
+    total_bytes = not_modified = requests = 0
+    cpu = 0.0
+    for _ in range(rounds):
+        for c in range(n_clients):
+            for protocol in protocols:
+                headers = {}
+                if conditional and etags.get((c, protocol)):
+                    headers['If-None-Match'] = etags[(c, protocol)]
+                environ = EnvironBuilder(path=path, query_string={'protocol': protocol}, headers=headers).get_environ()
+                status, response_headers, body, elapsed = call_wsgi(app, environ)
+                cpu += elapsed
+                etags[(c, protocol)] = dict(response_headers).get('ETag')
+                head = f"HTTP/1.1 {status}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in response_headers) + "\r\n"
+                total_bytes += len(head.encode()) + len(body)
+                not_modified += status.startswith('304')
+                requests += 1
+    return cpu / requests * 1e6, total_bytes / requests, not_modified / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ETag / 条件请求轮询基准')
+    parser.add_argument('--model', default='backend/models/risk_model.pkl')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    predictor = RiskPredictor(model_path=ensure_model_file(args.model), cache=PredictionCache())
+    logging.disable(logging.INFO)
+
+    app = app_module.app
+    app.add_url_rule('/bench/legacy_predict_risk', view_func=legacy_predict_risk)
+    if app_module._prefetch_scheduler is not None:
+        app_module._prefetch_scheduler.stop()
+    app_module._risk_predictor = predictor
+    app_module._micro_batcher = None
+
+    protocols = [p['name'] for p in app_module.SUPPORTED_PROTOCOLS]
+    prefetched_store = ScoreStore()
+    PrefetchScheduler(
+        app_module.get_solana_service(), predictor, prefetched_store, protocols, app_module._build_risk_response
+    ).refresh_once()
+
+    modes = [
+        ('改动前', '/bench/legacy_predict_risk', False),
+        ('无条件轮询', '/api/predict_risk', False),
+        ('条件轮询', '/api/predict_risk', True),
+    ]
+    sample = prefetched_store.get('Jupiter')
+    with app.app_context():
+        for label, provider in (('jsonify 标准库', _legacy_json), ('jsonify orjson', FastJSONProvider(app))):
+            print(f"{label:16s} 编码一个风险响应 {latency_summary(time_calls(lambda: provider.response(sample), 5000))}")
+
+    print(f"{args.clients} 个客户端 × {len(protocols)} 个协议 × {args.rounds} 轮")
+    for path_label, store in (('按需计算', None), ('预取命中', prefetched_store)):
+        print(f"  [{path_label}]")
+        app_module._score_store = store
+        for label, path, conditional in modes:
+            runs = [
+                poll(app, path, protocols, args.clients, args.rounds, conditional)
+                for _ in range(args.repeat)
+            ]
+            cpu_us = min(r[0] for r in runs)
+            _, size, ratio = runs[-1]
+            print(f"    {label:8s} CPU={cpu_us:7.1f}µs/请求  响应={size:6.0f}B/请求  304 比例={ratio * 100:5.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+推理引擎基准测试：sklearn predict_proba vs CompiledForest
+
+用法:
+    python scripts/benchmarks/bench_inference.py [--model backend/models/risk_model.pkl] [--iters 2000]
+"""
+import argparse
+import logging
+import warnings
+
+import numpy as np
+
+from bench_utils import latency_summary, load_or_train_model, time_calls
+
+from models.forest_engine import CompiledForest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推理引擎延迟基准')
+    parser.add_argument('--model', default='backend/models/risk_model.pkl')
+    parser.add_argument('--iters', type=int, default=2000)
+    parser.add_argument('--batch-sizes', default='1,16,256')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore', category=UserWarning)
+    
+    model = load_or_train_model(args.model)
+    compiled = CompiledForest.from_sklearn(model)
+    print(f"模型: {compiled.n_trees} 棵树, {compiled.n_nodes} 个节点, 最大深度 {compiled.max_depth}")
+    
+    rng = np.random.default_rng(42)
+    for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        X = np.column_stack([
+            rng.uniform(1_000_000, 150_000_000, batch_size),
+            rng.uniform(-0.35, 0.35, batch_size),
+            rng.integers(0, 25, batch_size),
+            rng.uniform(0.05, 0.75, batch_size),
+        ])
+        assert np.array_equal(compiled.predict_proba(X), model.predict_proba(X))
+        
+        iters = max(50, args.iters // batch_size)
+        sk = time_calls(lambda: model.predict_proba(X), iters)
+        cf = time_calls(lambda: compiled.predict_proba(X), iters)
+        
+        print(f"\nbatch={batch_size}")
+        print(f"  sklearn   {latency_summary(sk)}")
+        print(f"  compiled  {latency_summary(cf)}")
+        print(f"  p50 加速比: {np.percentile(sk, 50) / np.percentile(cf, 50):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+多 worker 模型内存与启动时间对比：pickle vs mmap (.forest)
+
+模拟 gunicorn 的 N 个 worker 同时加载模型，统计每个 worker 的加载耗时、
+RSS、PSS（按共享比例分摊）和私有内存。PSS 总和才是整机真实占用。
+
+用法:
+    python scripts/benchmarks/bench_model_sharing.py --workers 129 --n-estimators 300 --max-depth 20
+    (64 核机器上 gunicorn 默认 workers = 64*2+1 = 129)
+"""
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+import bench_utils  # noqa: F401  设置 sys.path
+
+
+def read_smaps_rollup() -> dict:
+    """读取 /proc/self/smaps_rollup（Linux），单位 MB"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': fields.get('Rss', 0.0),
+        'pss': fields.get('Pss', 0.0),
+        'private': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+    }
+
+
+def worker(model_path, engine, barrier, results):
+    """单个 worker：加载模型、预热、上报内存，等待所有 worker 都测完再退出"""
+    logging.disable(logging.WARNING)
+    warnings.filterwarnings('ignore', category=UserWarning)
+    from models.predict import RiskPredictor
+    
+    start = time.perf_counter()
+    predictor = RiskPredictor(model_path=model_path, engine=engine)
+    load_time = time.perf_counter() - start
+    
+    rng = np.random.default_rng(os.getpid())
+    predictor.predict_batch([
+        {'volume_24h': v, 'liquidity_change': l, 'whale_transfers': w, 'holder_concentration': h}
+        for v, l, w, h in zip(rng.uniform(1e6, 1.5e8, 256), rng.uniform(-0.35, 0.35, 256),
+                              rng.integers(0, 25, 256), rng.uniform(0.05, 0.75, 256))
+    ])
+    
+    barrier.wait()
+    results.put(dict(read_smaps_rollup(), load_time=load_time))
+    barrier.wait()
+
+
+def run_mode(label, model_path, engine, n_workers):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(n_workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(model_path, engine, barrier, results)) for _ in range(n_workers)]
+    
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    stats = [results.get() for _ in procs]
+    ready = time.perf_counter() - start
+    for p in procs:
+        p.join()
+    
+    def col(key):
+        return np.array([s[key] for s in stats])
+    
+    print(
+        f"{label:8s} 加载 p50={np.median(col('load_time')) * 1000:8.1f}ms  "
+        f"每 worker RSS={col('rss').mean():7.1f}MB  PSS={col('pss').mean():7.1f}MB  "
+        f"私有={col('private').mean():7.1f}MB  PSS 合计={col('pss').sum():8.1f}MB  "
+        f"全部就绪={ready:6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多 worker 模型内存基准')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--n-estimators', type=int, default=300)
+    parser.add_argument('--max-depth', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+    
+    from sklearn.ensemble import RandomForestClassifier
+    from models.train_model import save_model, save_model_artifact
+    
+    logging.disable(logging.INFO)
+    
+    # 带噪声标签的数据才能长出足够大的森林，近似生产规模的模型
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(1e6, 1.5e8, args.rows), rng.uniform(-0.5, 0.5, args.rows),
+        rng.integers(0, 25, args.rows), rng.uniform(0, 1, args.rows),
+    ])
+    y = (X[:, 3] + rng.normal(0, 0.3, args.rows) > 0.5).astype(int)
+    model = RandomForestClassifier(
+        n_estimators=args.n_estimators, max_depth=args.max_depth, random_state=42, n_jobs=-1
+    ).fit(X, y)
+    
+    out_dir = tempfile.mkdtemp(prefix='bench-sharing-')
+    pkl_path = os.path.join(out_dir, 'risk_model.pkl')
+    forest_path = os.path.join(out_dir, 'risk_model.forest')
+    save_model(model, pkl_path)
+    save_model_artifact(model, forest_path)
+    
+    print(
+        f"模型: {args.n_estimators} 棵树, 深度 {args.max_depth}, "
+        f"pickle {os.path.getsize(pkl_path) / 2**20:.1f}MB, mmap {os.path.getsize(forest_path) / 2**20:.1f}MB, "
+        f"workers={args.workers}"
+    )
+    run_mode('pickle', pkl_path, 'sklearn', args.workers)
+    run_mode('mmap', forest_path, 'compiled', args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+gunicorn 启动模式对比：默认（每个 worker 各自加载）vs preload（master 加载并预热后 fork）
+
+统计从启动到所有 worker 就绪的时间，以及就绪后第一个 /api/predict_risk 请求的延迟。
+
+用法:
+    python scripts/benchmarks/bench_preload.py [--workers 4] [--model path/to/risk_model.pkl]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from bench_utils import backend_path, ensure_model_file
+
+
+def wait_until_ready(proc, n_workers, timeout=300):
+    """读取 gunicorn 日志，直到 n_workers 个 worker 都报告初始化完成"""
+    ready = 0
+    deadline = time.monotonic() + timeout
+    for line in proc.stderr:
+        if '初始化完成' in line:
+            ready += 1
+            if ready == n_workers:
+                return
+        if time.monotonic() > deadline:
+            break
+    raise RuntimeError('gunicorn 未在超时内就绪')
+
+
+def timed_get(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def run_mode(preload, args, model_path):
+    env = dict(
+        os.environ,
+        GUNICORN_PRELOAD='true' if preload else 'false',
+        GUNICORN_WORKERS=str(args.workers),
+        PORT=str(args.port),
+        MODEL_PATH=model_path,
+        MODEL_ARTIFACT_PATH='',
+        PYTHONUNBUFFERED='1',
+    )
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'app:app'],
+        cwd=backend_path, env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True,
+    )
+    try:
+        wait_until_ready(proc, args.workers)
+        time_to_ready = time.monotonic() - start
+        
+        url = f'http://127.0.0.1:{args.port}/api/predict_risk?protocol=Jupiter'
+        # 每个 worker 的第一个请求都可能是冷的，取前 workers 个请求中的最大值
+        first = [timed_get(url) for _ in range(args.workers)]
+        steady = sorted(timed_get(url) for _ in range(50))
+        
+        print(
+            f"{'preload' if preload else 'default':8s} 全部就绪={time_to_ready:6.2f}s  "
+            f"首请求 max={max(first) * 1000:7.1f}ms  "
+            f"稳态 p50={steady[len(steady) // 2] * 1000:6.1f}ms"
+        )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn preload 启动基准')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--model', default='backend/models/risk_model.pkl')
+    args = parser.parse_args()
+    
+    model_path = os.path.abspath(ensure_model_file(args.model))
+    run_mode(False, args, model_path)
+    run_mode(True, args, model_path)
+
+
+if __name__ == '__main__':
+    main()
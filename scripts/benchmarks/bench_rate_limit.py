@@ -0,0 +1,90 @@
+"""
+跨 worker 共享令牌桶的开销与精确性
+
+按 gunicorn 默认的 worker 数（CPU 核数 × 2 + 1）fork 出多个进程，映射同一个共享文件，
+同时调用 SharedRateLimiter.acquire，统计每次调用的 CPU 时间（不含等待调度的时间）和总吞吐：
+- 不同客户端：每个 worker 各自的一组 IP（落在不同的组，只有共享内存访问，没有锁竞争）
+- 热点放行：所有 worker 同一个 IP，容量足够大，每次都放行（同一组的锁竞争最激烈）
+- 热点洪泛：所有 worker 同一个 IP，容量很小，绝大多数请求被拒绝（拒绝走本进程缓存）
+
+洪泛场景同时检查精确性：全部 worker 放行的总数不应超过 容量 + 速率 × 持续时间。
+
+用法:
+    python scripts/benchmarks/bench_rate_limit.py [--workers 5] [--ops 200000]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import bench_utils  # noqa: F401  把 backend/ 加入 sys.path
+
+from utils.rate_limit import SharedRateLimiter
+
+
+def worker(path, capacity, per_seconds, keys, ops, start_event, queue):
+    limiter = SharedRateLimiter(path, capacity=capacity, per_seconds=per_seconds)
+    acquire = limiter.acquire
+    n_keys = len(keys)
+    start_event.wait()
+    started = time.process_time()
+    for i in range(ops):
+        acquire(keys[i % n_keys])
+    elapsed = time.process_time() - started
+    queue.put((elapsed, limiter.allowed, limiter.denied, limiter.denied_local))
+    limiter.close()
+
+
+def run(label, args, capacity, per_seconds, keys_for):
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    start_event = ctx.Event()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'ratelimit')
+        SharedRateLimiter(path, capacity=capacity, per_seconds=per_seconds).close()
+        processes = [
+            ctx.Process(target=worker, args=(path, capacity, per_seconds, keys_for(w), args.ops, start_event, queue))
+            for w in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        started = time.perf_counter()
+        start_event.set()
+        results = [queue.get() for _ in processes]
+        wall = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+    total_ops = args.ops * args.workers
+    ns_per_op = sum(r[0] for r in results) / total_ops * 1e9
+    allowed = sum(r[1] for r in results)
+    denied_local = sum(r[3] for r in results)
+    print(
+        f"  {label:10s} {ns_per_op:7.0f}ns/次 (CPU)  总吞吐={total_ops / wall / 1e6:5.2f}M 次/s  "
+        f"放行={allowed:8d}  本地缓存拒绝={denied_local:8d}"
+    )
+    return allowed, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='共享令牌桶限流基准')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count() * 2 + 1)
+    parser.add_argument('--ops', type=int, default=200_000, help='每个 worker 的调用次数')
+    parser.add_argument('--clients', type=int, default=1000, help='不同客户端场景中每个 worker 的 IP 数')
+    args = parser.parse_args()
+
+    print(f"{args.workers} 个 worker × {args.ops} 次调用")
+    run('不同客户端', args, 1e12, 60,
+        lambda w: [f'10.{w}.{i // 256}.{i % 256}' for i in range(args.clients)])
+    run('热点放行', args, 1e12, 60, lambda w: ['203.0.113.9'])
+
+    capacity, per_seconds = 100, 60
+    allowed, wall = run('热点洪泛', args, capacity, per_seconds, lambda w: ['203.0.113.9'])
+    bound = capacity + capacity / per_seconds * wall
+    print(f"  洪泛放行 {allowed} 次，上限 容量 + 速率 × {wall:.2f}s = {bound:.1f}"
+          f"（{'符合' if allowed <= bound else '超出'}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+风险热图基准：逐协议 /api/predict_risk 扇出与单次 /api/risk_heatmap 对比
+
+模拟前端热图一次页面加载：扇出方式并发请求 6 个协议（与 RiskHeatmap.js 旧实现一致），
+热图方式只请求一次。后端使用本地 JSON-RPC 替身服务器（固定往返延迟），关闭指标缓存与预取，
+使每次加载都完整计算。统计页面加载耗时、进程 CPU 时间（服务端与 HTTP 客户端在同一进程）、
+上游 RPC 的 HTTP 请求数。
+
+用法:
+    python scripts/benchmarks/bench_risk_heatmap.py [--latency-ms 20] [--rounds 30]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench_utils import ensure_model_file
+
+from werkzeug.serving import make_server
+
+import app as app_module
+from models.predict import RiskPredictor
+from services.mock_rpc import MockRpcServer
+from services.solana_service import SolanaService
+
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def measure(server, load_page, rounds):
+    """返回 (页面加载耗时样本, 每次加载的 CPU 秒数, 每次加载的上游 HTTP 请求数)"""
+    load_page()  # 建立连接
+    server.reset_counters()
+    samples = []
+    cpu_start = time.process_time()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        load_page()
+        samples.append(time.perf_counter() - start)
+    cpu = (time.process_time() - cpu_start) / rounds
+    return np.asarray(samples), cpu, server.http_requests / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='风险热图页面加载基准')
+    parser.add_argument('--model', default='backend/models/risk_model.pkl')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--rounds', type=int, default=30)
+    args = parser.parse_args()
+
+    predictor = RiskPredictor(model_path=ensure_model_file(args.model))
+    logging.disable(logging.INFO)
+
+    # 与线上一致的打分路径（微批处理保留），关闭预取避免直接命中分数存储
+    if app_module._prefetch_scheduler is not None:
+        app_module._prefetch_scheduler.stop()
+    app_module._risk_predictor = predictor
+    if app_module._micro_batcher is not None:
+        app_module._micro_batcher.predictor = predictor
+
+    protocols = [p['name'] for p in app_module.SUPPORTED_PROTOCOLS]
+    with MockRpcServer(latency_ms=args.latency_ms) as rpc:
+        service = SolanaService(demo_mode=False, rpc_url=rpc.url, metrics_soft_ttl=0, metrics_hard_ttl=0)
+        app_module._solana_service = service
+        app_module._score_store = None
+
+        http = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+        threading.Thread(target=http.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{http.server_port}'
+        pool = ThreadPoolExecutor(max_workers=len(protocols))
+
+        def fan_out():
+            list(pool.map(lambda p: fetch(f'{base}/api/predict_risk?protocol={p}'), protocols))
+
+        def heatmap():
+            fetch(f'{base}/api/risk_heatmap')
+
+        print(f"{len(protocols)} 个协议, mock RPC 往返延迟 {args.latency_ms}ms, {args.rounds} 次页面加载")
+        try:
+            for label, load_page in (('逐协议扇出', fan_out), ('/api/risk_heatmap', heatmap)):
+                samples, cpu, upstream = measure(rpc, load_page, args.rounds)
+                ms = samples * 1000
+                print(
+                    f"  {label:18s} p50={np.percentile(ms, 50):7.1f}ms  p99={np.percentile(ms, 99):7.1f}ms  "
+                    f"CPU {cpu * 1000:6.1f}ms/次  上游 HTTP 请求 {upstream:5.1f}/次"
+                )
+        finally:
+            pool.shutdown()
+            http.shutdown()
+            service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+风险推送流压测：数千个本地 SSE 订阅者
+
+在线程模式的 werkzeug 服务器上启动 /api/stream/risk，用 aiohttp 建立 --subscribers
+个长连接，然后以固定间隔发布风险变化，统计：
+- 每个事件从发布到所有订阅者收到的投递延迟（p50/p99/最大）
+- 每个事件的 CPU 时间，按线程区分服务端（处理连接的线程）与客户端（主线程）
+- 连接建立后进程 RSS 的增量
+- 断开一半连接后带 Last-Event-ID 重连，统计补发是否完整
+
+用法:
+    python scripts/benchmarks/bench_risk_stream.py [--subscribers 2000] [--events 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import aiohttp
+import numpy as np
+
+import bench_utils  # noqa: F401  (sys.path)
+
+from werkzeug.serving import make_server
+
+import app as app_module
+from risk_stream import RiskStream
+
+
+def main_thread_cpu() -> float:
+    """主线程（aiohttp 客户端）的 CPU 秒数；进程 CPU 减去它即服务端线程的 CPU"""
+    tid = threading.main_thread().native_id
+    with open(f'/proc/self/task/{tid}/stat') as f:
+        fields = f.read().rpartition(')')[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def rss_mb() -> float:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class Subscriber:
+    """读取 SSE 流，记录每个 risk 事件的到达时间"""
+
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+        self.last_id = None
+        self.received = {}  # seq -> 到达时间
+        self.snapshots = 0
+        self.ready = asyncio.Event()
+
+    async def run(self, last_id=None, stop_after=None):
+        headers = {'Last-Event-ID': last_id} if last_id else {}
+        async with self.session.get(self.url, headers=headers) as response:
+            event = None
+            async for raw in response.content:
+                line = raw.decode().rstrip('\n')
+                if line.startswith('id: '):
+                    self.last_id = line[4:]
+                elif line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data: '):
+                    if event == 'snapshot':
+                        self.snapshots += 1
+                        self.ready.set()
+                    else:
+                        seq = int(self.last_id.rpartition('-')[2])
+                        self.received[seq] = time.perf_counter()
+                        if stop_after is not None and seq >= stop_after:
+                            return
+
+
+async def scenario(url, stream, n_subscribers, n_events, interval):
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        rss_before = rss_mb()
+        subscribers = [Subscriber(session, url) for _ in range(n_subscribers)]
+        tasks = []
+        connect_start = time.perf_counter()
+        for i, sub in enumerate(subscribers):
+            tasks.append(asyncio.ensure_future(sub.run()))
+            if i % 100 == 99:
+                await asyncio.sleep(0.05)  # 逐步建立连接，避免超过监听队列
+        await asyncio.wait_for(asyncio.gather(*(sub.ready.wait() for sub in subscribers)), 120)
+        connect_s = time.perf_counter() - connect_start
+        rss_connected = rss_mb()
+
+        loop = asyncio.get_running_loop()
+        published_at = {}
+        cpu_start, client_start = time.process_time(), main_thread_cpu()
+        for i in range(n_events):
+            response = {'risk_score': i % 100, 'alert_level': 'high' if i % 2 else 'low'}
+            published_at[stream.seq + 1] = time.perf_counter()
+            await loop.run_in_executor(None, stream.publish, 'Jupiter', response)
+            await asyncio.sleep(interval)
+        last_seq = stream.seq
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline and not all(last_seq in s.received for s in subscribers):
+            await asyncio.sleep(0.05)
+        client_cpu = (main_thread_cpu() - client_start) / n_events
+        server_cpu = (time.process_time() - cpu_start) / n_events - client_cpu
+
+        delays = np.array([
+            sub.received[seq] - published_at[seq]
+            for sub in subscribers for seq in published_at if seq in sub.received
+        ]) * 1000
+        delivered = len(delays) / (len(subscribers) * n_events)
+
+        # 断开一半连接，期间继续发布，再带 Last-Event-ID 重连
+        half = subscribers[: n_subscribers // 2]
+        for task in tasks[: n_subscribers // 2]:
+            task.cancel()
+        await asyncio.gather(*tasks[: n_subscribers // 2], return_exceptions=True)
+        missed_from = stream.seq + 1
+        for i in range(10):
+            stream.publish('Orca', {'risk_score': i, 'alert_level': 'low'})
+        target = stream.seq
+        await asyncio.wait_for(
+            asyncio.gather(*(sub.run(last_id=sub.last_id, stop_after=target) for sub in half)), 60
+        )
+        complete = sum(all(seq in sub.received for seq in range(missed_from, target + 1)) for sub in half)
+
+        for task in tasks[n_subscribers // 2:]:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {
+            'connect_s': connect_s,
+            'rss_delta': rss_connected - rss_before,
+            'delays': delays,
+            'delivered': delivered,
+            'server_cpu': server_cpu,
+            'client_cpu': client_cpu,
+            'resumed_complete': complete,
+            'resumed_total': len(half),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSE 风险推送压测')
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=50)
+    parser.add_argument('--interval-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if app_module._prefetch_scheduler is not None:
+        app_module._prefetch_scheduler.stop()
+
+    stream = RiskStream(heartbeat=15, max_subscribers=args.subscribers + 10)
+    app_module._risk_stream = stream
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    server.socket.listen(1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/stream/risk'
+
+    try:
+        result = asyncio.run(scenario(url, stream, args.subscribers, args.events, args.interval_ms / 1000))
+    finally:
+        stream.close()
+        server.shutdown()
+
+    d = result['delays']
+    stats = stream.stats()
+    print(f"{args.subscribers} 个订阅者, {args.events} 个事件 (间隔 {args.interval_ms}ms)")
+    print(f"  建立连接         {result['connect_s']:.1f}s, RSS 增加 {result['rss_delta']:.1f}MB "
+          f"({result['rss_delta'] * 1024 / args.subscribers:.1f}KB/连接)")
+    print(f"  投递率           {result['delivered'] * 100:.2f}%")
+    print(f"  投递延迟         p50={np.percentile(d, 50):.1f}ms  p99={np.percentile(d, 99):.1f}ms  max={d.max():.1f}ms")
+    print(f"  服务端 CPU       {result['server_cpu'] * 1000:.1f}ms/事件 "
+          f"({result['server_cpu'] * 1e6 / args.subscribers:.1f}µs/事件/连接), "
+          f"客户端 CPU {result['client_cpu'] * 1000:.1f}ms/事件")
+    print(f"  Last-Event-ID 续传 {result['resumed_complete']}/{result['resumed_total']} 个连接补齐, "
+          f"续传 {stats['resumed']} 次, 快照 {stats['snapshots']} 次")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+多端点路由基准：单端点 vs 对冲路由的尾延迟
+
+两个本地 JSON-RPC 替身服务器：
+- 快但有长尾：常规 5ms，10% 请求 300ms
+- 稳定但较慢：常规 25ms
+对比只用第一个端点与 RpcRouter（按权重优先第一个端点，超过 p90 延迟发送对冲请求）
+的 p50/p99 延迟，以及对冲请求带来的额外请求比例。
+
+用法:
+    python scripts/benchmarks/bench_rpc_router.py [--calls 500] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import logging
+
+import numpy as np
+
+import bench_utils  # noqa: F401  (sys.path)
+
+from services.mock_rpc import MockRpcServer
+from services.rpc_client import AsyncRpcClient
+from services.rpc_router import RpcRouter
+
+
+async def drive(client, calls, concurrency):
+    loop = asyncio.get_running_loop()
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = loop.time()
+            await client.call('getSlot')
+            latencies.append(loop.time() - start)
+
+    try:
+        await asyncio.gather(*(one() for _ in range(calls)))
+    finally:
+        await client.close()
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多端点对冲路由基准')
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--percentile', type=float, default=90)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with MockRpcServer(latency_ms=5, slow_rate=0.1, slow_latency_ms=300) as fast, \
+            MockRpcServer(latency_ms=25) as steady:
+        print(f"{args.calls} 次调用, 并发 {args.concurrency}")
+        for label, make in (
+            ('单端点（长尾）', lambda: AsyncRpcClient(fast.url)),
+            (f'路由 + p{args.percentile:g} 对冲', lambda: RpcRouter(
+                [(fast.url, 10.0), (steady.url, 1.0)], hedge_percentile=args.percentile)),
+        ):
+            fast.reset_counters()
+            steady.reset_counters()
+            client = make()
+            ms = asyncio.run(drive(client, args.calls, args.concurrency))
+            extra = (fast.http_requests + steady.http_requests) / args.calls - 1
+            print(
+                f"  {label:18s} p50 {np.percentile(ms, 50):6.1f}ms  p99 {np.percentile(ms, 99):6.1f}ms  "
+                f"max {ms.max():6.1f}ms  额外请求 {extra:5.1%}"
+            )
+            if isinstance(client, RpcRouter):
+                for endpoint in client.stats()['endpoints']:
+                    print(f"    {endpoint['url']}  wins {endpoint['wins']}  hedge_wins {endpoint['hedge_wins']}")
+
+
+if __name__ == '__main__':
+    main()
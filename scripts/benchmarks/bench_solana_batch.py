@@ -0,0 +1,63 @@
+"""
+批量拉取基准：get_many_protocol_metrics 与逐个协议拉取对比
+
+统计 HTTP 请求数、RPC 调用数和总耗时（本地 JSON-RPC 替身服务器，固定往返延迟）。
+
+用法:
+    python scripts/benchmarks/bench_solana_batch.py [--latency-ms 20] [--rounds 5]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from bench_solana_fetch import make_registry
+
+from services.mock_rpc import MockRpcServer
+from services.solana_service import SolanaService
+
+
+def measure(server, fn, rounds):
+    """返回 (每轮 HTTP 请求数, 每轮 RPC 调用数, 每轮耗时中位数秒)"""
+    fn()  # 建立连接
+    server.reset_counters()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return server.http_requests / rounds, server.rpc_calls / rounds, float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON-RPC 批量拉取基准')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--sizes', default='6,100')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    with MockRpcServer(latency_ms=args.latency_ms) as server:
+        print(f"mock RPC 往返延迟 {args.latency_ms}ms")
+        for n in (int(s) for s in args.sizes.split(',')):
+            registry = make_registry(n)
+            names = list(registry)
+            service = SolanaService(demo_mode=False, rpc_url=server.url, registry=registry)
+
+            async def per_protocol():
+                return await asyncio.gather(*(service.fetch_protocol_metrics(p) for p in names))
+
+            for label, fn in (
+                ('逐个协议（并发）', lambda: service.run(per_protocol())),
+                ('get_many 批量', lambda: service.get_many_protocol_metrics(names)),
+            ):
+                http, calls, wall = measure(server, fn, args.rounds)
+                print(f"  {n:3d} 个协议  {label:12s} HTTP 请求 {http:6.0f}  RPC 调用 {calls:6.0f}  耗时 {wall * 1000:8.1f}ms")
+            service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+协议指标拉取基准：1 / 10 / 100 个协议并发时的吞吐量
+
+对本地 JSON-RPC 替身服务器（固定往返延迟）测量 SolanaService 的非 demo
+路径，并与不复用连接（每个请求新建 TCP 连接）的客户端对比。
+
+用法:
+    python scripts/benchmarks/bench_solana_fetch.py [--latency-ms 20] [--rounds 5]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from bench_utils import latency_summary
+
+from services.mock_rpc import MockRpcServer
+from services.protocol_registry import ProtocolAccounts
+from services.rpc_client import AsyncRpcClient
+from services.solana_service import SolanaService
+
+
+class _NoKeepAliveClient(AsyncRpcClient):
+    """对照组：每个 HTTP 请求都新建连接"""
+
+    def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, force_close=True)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+
+def make_registry(n):
+    return {
+        f'p{i}': ProtocolAccounts(f'P{i}', f'Program{i:04d}', f'Mint{i:04d}')
+        for i in range(n)
+    }
+
+
+def run(service, names, rounds):
+    """并发拉取 names 的指标 rounds 轮，返回 (协议/秒, 每轮耗时样本)"""
+    async def fetch_all():
+        return await asyncio.gather(*(service.fetch_protocol_metrics(n) for n in names))
+
+    service.run(fetch_all())  # 建立连接
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        service.run(fetch_all())
+        samples.append(time.perf_counter() - start)
+    return len(names) * rounds / sum(samples), samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SolanaService 指标拉取吞吐基准')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--sizes', default='1,10,100')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    sizes = [int(s) for s in args.sizes.split(',')]
+    registry = make_registry(max(sizes))
+
+    with MockRpcServer(latency_ms=args.latency_ms) as server:
+        print(f"mock RPC 往返延迟 {args.latency_ms}ms, 每个协议 8 次 RPC 调用")
+        for label, client_cls in (('连接池+keep-alive', AsyncRpcClient), ('无 keep-alive', _NoKeepAliveClient)):
+            for n in sizes:
+                service = SolanaService(demo_mode=False, rpc_url=server.url, registry=registry)
+                service._client = client_cls(server.url, max_connections=32, max_concurrency=64)
+                server.reset_counters()
+
+                throughput, samples = run(service, list(registry)[:n], args.rounds)
+                print(
+                    f"  {label:16s} 并发 {n:3d} 个协议: {throughput:8.1f} 协议/s  "
+                    f"每轮 {latency_summary(samples)}  TCP 连接 {len(server.connections)}"
+                )
+                service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+流式摄取基准：持续事件吞吐（events/s）
+
+回放 mock RPC 录制的合成事件流（程序日志、头部持有人余额变化、mint 更新），
+分别测量：
+- 端到端：websocket 推送 → JSON 解析 → 账户解码 → 增量聚合
+- 仅聚合：直接调用 handle_message（不含网络）
+
+用法:
+    python scripts/benchmarks/bench_stream_ingestion.py [--events 50000]
+"""
+import argparse
+import logging
+import time
+
+import bench_utils  # noqa: F401  (sys.path)
+
+from services.ingestion import StreamIngestor
+from services.mock_rpc import MockRpcServer
+from services.protocol_registry import PROTOCOL_REGISTRY
+from services.solana_service import SolanaService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='websocket 流式摄取吞吐基准')
+    parser.add_argument('--events', type=int, default=50000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    names = [p.name for p in PROTOCOL_REGISTRY.values()]
+    with MockRpcServer() as server:
+        service = SolanaService(demo_mode=False, rpc_url=server.url)
+        ingestor = StreamIngestor(service, server.ws_url, names)
+        ingestor.start()
+        if not ingestor.wait_ready():
+            raise SystemExit('订阅未就绪')
+        print(f"{len(names)} 个协议, {ingestor.stats()['subscriptions']} 个订阅")
+
+        events = server.record_events(PROTOCOL_REGISTRY, args.events)
+
+        # 端到端
+        base = ingestor.events
+        start = time.perf_counter()
+        sent = server.replay(events)
+        while ingestor.events - base < sent:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        print(f"  端到端   {sent:7d} 事件  {elapsed * 1000:8.1f}ms  {sent / elapsed:10,.0f} events/s")
+
+        # 仅解析与聚合：按订阅 id 重建通知文本
+        by_target = {
+            ('logs' if kind == 'logs' else 'account', address): sid
+            for sid, (_, kind, address) in ingestor._subscriptions.items()
+        }
+        messages = [
+            '{"jsonrpc":"2.0","method":"n","params":{"subscription":%d,"result":{"context":{"slot":1},"value":%s}}}'
+            % (by_target[(kind, target)], value)
+            for kind, target, value in events
+            if (kind, target) in by_target
+        ]
+        start = time.perf_counter()
+        for raw in messages:
+            ingestor.handle_message(raw)
+        elapsed = time.perf_counter() - start
+        print(f"  仅聚合   {len(messages):7d} 事件  {elapsed * 1000:8.1f}ms  {len(messages) / elapsed:10,.0f} events/s")
+        print(f"  解码失败 {ingestor.decode_errors}")
+
+        ingestor.stop()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+训练数据存储基准：CSV vs 列式 NPY 分片
+
+每种读取方式在独立子进程中运行，统计加载耗时和峰值 RSS：
+- csv:       pd.read_csv 读入完整 DataFrame（旧路径）
+- npy-full:  分片读入完整 DataFrame
+- npy-stream: 按分片 mmap 流式遍历（训练管道使用的方式）
+- train-*:   内存训练 vs 流式训练
+
+用法:
+    python scripts/benchmarks/bench_training_store.py [--rows 5000000] [--train-rows 1000000]
+"""
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+from bench_utils import peak_rss_mb
+
+
+def run(mode, path, results):
+    logging.disable(logging.INFO)
+    import pandas as pd
+    from models.data_store import ShardedDataset
+    from models.train_model import FEATURE_COLUMNS, LABEL_COLUMN, train_risk_model, train_risk_model_streaming
+    
+    start = time.perf_counter()
+    if mode == 'csv':
+        df = pd.read_csv(path)
+        rows = len(df)
+    elif mode == 'npy-full':
+        rows = len(ShardedDataset(path).to_dataframe())
+    elif mode == 'npy-stream':
+        rows = 0
+        for X, y in ShardedDataset(path).iter_xy(FEATURE_COLUMNS, LABEL_COLUMN):
+            rows += len(y)
+    elif mode == 'train-csv':
+        df = pd.read_csv(path)
+        rows = len(df)
+        train_risk_model(df, n_jobs=-1)
+    else:
+        dataset = ShardedDataset(path)
+        rows = len(dataset)
+        train_risk_model_streaming(dataset, n_jobs=-1)
+    results.put((time.perf_counter() - start, peak_rss_mb(), rows))
+
+
+def measure(mode, path):
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    proc = ctx.Process(target=run, args=(mode, path, results))
+    proc.start()
+    elapsed, rss, rows = results.get()
+    proc.join()
+    print(f"{mode:11s} rows={rows:>10,}  耗时={elapsed:7.2f}s  峰值RSS={rss:8.1f}MB")
+
+
+def prepare(rows, chunk_size, out_dir):
+    logging.disable(logging.INFO)
+    from models.data_store import write_shards
+    from models.train_model import LABEL_COLUMN, iter_synthetic_training_data
+    
+    os.makedirs(out_dir, exist_ok=True)
+    csv_path = os.path.join(out_dir, 'training_data.csv')
+    npy_path = os.path.join(out_dir, 'training_data')
+    
+    first = True
+    for chunk in iter_synthetic_training_data(rows, chunk_size=chunk_size):
+        chunk.to_csv(csv_path, mode='w' if first else 'a', header=first, index=False)
+        first = False
+    write_shards(iter_synthetic_training_data(rows, chunk_size=chunk_size), npy_path, label_column=LABEL_COLUMN)
+    
+    size = lambda p: sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(p) for f in fs) \
+        if os.path.isdir(p) else os.path.getsize(p)
+    print(f"rows={rows:,}  CSV {size(csv_path) / 2**20:.1f}MB  NPY {size(npy_path) / 2**20:.1f}MB")
+    return csv_path, npy_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='训练数据存储基准')
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--train-rows', type=int, default=1_000_000)
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix='bench-store-') as tmp:
+        csv_path, npy_path = prepare(args.rows, args.chunk_size, os.path.join(tmp, 'load'))
+        for mode, path in (('csv', csv_path), ('npy-full', npy_path), ('npy-stream', npy_path)):
+            measure(mode, path)
+        
+        csv_path, npy_path = prepare(args.train_rows, args.chunk_size // 2, os.path.join(tmp, 'train'))
+        measure('train-csv', csv_path)
+        measure('train-npy', npy_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+基准测试公共工具
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+# 与 tests/conftest.py 一致：把 backend/ 加入 sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+backend_path = os.path.join(project_root, 'backend')
+for path in (backend_path, project_root):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# 压测客户端都来自本机同一地址，关闭按 IP 限流（子进程启动的服务器同样继承）
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+
+def time_calls(fn, n_iter, warmup=20):
+    """重复调用 fn，返回每次调用耗时（秒）数组"""
+    for _ in range(warmup):
+        fn()
+    
+    samples = np.empty(n_iter)
+    for i in range(n_iter):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    return samples
+
+
+def latency_summary(samples) -> str:
+    """格式化 p50/p99/mean 延迟（微秒）"""
+    us = np.asarray(samples) * 1e6
+    return (
+        f"p50={np.percentile(us, 50):9.1f}µs  "
+        f"p99={np.percentile(us, 99):9.1f}µs  "
+        f"mean={us.mean():9.1f}µs"
+    )
+
+
+def peak_rss_mb() -> float:
+    """当前进程峰值 RSS（MB，Linux/macOS）"""
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def ensure_model_file(model_path) -> str:
+    """返回可用的模型文件路径；不存在时按 train_model.py 的默认流程训练到临时目录"""
+    import tempfile
+    from models.train_model import generate_synthetic_training_data, train_risk_model, save_model
+    
+    if model_path and os.path.exists(model_path):
+        return model_path
+    
+    df = generate_synthetic_training_data(n_samples=2000)
+    model, _ = train_risk_model(df)
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-model-'), 'risk_model.pkl')
+    save_model(model, path)
+    return path
+
+
+def load_or_train_model(model_path):
+    """加载模型对象（必要时先训练）"""
+    import pickle
+    
+    with open(ensure_model_file(model_path), 'rb') as f:
+        return pickle.load(f)
@@ -306,36 +306,101 @@ async function broadcastAlert(protocol, riskScore) {
     }
 }
 
-// ==================== 定时任务（可选）====================
+// ==================== 风险推送订阅 ====================
 
-// 每5分钟检查一次所有协议（可选功能）
-const cron = require('node-cron');
+// 订阅后端 SSE 推送（/api/stream/risk），风险分数变化时即时检查，取代每5分钟轮询
+const WATCHED_PROTOCOLS = ['Jupiter', 'Orca', 'Raydium', 'Serum'];
+const STREAM_IDLE_TIMEOUT = 45000; // 超过3个心跳周期没有数据视为连接已断开
+const STREAM_FALLBACK_INTERVAL = 5 * 60 * 1000; // 推送不可用时的批量检查间隔
+const lastScores = {};
+let lastEventId = null;
 
-cron.schedule('*/5 * * * *', async () => {
-    if (subscribers.size === 0) return;
-    
-    console.log('⏰ 执行定时风险检查...');
-    
-    const protocols = ['Jupiter', 'Orca', 'Raydium', 'Serum'];
-    
-    for (const protocol of protocols) {
+async function watchRiskStream() {
+    try {
+        const response = await axios.get(`${API_BASE}/api/stream/risk`, {
+            params: { protocols: WATCHED_PROTOCOLS.join(',') },
+            // 断线重连时从上次收到的事件之后续传
+            headers: lastEventId ? { 'Last-Event-ID': lastEventId } : {},
+            responseType: 'stream',
+            timeout: 0
+        });
+        console.log('📡 已连接风险推送流');
+        
+        const stream = response.data;
+        let idleTimer = setTimeout(() => stream.destroy(), STREAM_IDLE_TIMEOUT);
+        let buffer = '';
         try {
-            const response = await axios.get(`${API_BASE}/api/predict_risk`, {
-                params: { protocol }
-            });
-            
-            const { risk_score } = response.data;
-            
-            // 如果风险分数>80，发送警报
-            if (risk_score > 80) {
-                await broadcastAlert(protocol, risk_score);
+            for await (const chunk of stream) {
+                clearTimeout(idleTimer);
+                idleTimer = setTimeout(() => stream.destroy(), STREAM_IDLE_TIMEOUT);
+                
+                buffer += chunk.toString();
+                let end;
+                while ((end = buffer.indexOf('\n\n')) !== -1) {
+                    await handleStreamEvent(buffer.slice(0, end));
+                    buffer = buffer.slice(end + 2);
+                }
             }
-            
-        } catch (error) {
-            console.error(`检查 ${protocol} 失败:`, error.message);
+        } finally {
+            clearTimeout(idleTimer);
         }
+    } catch (error) {
+        if (error.response && error.response.status === 503) {
+            // 后端不提供推送（单线程 worker 部署）或连接数已满：本轮改为批量查询，5分钟后再尝试订阅
+            console.warn('⚠️ 风险推送不可用，改为每5分钟批量检查');
+            await checkRisksOnce();
+            setTimeout(watchRiskStream, STREAM_FALLBACK_INTERVAL);
+            return;
+        }
+        console.error('风险推送连接中断:', error.message);
     }
-});
+    
+    setTimeout(watchRiskStream, 3000);
+}
+
+async function checkRisksOnce() {
+    if (subscribers.size === 0) return;
+    try {
+        // 一次批量请求获取所有协议风险
+        const response = await axios.post(`${API_BASE}/api/predict_risk/batch`, {
+            protocols: WATCHED_PROTOCOLS
+        });
+        for (const { protocol, risk_score } of response.data.results) {
+            await handleScore(protocol, risk_score);
+        }
+    } catch (error) {
+        console.error('批量风险检查失败:', error.message);
+    }
+}
+
+async function handleStreamEvent(block) {
+    const fields = {};
+    for (const line of block.split('\n')) {
+        if (!line || line.startsWith(':')) continue; // 心跳注释行
+        const i = line.indexOf(': ');
+        if (i > 0) fields[line.slice(0, i)] = line.slice(i + 2);
+    }
+    if (fields.id) lastEventId = fields.id;
+    if (!fields.data) return;
+    
+    const data = JSON.parse(fields.data);
+    const scores = fields.event === 'snapshot'
+        ? Object.entries(data.scores).map(([protocol, [risk_score]]) => ({ protocol, risk_score }))
+        : [data];
+    
+    for (const { protocol, risk_score } of scores) {
+        await handleScore(protocol, risk_score);
+    }
+}
+
+async function handleScore(protocol, risk_score) {
+    // 风险分数升破80时发送警报；持续高位或重连收到快照时不重复推送
+    const previous = lastScores[protocol];
+    lastScores[protocol] = risk_score;
+    if (risk_score > 80 && !(previous > 80) && subscribers.size > 0) {
+        await broadcastAlert(protocol, risk_score);
+    }
+}
 
 // ==================== 错误处理 ====================
 
@@ -350,6 +415,8 @@ async function startBot() {
     console.log('🚀 启动 Prophet Sentinel Bot...');
     console.log(`📡 API地址: ${API_BASE}`);
     
+    watchRiskStream();
+    
     try {
         await bot.launch({
             dropPendingUpdates: true // 忽略启动前的旧消息
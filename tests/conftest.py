@@ -26,6 +26,8 @@ if project_root not in sys.path:
 os.environ['TESTING'] = 'true'
 os.environ['FLASK_ENV'] = 'testing'
 os.environ['FLASK_DEBUG'] = 'false'
+# 测试客户端的请求都来自同一地址，默认关闭限流；限流测试自行注入限流器
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
 
 # ==================== 日志配置 | Logging Configuration ====================
 # 减少测试期间的日志噪音
@@ -69,6 +71,8 @@ def pytest_collection_modifyitems(config, items):
         elif "test_model" in str(item.fspath):
             item.add_marker(pytest.mark.model)
             item.add_marker(pytest.mark.unit)
+        elif "test_services" in str(item.fspath):
+            item.add_marker(pytest.mark.integration)
 
 
 # ==================== 路径 Fixtures | Path Fixtures ====================
@@ -137,6 +141,27 @@ def low_risk_protocol_data():
     }
 
 
+@pytest.fixture(scope='session')
+def trained_model_path(tmp_path_factory):
+    """训练一个小型 RandomForest 并保存，供真实模型推理测试使用"""
+    from models.train_model import generate_synthetic_training_data, train_risk_model, save_model
+    
+    df = generate_synthetic_training_data(n_samples=400)
+    model, _ = train_risk_model(df)
+    path = str(tmp_path_factory.mktemp('model') / 'risk_model.pkl')
+    save_model(model, path)
+    return path
+
+
+@pytest.fixture
+def mock_rpc_server():
+    """启动本地 JSON-RPC 替身服务器，测试结束后关闭"""
+    from services.mock_rpc import MockRpcServer
+    
+    with MockRpcServer() as server:
+        yield server
+
+
 @pytest.fixture
 def protocol_list():
     """提供协议列表"""
@@ -2,6 +2,8 @@
 API 端点测试
 Tests for Prophet Sentinel API endpoints
 """
+import json
+
 import pytest
 from app import app, init_services
 from test_helpers import APITestHelper
@@ -78,10 +80,578 @@ def test_invalid_endpoint(client):
     response = client.get('/api/nonexistent')
     assert response.status_code == 404
 
+def test_predict_risk_batch(client, protocol_list):
+    """测试批量风险预测"""
+    response = client.post('/api/predict_risk/batch', json={'protocols': protocol_list})
+    data = api_helper.assert_valid_api_response(response, 200)
+    
+    assert data['total'] == len(protocol_list)
+    assert [r['protocol'] for r in data['results']] == protocol_list
+    for result in data['results']:
+        api_helper.assert_risk_prediction_format(result)
+
+def test_predict_risk_batch_invalid(client):
+    """测试批量风险预测参数校验"""
+    response = client.post('/api/predict_risk/batch', json={})
+    api_helper.assert_error_response(response, 400)
+    
+    response = client.post('/api/predict_risk/batch', json={'protocols': 'Jupiter'})
+    api_helper.assert_error_response(response, 400)
+
+def test_health_reports_batching(client):
+    """测试健康检查包含微批处理字段"""
+    response = client.get('/api/health')
+    data = response.get_json()
+    assert 'batching' in data
+
+def test_health_reports_prediction_cache(client):
+    """测试健康检查包含预测缓存计数"""
+    client.get('/api/predict_risk?protocol=Jupiter')
+    data = client.get('/api/health').get_json()
+    
+    cache_stats = data['prediction_cache']
+    if cache_stats is not None:
+        for field in ('hits', 'misses', 'evictions'):
+            assert field in cache_stats
+
+def test_health_reports_metrics_cache(client):
+    """测试健康检查包含链上指标缓存计数"""
+    data = client.get('/api/health').get_json()
+    
+    for field in ('hits', 'stale_served', 'coalesced'):
+        assert field in data['metrics_cache']
+
+def test_warmup_and_reinit_after_fork(client):
+    """测试预热与 fork 后重置不影响后续请求"""
+    from app import warmup_services, reinit_after_fork, get_solana_service
+    
+    warmup_services(rounds=1)
+    reinit_after_fork()
+    
+    assert get_solana_service()._client is None
+    response = client.get('/api/predict_risk?protocol=Orca')
+    api_helper.assert_valid_api_response(response, 200)
+
+def test_preload_warmup_starts_no_threads(client, monkeypatch, mock_rpc_server):
+    """测试 preload master 预热（非 demo 模式）不发 RPC、不启动事件循环线程、不打开连接"""
+    import threading
+    import app as app_module
+    from services.solana_service import SolanaService
+    
+    service = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url)
+    monkeypatch.setattr(app_module, '_solana_service', service)
+    before = set(threading.enumerate())
+    
+    app_module.warmup_services(rounds=2, start_background=False)
+    
+    assert set(threading.enumerate()) - before == set()
+    assert service._loop_thread is None and service._client is None
+    assert mock_rpc_server.http_requests == 0
+
+def test_health_reports_model_version(client):
+    """测试健康检查包含模型版本与热更新信息"""
+    data = client.get('/api/health').get_json()
+    
+    assert 'version' in data['model']
+    assert 'loaded_at' in data['model']
+    assert 'model_reloader' in data
+
+def test_predict_risk_served_from_prefetch_store(client):
+    """测试预取调度器打分后，预测请求直接读取分数存储"""
+    import app as app_module
+    
+    scheduler = app_module._prefetch_scheduler
+    if scheduler is None:
+        pytest.skip('预取调度未启用')
+    
+    scheduler.refresh_once()
+    hits_before = scheduler.store.hits
+    
+    response = client.get('/api/predict_risk?protocol=Jupiter')
+    assert response.status_code == 200
+    api_helper.assert_risk_prediction_format(response.get_json())
+    assert scheduler.store.hits == hits_before + 1
+    
+    data = client.get('/api/health').get_json()
+    assert data['prefetch']['store']['size'] >= 1
+
+@pytest.fixture
+def no_prefetch(monkeypatch):
+    """关闭预取分数存储并清空最近分数和已编码响应，使请求走按需计算路径"""
+    import app as app_module
+    from models.cache import PredictionCache
+    from scheduler import ScoreStore
+    
+    monkeypatch.setattr(app_module, '_score_store', None)
+    monkeypatch.setattr(app_module, '_last_known_scores', ScoreStore(protocols=app_module.PROTOCOL_REGISTRY))
+    monkeypatch.setattr(app_module, '_risk_bodies', PredictionCache())
+    return app_module
 
+def _raise_timeout(*args, **kwargs):
+    raise TimeoutError()
 
+def test_predict_risk_deadline_serves_stale_score(client, no_prefetch, monkeypatch):
+    """测试拉取指标超时时返回最近一次的分数，并标记 stale 和距今秒数"""
+    fresh = client.get('/api/predict_risk?protocol=Orca')
+    api_helper.assert_valid_api_response(fresh, 200)
+    misses_before = client.get('/api/health').get_json()['deadlines']['misses'].get('metrics', 0)
+    
+    monkeypatch.setattr(no_prefetch.get_solana_service(), 'get_protocol_metrics', _raise_timeout)
+    response = client.get('/api/predict_risk?protocol=Orca')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['stale'] is True
+    assert data['stale_age_seconds'] >= 0
+    assert data['risk_score'] == fresh.get_json()['risk_score']
+    
+    deadlines = client.get('/api/health').get_json()['deadlines']
+    assert deadlines['misses']['metrics'] == misses_before + 1
+    assert deadlines['stale_served'] >= 1
 
+def test_predict_risk_deadline_without_fallback(client, no_prefetch, monkeypatch):
+    """测试超时且没有旧分数时返回 504"""
+    monkeypatch.setattr(no_prefetch.get_solana_service(), 'get_protocol_metrics', _raise_timeout)
+    
+    response = client.get('/api/predict_risk?protocol=Raydium')
+    assert response.status_code == 504
+    assert response.get_json()['status'] == 'timeout'
 
+def test_predict_risk_client_deadline_header(client, no_prefetch):
+    """测试 X-Deadline-Ms 可以缩短预算，预测阶段超时被单独计数"""
+    misses_before = client.get('/api/health').get_json()['deadlines']['misses'].get('predict', 0)
+    
+    response = client.get('/api/predict_risk?protocol=Jupiter', headers={'X-Deadline-Ms': '0'})
+    assert response.status_code == 504
+    
+    misses = client.get('/api/health').get_json()['deadlines']['misses']
+    assert misses['predict'] == misses_before + 1
 
+def test_predict_risk_batch_deadline(client, no_prefetch, monkeypatch):
+    """测试批量预测超时时，有旧分数的协议回退，没有的返回错误条目"""
+    client.get('/api/predict_risk?protocol=Jupiter')
+    monkeypatch.setattr(no_prefetch.get_solana_service(), 'get_many_protocol_metrics', _raise_timeout)
+    
+    response = client.post('/api/predict_risk/batch', json={'protocols': ['Jupiter', 'Orca']})
+    assert response.status_code == 200
+    results = {item['protocol']: item for item in response.get_json()['results']}
+    assert results['Jupiter']['stale'] is True
+    assert results['Orca']['status'] == 'timeout'
 
+def test_risk_heatmap(client, no_prefetch, monkeypatch):
+    """测试风险热图：全部协议一轮指标拉取、一次模型调用，返回矩阵格式"""
+    solana_svc = no_prefetch.get_solana_service()
+    risk_pred = no_prefetch.get_risk_predictor()
+    calls = {'metrics': 0, 'predict': 0}
+    
+    def counting(name, fn):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return fn(*args, **kwargs)
+        return wrapper
+    
+    monkeypatch.setattr(solana_svc, 'get_many_protocol_metrics', counting('metrics', solana_svc.get_many_protocol_metrics))
+    monkeypatch.setattr(risk_pred, 'predict_batch', counting('predict', risk_pred.predict_batch))
+    
+    response = client.get('/api/risk_heatmap')
+    data = api_helper.assert_valid_api_response(response, 200)
+    
+    assert calls == {'metrics': 1, 'predict': 1}
+    assert data['columns'] == ['protocol', 'risk_score', 'sustainable_score', 'alert_level', 'stale']
+    protocols = [p['name'] for p in client.get('/api/protocols').get_json()['protocols']]
+    assert [row[0] for row in data['rows']] == protocols
+    assert data['total'] == len(protocols)
+    for _, risk_score, sustainable_score, alert_level, stale in data['rows']:
+        assert 0 <= risk_score <= 100
+        assert 0 <= sustainable_score <= 100
+        assert alert_level in ('low', 'medium', 'high', 'critical')
+        assert stale is False
+
+def test_unknown_protocol_rejected_per_item(client, no_prefetch, monkeypatch, mock_rpc_server):
+    """测试非 demo 模式下未注册的协议：单个请求返回 404，批量和热图只对应一条错误条目"""
+    from services.solana_service import SolanaService
+    
+    service = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url)
+    monkeypatch.setattr(no_prefetch, '_solana_service', service)
+    try:
+        response = client.get('/api/predict_risk?protocol=NoSuchDex')
+        api_helper.assert_error_response(response, 404)
+        assert response.get_json()['status'] == 'unknown_protocol'
+        
+        response = client.post('/api/predict_risk/batch', json={'protocols': ['Orca', 'NoSuchDex']})
+        data = api_helper.assert_valid_api_response(response, 200)
+        orca, unknown = data['results']
+        api_helper.assert_risk_prediction_format(orca)
+        assert unknown == {'protocol': 'NoSuchDex', 'error': '不支持的协议: NoSuchDex', 'status': 'unknown_protocol'}
+        
+        monkeypatch.setattr(no_prefetch, 'SUPPORTED_PROTOCOLS', [
+            {'name': 'Orca', 'type': 'AMM DEX', 'supported': True},
+            {'name': 'NoSuchDex', 'type': 'AMM DEX', 'supported': True},
+        ])
+        data = api_helper.assert_valid_api_response(client.get('/api/risk_heatmap'), 200)
+        assert data['rows'][0][1] is not None
+        assert data['rows'][1] == ['NoSuchDex', None, None, 'unknown', False]
+        assert [e['protocol'] for e in data['errors']] == ['NoSuchDex']
+    finally:
+        service.close()
+
+def _sse_events(chunk: bytes) -> list:
+    """解析 SSE 字节块为 [(event, id, data)]，忽略注释和 retry 行"""
+    import json
+    
+    events = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if line and not line.startswith(':') and ': ' in line)
+        if 'event' in fields:
+            events.append((fields['event'], fields['id'], json.loads(fields['data'])))
+    return events
+
+def test_risk_stream_deltas_resume_and_lag():
+    """测试推送流：只在分数或等级变化时发事件，断线续传，落后过多时合并为快照"""
+    from risk_stream import RiskStream
+    
+    stream = RiskStream(history=4, heartbeat=0.01)
+    stream.publish('Jupiter', {'risk_score': 40, 'alert_level': 'medium'})
+    assert not stream.publish('Jupiter', {'risk_score': 40, 'alert_level': 'medium'})
+    
+    sub = stream.subscribe()
+    assert next(sub).startswith(b'retry:')
+    [(event, snapshot_id, data)] = _sse_events(next(sub))
+    assert event == 'snapshot' and data['scores'] == {'Jupiter': [40, 'medium']}
+    assert next(sub) == b': heartbeat\n\n'
+    
+    stream.publish('Jupiter', {'risk_score': 75, 'alert_level': 'high'})
+    stream.publish('Orca', {'risk_score': 10, 'alert_level': 'low'})
+    events = _sse_events(next(sub))
+    assert [e[2]['protocol'] for e in events] == ['Jupiter', 'Orca']
+    assert events[0][2]['prev_risk_score'] == 40
+    last_id = events[0][1]
+    sub.close()
+    assert stream.stats()['subscribers'] == 0
+    
+    # 续传：从 Jupiter 事件之后补发 Orca，不再发送快照
+    resumed = stream.subscribe(last_event_id=last_id, protocols=['orca'])
+    next(resumed)
+    assert [e[2]['protocol'] for e in _sse_events(next(resumed))] == ['Orca']
+    
+    # 落后超过环形缓冲区：合并为一次快照
+    for score in range(20, 30):
+        stream.publish('Raydium', {'risk_score': score, 'alert_level': 'low'})
+    [(event, _, data)] = _sse_events(next(resumed))
+    assert event == 'snapshot' and data['scores'] == {'Orca': [10, 'low']}
+    resumed.close()
+    
+    # 其它纪元的 id（服务重启）发送快照
+    other = stream.subscribe(last_event_id='deadbeef-1')
+    next(other)
+    assert _sse_events(next(other))[0][0] == 'snapshot'
+    other.close()
+    
+    stats = stream.stats()
+    assert stats['resumed'] == 1 and stats['lagged'] == 1 and stats['subscribers'] == 0
 
+def test_stream_risk_endpoint(client, monkeypatch):
+    """测试 SSE 端点：分数存储写入触发推送，连接关闭后释放名额，超过上限返回 503"""
+    import threading
+    import app as app_module
+    from risk_stream import RiskStream
+    
+    stream = RiskStream(heartbeat=0.01, max_subscribers=100)
+    monkeypatch.setattr(app_module, '_risk_stream', stream)
+    monkeypatch.setattr(app_module._last_known_scores, 'on_put', stream.publish)
+    monkeypatch.setattr(app_module, '_wsgi_stream_slots', threading.BoundedSemaphore(1))
+    
+    # 单线程 worker 不提供推送，客户端回退到轮询
+    unavailable = client.get('/api/stream/risk')
+    assert unavailable.status_code == 503
+    assert unavailable.get_json()['status'] == 'stream_unavailable'
+    
+    response = client.get('/api/stream/risk?protocols=Orca', buffered=False, multithread=True)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    # 推送线程名额已满，普通请求不受影响
+    busy = client.get('/api/stream/risk', multithread=True)
+    assert busy.status_code == 503 and busy.get_json()['status'] == 'busy'
+    assert client.get('/api/protocols', multithread=True).status_code == 200
+    
+    chunks = iter(response.response)
+    next(chunks)
+    assert _sse_events(next(chunks))[0][0] == 'snapshot'
+    
+    app_module._last_known_scores.put('Orca', {'protocol': 'Orca', 'risk_score': 55, 'alert_level': 'medium'}, ())
+    [(event, _, data)] = _sse_events(next(chunks))
+    assert (event, data['protocol'], data['risk_score']) == ('risk', 'Orca', 55)
+    
+    response.close()
+    assert stream.stats()['subscribers'] == 0
+    assert client.get('/api/health').get_json()['risk_stream']['published'] == 1
+    
+    reconnected = client.get('/api/stream/risk', buffered=False, multithread=True)
+    assert reconnected.status_code == 200
+    reconnected.close()
+
+def test_unknown_protocols_not_stored_or_pushed(client, no_prefetch, monkeypatch):
+    """测试请求参数中的任意协议名不进入最近分数存储，也不推送给订阅者"""
+    from risk_stream import RiskStream
+    
+    stream = RiskStream()
+    monkeypatch.setattr(no_prefetch, '_risk_stream', stream)
+    monkeypatch.setattr(no_prefetch._last_known_scores, 'on_put', stream.publish)
+    
+    for name in ('zz0', 'zz1', 'zz2'):
+        assert client.get(f'/api/predict_risk?protocol={name}').status_code == 200
+    assert client.get('/api/predict_risk?protocol=orca').status_code == 200
+    
+    assert len(no_prefetch._last_known_scores) == 1
+    assert no_prefetch._last_known_scores.stats()['ignored'] == 3
+    assert stream.stats()['published'] == 1
+
+def _count_predictions(app_module, monkeypatch) -> list:
+    """统计模型调用次数"""
+    backend = app_module.get_prediction_backend()
+    calls = []
+    original = backend.predict
+    
+    def counting_predict(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    
+    monkeypatch.setattr(backend, 'predict', counting_predict)
+    return calls
+
+def test_predict_risk_etag_not_modified(client, no_prefetch, monkeypatch):
+    """测试弱 ETag：If-None-Match 命中返回 304 且不运行模型；指标变化后 ETag 随之变化"""
+    calls = _count_predictions(no_prefetch, monkeypatch)
+    
+    first = client.get('/api/predict_risk?protocol=Marinade')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and len(calls) == 1
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert first.headers['Cache-Control'].startswith('public, max-age=')
+    
+    revalidated = client.get('/api/predict_risk?protocol=Marinade', headers={'If-None-Match': f'W/"x", {etag}'})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+    assert len(calls) == 1
+    
+    # 缓存期内同一 ETag 复用已编码的响应；过期后重新生成，timestamp 不同但 ETag 不变
+    again = client.get('/api/predict_risk?protocol=Marinade')
+    assert again.data == first.data and len(calls) == 1
+    no_prefetch._risk_bodies.clear()
+    rebuilt = client.get('/api/predict_risk?protocol=Marinade')
+    assert rebuilt.headers['ETag'] == etag
+    assert rebuilt.get_json()['risk_score'] == first.get_json()['risk_score'] and len(calls) == 2
+    # 去掉 W/ 前缀的同一个值也算命中
+    assert client.get('/api/predict_risk?protocol=Marinade', headers={'If-None-Match': etag[2:]}).status_code == 304
+    assert client.get('/api/health').get_json()['response_cache']['not_modified'] >= 1
+    
+    # 指标变化：旧 ETag 失效，重新打分
+    solana_svc = no_prefetch.get_solana_service()
+    original = solana_svc.get_protocol_metrics
+    monkeypatch.setattr(solana_svc, 'get_protocol_metrics',
+                        lambda p, timeout=None: {**original(p), 'whale_transfers': 99})
+    changed = client.get('/api/predict_risk?protocol=Marinade', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['metrics']['whale_transfers'] == 99
+    assert len(calls) == 3
+
+def test_predict_risk_etag_prefetched(client):
+    """测试预取路径同样带 ETag，并按分数刷新剩余时间设置 max-age"""
+    import app as app_module
+    from config import Config
+    
+    if app_module._score_store is None or app_module._score_store.get('Jupiter') is None:
+        pytest.skip('预取未启用')
+    
+    response = client.get('/api/predict_risk?protocol=Jupiter')
+    max_age = int(response.headers['Cache-Control'].rpartition('=')[2])
+    assert 0 <= max_age <= Config.PREFETCH_INTERVAL
+    
+    revalidated = client.get('/api/predict_risk?protocol=jupiter', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+def _asgi_call_raw(method: str, path: str, query: str = '', body: bytes = b'', headers: dict = None):
+    """直接调用 ASGI 应用，返回 (状态码, 响应头, 响应体)"""
+    import asyncio
+    import asgi
+    
+    messages = []
+    
+    async def scenario():
+        requests = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        
+        async def receive():
+            return requests.pop() if requests else {'type': 'http.disconnect'}
+        
+        async def send(message):
+            messages.append(message)
+        
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000), 'root_path': '', 'method': method, 'path': path, 'query_string': query.encode(),
+            'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+                       + [(b'content-length', str(len(body)).encode())],
+        }
+        await asgi.application(scope, receive, send)
+    
+    asyncio.run(scenario())
+    response_headers = {k.decode(): v.decode() for k, v in messages[0]['headers']}
+    payload = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return messages[0]['status'], response_headers, payload
+
+def _asgi_call(method: str, path: str, query: str = '', body: bytes = b'', headers: dict = None):
+    """直接调用 ASGI 应用，返回 (状态码, JSON)"""
+    status, _, payload = _asgi_call_raw(method, path, query, body, headers)
+    return status, json.loads(payload)
+
+def test_asgi_routes_match_flask(client):
+    """测试 ASGI 入口与 Flask 路由的状态码和响应字段一致"""
+    proof = {'wallet_hash': 'abc123', 'risk_score': 42}
+    cases = [
+        ('GET', '/api/health', '', b''),
+        ('GET', '/api/predict_risk', 'protocol=Orca', b''),
+        ('GET', '/api/protocols', '', b''),
+        ('POST', '/api/verify_proof', '', json.dumps(proof).encode()),
+        ('POST', '/api/verify_proof', '', b'{}'),
+    ]
+    for method, path, query, body in cases:
+        status, data = _asgi_call(method, path, query, body, {'Content-Type': 'application/json'})
+        expected = client.open(f'{path}?{query}', method=method, data=body, content_type='application/json')
+        assert status == expected.status_code, path
+        assert set(data) == set(expected.get_json()), path
+    
+    status, data = _asgi_call('GET', '/api/predict_risk', 'protocol=Orca')
+    api_helper.assert_risk_prediction_format(data)
+
+def test_asgi_predict_risk_deadline(client, no_prefetch, monkeypatch):
+    """测试 ASGI 预测：指标拉取超时与 Flask 一样返回 504 并计数"""
+    async def slow_metrics(*args, **kwargs):
+        raise TimeoutError()
+    
+    monkeypatch.setattr(no_prefetch.get_solana_service(), 'aget_protocol_metrics', slow_metrics)
+    misses_before = no_prefetch._deadline_stats.stats()['misses'].get('metrics', 0)
+    
+    status, data = _asgi_call('GET', '/api/predict_risk', 'protocol=Serum')
+    assert (status, data['status']) == (504, 'timeout')
+    assert no_prefetch._deadline_stats.stats()['misses']['metrics'] == misses_before + 1
+
+def test_asgi_falls_back_to_flask(client):
+    """测试未原生实现的路由转交 Flask 应用"""
+    status, data = _asgi_call('POST', '/api/predict_risk/batch', body=b'{"protocols": ["Jupiter"]}',
+                              headers={'Content-Type': 'application/json'})
+    assert status == 200 and data['total'] == 1
+    
+    status, data = _asgi_call('GET', '/api/nonexistent')
+    assert status == 404 and 'error' in data
+
+def test_asgi_stream_risk(client, monkeypatch):
+    """测试 ASGI 推送流：不占线程地等待事件，客户端断开后释放订阅"""
+    import asyncio
+    import app as app_module
+    import asgi
+    from risk_stream import RiskStream
+    
+    stream = RiskStream(heartbeat=5)
+    monkeypatch.setattr(app_module, '_risk_stream', stream)
+    chunks = []
+    
+    async def scenario():
+        disconnect = asyncio.Event()
+        received = asyncio.Event()
+        
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+        
+        async def send(message):
+            if message.get('body'):
+                chunks.append(message['body'])
+                received.set()
+        
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/stream/risk', 'query_string': b'', 'headers': []}
+        task = asyncio.ensure_future(asgi.application(scope, receive, send))
+        while len(chunks) < 2:
+            received.clear()
+            await received.wait()
+        # 从其它线程发布（与预取调度线程相同）
+        await asyncio.to_thread(stream.publish, 'Jupiter', {'risk_score': 90, 'alert_level': 'critical'})
+        received.clear()
+        await asyncio.wait_for(received.wait(), 2)
+        assert stream.stats()['subscribers'] == 1
+        disconnect.set()
+        await asyncio.wait_for(task, 2)
+    
+    asyncio.run(scenario())
+    assert _sse_events(chunks[1])[0][0] == 'snapshot'
+    [(event, _, data)] = _sse_events(chunks[2])
+    assert (event, data['risk_score']) == ('risk', 90)
+    assert stream.stats()['subscribers'] == 0
+
+def test_asgi_predict_risk_etag(client, no_prefetch, monkeypatch):
+    """测试 ASGI 预测返回与 Flask 相同的 ETag，If-None-Match 命中返回 304"""
+    calls = _count_predictions(no_prefetch, monkeypatch)
+    
+    status, headers, body = _asgi_call_raw('GET', '/api/predict_risk', 'protocol=Solend')
+    assert status == 200 and len(calls) == 1
+    flask_response = client.get('/api/predict_risk?protocol=Solend')
+    assert flask_response.headers['ETag'] == headers['etag']
+    assert flask_response.data == body
+    
+    status, headers, body = _asgi_call_raw('GET', '/api/predict_risk', 'protocol=Solend',
+                                           headers={'If-None-Match': headers['etag']})
+    assert (status, body) == (304, b'')
+    assert 'content-type' not in headers and headers['cache-control'].startswith('public, max-age=')
+    assert len(calls) == 1
+
+@pytest.fixture
+def rate_limited(monkeypatch, tmp_path):
+    """注入容量为 3 的共享限流器"""
+    import app as app_module
+    from utils.rate_limit import SharedRateLimiter
+    
+    limiter = SharedRateLimiter(str(tmp_path / 'ratelimit'), capacity=3, per_seconds=60, slots=64)
+    monkeypatch.setattr(app_module, '_rate_limiter', limiter)
+    yield app_module
+    limiter.close()
+
+def test_rate_limit_returns_429_with_retry_after(client, rate_limited, monkeypatch):
+    """测试超过每分钟请求数后返回 429 和 Retry-After，健康检查不限流"""
+    for _ in range(3):
+        assert client.get('/api/protocols').status_code == 200
+    
+    response = client.get('/api/protocols')
+    assert response.status_code == 429
+    assert response.get_json()['status'] == 'rate_limited'
+    assert 1 <= int(response.headers['Retry-After']) <= 20
+    
+    assert client.get('/api/health').status_code == 200
+    assert client.get('/api/health').get_json()['rate_limit']['denied'] == 1
+    
+    # 默认不信任 X-Forwarded-For，伪造来源地址不能绕过限流
+    assert client.get('/api/protocols', headers={'X-Forwarded-For': '198.51.100.7'}).status_code == 429
+    
+    # 一层代理：按代理追加的最右侧地址限流，客户端在左侧伪造的地址不起作用
+    monkeypatch.setattr(rate_limited.Config, 'RATE_LIMIT_PROXY_HOPS', 1)
+    for spoofed in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+        headers = {'X-Forwarded-For': f'{spoofed}, 198.51.100.7'}
+        assert client.get('/api/protocols', headers=headers).status_code == 200
+    assert client.get('/api/protocols', headers={'X-Forwarded-For': '4.4.4.4, 198.51.100.7'}).status_code == 429
+    # 两层代理：从右数第 2 个
+    monkeypatch.setattr(rate_limited.Config, 'RATE_LIMIT_PROXY_HOPS', 2)
+    assert client.get('/api/protocols', headers={'X-Forwarded-For': '5.5.5.5, 203.0.113.1, 10.0.0.2'}).status_code == 200
+    # 条目不足时使用对端地址（已超限）
+    assert client.get('/api/protocols', headers={'X-Forwarded-For': '203.0.113.1'}).status_code == 429
+
+def test_asgi_rate_limit_shares_bucket(client, rate_limited):
+    """测试 ASGI 原生路由与 Flask 路由消耗同一个客户端的令牌"""
+    assert client.get('/api/protocols').status_code == 200
+    assert _asgi_call('GET', '/api/protocols')[0] == 200
+    assert _asgi_call('GET', '/api/predict_risk', 'protocol=Orca')[0] == 200
+    
+    status, headers, payload = _asgi_call_raw('GET', '/api/protocols')
+    assert status == 429
+    assert headers['retry-after'] == '20'
+    assert json.loads(payload)['status'] == 'rate_limited'
+    assert client.get('/api/protocols').status_code == 429
@@ -58,10 +58,472 @@ def test_predict_with_zero_values():
     result = predictor.predict(metrics)
     assert 'risk_score' in result
 
+def test_predict_batch_demo_mode(sample_protocol_data, high_risk_protocol_data):
+    """测试演示模式批量预测"""
+    predictor = RiskPredictor(demo_mode=True)
+    
+    results = predictor.predict_batch([sample_protocol_data, high_risk_protocol_data])
+    
+    assert len(results) == 2
+    assert results[1]['risk_score'] > 50
+    assert predictor.predict_batch([]) == []
 
+def test_predict_batch_matches_single(trained_model_path, protocol_list):
+    """测试批量预测结果与逐条预测一致"""
+    from test_helpers import MockDataGenerator
+    
+    predictor = RiskPredictor(model_path=trained_model_path)
+    assert predictor.demo_mode == False
+    
+    metrics_list = [MockDataGenerator.generate_random_metrics() for _ in protocol_list]
+    batch_results = predictor.predict_batch(metrics_list)
+    single_results = [predictor.predict(m) for m in metrics_list]
+    
+    assert batch_results == single_results
 
+def test_compiled_forest_matches_sklearn():
+    """测试编译引擎与 sklearn predict_proba 结果一致（深树、带噪声标签）"""
+    from sklearn.ensemble import RandomForestClassifier
+    from models.forest_engine import CompiledForest
+    
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(0, 150_000_000, 2000),
+        rng.uniform(-0.5, 0.5, 2000),
+        rng.integers(0, 25, 2000),
+        rng.uniform(0, 1, 2000),
+    ])
+    y = (X[:, 3] + rng.normal(0, 0.3, 2000) > 0.5).astype(int)
+    
+    model = RandomForestClassifier(
+        n_estimators=30, max_depth=10, min_samples_split=5,
+        random_state=42, class_weight='balanced'
+    ).fit(X[:1500], y[:1500])
+    compiled = CompiledForest.from_sklearn(model)
+    
+    assert compiled.max_depth > 1
+    np.testing.assert_array_equal(compiled.predict_proba(X[1500:]), model.predict_proba(X[1500:]))
+    np.testing.assert_array_equal(compiled.predict_proba(X[1500]), model.predict_proba(X[1500:1501]))
 
+def test_predictor_engines_agree(trained_model_path, high_risk_protocol_data, low_risk_protocol_data):
+    """测试两种推理引擎的预测结果一致"""
+    sklearn_pred = RiskPredictor(model_path=trained_model_path, engine='sklearn')
+    compiled_pred = RiskPredictor(model_path=trained_model_path, engine='compiled')
+    
+    assert sklearn_pred.active_model.compiled is None
+    assert compiled_pred.active_model.compiled is not None
+    
+    metrics_list = [high_risk_protocol_data, low_risk_protocol_data]
+    assert compiled_pred.predict_batch(metrics_list) == sklearn_pred.predict_batch(metrics_list)
 
+def test_predictor_unknown_engine():
+    """测试未知推理引擎"""
+    with pytest.raises(ValueError):
+        RiskPredictor(demo_mode=True, engine='onnx')
 
+def test_micro_batcher_coalesces_concurrent_requests(trained_model_path):
+    """测试微批处理合并并发请求，且每个调用方拿到自己的结果"""
+    import threading
+    from models.batcher import MicroBatcher
+    from test_helpers import MockDataGenerator
+    
+    predictor = RiskPredictor(model_path=trained_model_path)
+    batcher = MicroBatcher(predictor, window_ms=50, max_batch_size=64)
+    
+    metrics_list = [MockDataGenerator.generate_random_metrics() for _ in range(16)]
+    results = [None] * len(metrics_list)
+    
+    def worker(i):
+        results[i] = batcher.predict(metrics_list[i], timeout=5)
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(metrics_list))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    
+    assert results == predictor.predict_batch(metrics_list)
+    
+    stats = batcher.stats()
+    assert stats['rows'] == len(metrics_list)
+    assert stats['batches'] < len(metrics_list)
+    assert sum(stats['batch_size_histogram'].values()) == stats['batches']
+    assert stats['queue_wait_ms']['max'] >= 0
+
+def test_micro_batcher_respects_max_batch_size():
+    """测试单批不超过 max_batch_size"""
+    from concurrent.futures import ThreadPoolExecutor
+    from models.batcher import MicroBatcher
+    
+    batcher = MicroBatcher(RiskPredictor(demo_mode=True), window_ms=20, max_batch_size=4)
+    
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(lambda _: batcher.predict({'whale_transfers': 1}), range(12)))
+    batcher.close()
+    
+    assert len(results) == 12
+    assert batcher.stats()['max_observed_batch_size'] <= 4
 
+def test_micro_batcher_close_while_predicting():
+    """测试关闭与并发预测竞争：每个请求都拿到结果，不会排到停止哨兵之后一直阻塞"""
+    from concurrent.futures import ThreadPoolExecutor
+    from models.batcher import MicroBatcher, _PendingRequest
+    
+    batcher = MicroBatcher(RiskPredictor(demo_mode=True), window_ms=1, max_batch_size=4)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(batcher.predict, {'whale_transfers': 1}, 5) for _ in range(400)]
+        batcher.close()
+        results = [f.result(timeout=10) for f in futures]
+    assert all('risk_score' in r for r in results)
+    assert batcher.stats()['queue_depth'] == 0
+    
+    # 后台线程已退出时，遗留在队列里的请求以异常结束
+    orphan = _PendingRequest({'whale_transfers': 1})
+    batcher._queue.put(orphan)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        orphan.future.result(timeout=1)
 
+def test_micro_batcher_skips_timed_out_requests():
+    """测试排队超时的请求被取消：后台线程不再把它放进批次，也不会因设置已取消的结果而退出"""
+    import threading
+    import time
+    from models.batcher import MicroBatcher
+    
+    release = threading.Event()
+    batches = []
+    
+    class SlowPredictor:
+        def predict_batch(self, metrics_list):
+            batches.append([m['whale_transfers'] for m in metrics_list])
+            release.wait(5)
+            return [{'risk_score': m['whale_transfers']} for m in metrics_list]
+    
+    batcher = MicroBatcher(SlowPredictor(), window_ms=1, max_batch_size=4)
+    first = threading.Thread(target=batcher.predict, args=({'whale_transfers': 1},))
+    first.start()
+    while not batches:
+        time.sleep(0.001)
+    
+    with pytest.raises(TimeoutError):
+        batcher.predict({'whale_transfers': 2}, timeout=0.05)
+    release.set()
+    first.join(timeout=5)
+    
+    assert batcher.predict({'whale_transfers': 3}, timeout=5) == {'risk_score': 3}
+    assert batches == [[1], [3]]
+    batcher.close()
+
+def test_prediction_cache_lru_and_ttl(monkeypatch):
+    """测试缓存的 LRU 淘汰与 TTL 过期"""
+    from models import cache as cache_module
+    from models.cache import PredictionCache
+    
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1      # a 变为最近使用
+    cache.set('c', 3)               # 淘汰 b
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    
+    now[0] += 61
+    assert cache.get('a') is None
+    
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['evictions'] == 1
+    assert stats['expirations'] == 1
+
+def test_predictor_cache_hits_on_quantized_features(trained_model_path, sample_protocol_data):
+    """测试特征量化后相同的请求命中缓存"""
+    from models.cache import PredictionCache
+    
+    predictor = RiskPredictor(model_path=trained_model_path, cache=PredictionCache(max_size=16, ttl=60))
+    
+    first = predictor.predict(sample_protocol_data)
+    nearly_same = dict(sample_protocol_data, volume_24h=sample_protocol_data['volume_24h'] + 1)
+    second = predictor.predict(nearly_same)
+    other_protocol = predictor.predict(dict(sample_protocol_data, protocol='Orca'))
+    
+    assert first == second == other_protocol
+    stats = predictor.cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+
+def test_predictor_does_not_cache_fallback_rows(trained_model_path, sample_protocol_data, monkeypatch):
+    """测试模型预测失败时的规则降级结果不进入缓存，模型恢复后重新走模型"""
+    from models.cache import PredictionCache
+    
+    predictor = RiskPredictor(model_path=trained_model_path, cache=PredictionCache(max_size=16, ttl=60))
+    expected = predictor.predict(sample_protocol_data)
+    predictor.cache.clear()
+    
+    def broken(active, features):
+        raise RuntimeError('模型推理失败')
+    
+    monkeypatch.setattr(predictor, '_predict_proba', broken)
+    fallback = predictor.predict(sample_protocol_data)
+    assert fallback['risk_score'] == predictor._demo_predict(sample_protocol_data)['risk_score']
+    assert len(predictor.cache) == 0
+    
+    monkeypatch.undo()
+    assert predictor.predict(sample_protocol_data) == expected
+
+def test_forest_artifact_roundtrip(trained_model_path, tmp_path):
+    """测试 mmap 模型文件往返后推理结果不变，且数组为只读映射"""
+    import pickle
+    from models.artifact import load_forest_artifact, read_artifact_header, save_forest_artifact
+    from models.forest_engine import CompiledForest
+    
+    with open(trained_model_path, 'rb') as f:
+        model = pickle.load(f)
+    compiled = CompiledForest.from_sklearn(model)
+    
+    path = str(tmp_path / 'risk_model.forest')
+    header = save_forest_artifact(compiled, path)
+    loaded = load_forest_artifact(path)
+    
+    assert loaded.model_version == header['model_version'] == read_artifact_header(path)['model_version']
+    assert not loaded.value.flags.writeable
+    
+    X = np.array([[5e7, 0.1, 2, 0.4], [2e6, -0.35, 12, 0.88]])
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+
+def test_predictor_loads_forest_artifact(trained_model_path, tmp_path, high_risk_protocol_data):
+    """测试 RiskPredictor 直接加载 .forest 文件"""
+    import pickle
+    from models.train_model import save_model_artifact
+    
+    with open(trained_model_path, 'rb') as f:
+        model = pickle.load(f)
+    path = str(tmp_path / 'risk_model.forest')
+    save_model_artifact(model, path)
+    
+    mapped = RiskPredictor(model_path=path, engine='sklearn')
+    pickled = RiskPredictor(model_path=trained_model_path)
+    
+    assert mapped.demo_mode == False
+    assert mapped.model is None
+    assert mapped.engine == 'compiled'
+    assert mapped.predict(high_risk_protocol_data) == pickled.predict(high_risk_protocol_data)
+
+def test_invalid_forest_artifact(tmp_path):
+    """测试损坏的模型文件回退到演示模式"""
+    path = tmp_path / 'broken.forest'
+    path.write_bytes(b'not a model file')
+    
+    predictor = RiskPredictor(model_path=str(path))
+    assert predictor.demo_mode == True
+
+def test_failed_artifact_reload_keeps_engine(trained_model_path, tmp_path):
+    """测试热更新到损坏的 .forest 文件失败时，引擎、路径和当前模型都保持不变"""
+    predictor = RiskPredictor(model_path=trained_model_path, engine='sklearn')
+    active = predictor.active_model
+    broken = tmp_path / 'broken.forest'
+    broken.write_bytes(b'not a model file')
+    
+    assert predictor.reload_model(str(broken)) == False
+    assert predictor.engine == 'sklearn'
+    assert predictor.model_path == trained_model_path
+    assert predictor.active_model is active
+    assert predictor.model_info()['engine'] == 'sklearn'
+
+def test_model_hot_reload(trained_model_path, tmp_path, sample_protocol_data):
+    """测试模型文件变化后热更新、缓存键随版本失效，损坏文件不替换旧模型"""
+    import os
+    import shutil
+    from models.cache import PredictionCache
+    from models.reloader import ModelReloader
+    from models.train_model import generate_synthetic_training_data, train_risk_model, save_model
+    
+    path = str(tmp_path / 'risk_model.pkl')
+    shutil.copy(trained_model_path, path)
+    
+    predictor = RiskPredictor(model_path=path, cache=PredictionCache(max_size=16, ttl=60))
+    reloader = ModelReloader(predictor, interval=3600)
+    old_version = predictor.model_version
+    predictor.predict(sample_protocol_data)
+    
+    assert reloader.check_now() == False
+    
+    # 写入新模型（临时文件 + rename，与部署方式一致）
+    new_model, _ = train_risk_model(generate_synthetic_training_data(n_samples=300))
+    save_model(new_model, path + '.new')
+    os.replace(path + '.new', path)
+    
+    assert reloader.check_now() == True
+    assert predictor.model_version != old_version
+    assert predictor.model_info()['reloads'] == 1
+    
+    predictor.predict(sample_protocol_data)
+    assert predictor.cache.stats()['hits'] == 0  # 新版本不会命中旧条目
+    
+    # 损坏文件：保留当前模型
+    current_version = predictor.model_version
+    with open(path, 'wb') as f:
+        f.write(b'corrupted')
+    os.utime(path, ns=(0, 0))
+    
+    assert reloader.check_now() == False
+    assert predictor.model_version == current_version
+    assert predictor.model_info()['reload_failures'] == 1
+    assert 'risk_score' in predictor.predict(sample_protocol_data)
+
+def test_reload_leaves_demo_mode(trained_model_path, tmp_path):
+    """测试启动时模型缺失，文件出现后热更新切换到真实模型"""
+    import shutil
+    from models.reloader import ModelReloader
+    
+    path = str(tmp_path / 'risk_model.pkl')
+    predictor = RiskPredictor(model_path=path)
+    reloader = ModelReloader(predictor)
+    assert predictor.demo_mode == True
+    
+    shutil.copy(trained_model_path, path)
+    assert reloader.check_now() == True
+    assert predictor.demo_mode == False
+    assert predictor.model_version is not None
+
+def test_synthetic_data_class_mix_and_ranges():
+    """测试向量化生成器保持原有类别比例和特征区间"""
+    from models.train_model import generate_synthetic_training_data
+    
+    df = generate_synthetic_training_data(n_samples=50_000, block_size=7_000)
+    high = df[df['risk_label'] == 1]
+    low = df[df['risk_label'] == 0]
+    
+    assert abs(len(high) / len(df) - 0.3) < 0.01
+    assert high['liquidity_change'].between(-0.5, -0.1).all()
+    assert low['holder_concentration'].between(0.2, 0.6).all()
+    assert high['whale_transfers'].between(5, 14).all()
+    assert low['whale_transfers'].between(0, 4).all()
+    assert df['whale_transfers'].dtype == np.int64
+
+def test_chunked_generator_matches_monolithic(tmp_path):
+    """测试分块生成与一次性生成结果一致，且分区文件覆盖全部行"""
+    import pandas as pd
+    from models.train_model import (
+        generate_synthetic_training_data, iter_synthetic_training_data, write_synthetic_training_data
+    )
+    
+    full = generate_synthetic_training_data(n_samples=2_500, seed=7, block_size=1_000)
+    chunks = list(iter_synthetic_training_data(2_500, chunk_size=1_000, seed=7))
+    
+    assert [len(c) for c in chunks] == [1_000, 1_000, 500]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), full)
+    
+    paths = write_synthetic_training_data(str(tmp_path / 'parts'), 2_500, chunk_size=1_000, seed=7)
+    assert len(paths) == 3
+    assert sum(len(pd.read_csv(p)) for p in paths) == 2_500
+
+def test_sharded_dataset_roundtrip_and_streaming_training(tmp_path):
+    """测试列式分片读写与流式训练"""
+    import pandas as pd
+    from models.data_store import ShardedDataset
+    from models.train_model import (
+        iter_synthetic_training_data, generate_synthetic_training_data,
+        save_training_data_shards, train_risk_model_streaming
+    )
+    
+    path = str(tmp_path / 'dataset')
+    manifest = save_training_data_shards(iter_synthetic_training_data(3_000, chunk_size=1_000, seed=3), path)
+    dataset = ShardedDataset(path)
+    
+    assert manifest['total_rows'] == len(dataset) == 3_000
+    assert dataset.n_shards == 3
+    assert sum(dataset.label_counts().values()) == 3_000
+    
+    shard = dataset.read_shard(0, ['holder_concentration'])
+    assert isinstance(shard['holder_concentration'], np.memmap)
+    
+    expected = generate_synthetic_training_data(3_000, seed=3, block_size=1_000)
+    pd.testing.assert_frame_equal(dataset.to_dataframe(), expected)
+    
+    model, accuracy = train_risk_model_streaming(dataset, n_estimators=10, n_jobs=1)
+    assert model.n_estimators == 10
+    assert accuracy > 0.9
+
+def test_streaming_training_needs_enough_shards(tmp_path):
+    """测试分片数不足以划分测试集时报错"""
+    from models.data_store import ShardedDataset
+    from models.train_model import generate_synthetic_training_data, save_training_data_shards, train_risk_model_streaming
+    
+    path = str(tmp_path / 'dataset')
+    save_training_data_shards(generate_synthetic_training_data(500), path)
+    
+    with pytest.raises(ValueError):
+        train_risk_model_streaming(ShardedDataset(path))
+
+def test_streaming_training_merges_shards_missing_a_class(tmp_path):
+    """测试缺少某一类别的分片与相邻分片合并训练，所有树的 classes_ 与森林一致"""
+    from models.data_store import ShardedDataset
+    from models.train_model import LABEL_COLUMN, generate_synthetic_training_data, save_training_data_shards, train_risk_model_streaming
+    
+    # 按标签排序后分片：前面的分片只有低风险样本
+    df = generate_synthetic_training_data(2_000, seed=5).sort_values(LABEL_COLUMN, kind='stable', ignore_index=True)
+    path = str(tmp_path / 'dataset')
+    save_training_data_shards([df.iloc[i:i + 400] for i in range(0, 2_000, 400)], path)
+    dataset = ShardedDataset(path)
+    assert dataset.manifest['shards'][0]['label_counts'] == {'0': 400}
+    
+    model, accuracy = train_risk_model_streaming(dataset, n_estimators=8, n_jobs=1)
+    assert list(model.classes_) == [0, 1]
+    assert all(list(tree.classes_) == [0, 1] for tree in model.estimators_)
+    assert model.predict_proba(df[:5].drop(columns=[LABEL_COLUMN]).to_numpy()).shape == (5, 2)
+
+def test_train_main_passes_n_jobs_only_when_set(monkeypatch, tmp_path, trained_model_path):
+    """测试未指定 --n-jobs 时不覆盖训练函数自己的默认值"""
+    import pickle
+    from models import train_model
+    
+    with open(trained_model_path, 'rb') as f:
+        model = pickle.load(f)
+    calls = []
+    monkeypatch.setattr(train_model, 'train_risk_model_streaming', lambda dataset, **kwargs: calls.append(kwargs) or (model, 1.0))
+    monkeypatch.chdir(tmp_path)
+    
+    train_model.main(['--store', 'npy', '--samples', '200'])
+    train_model.main(['--store', 'npy', '--samples', '200', '--n-jobs', '2'])
+    assert calls == [{}, {'n_jobs': 2}]
+
+def test_hparam_grid_and_pareto_front():
+    """测试参数网格展开与帕累托前沿"""
+    from models.hparam_search import expand_grid, pareto_front
+    
+    candidates = expand_grid({'n_estimators': [10, 20], 'max_depth': [3, None]})
+    assert len(candidates) == 4
+    assert {'max_depth': None, 'n_estimators': 20} in candidates
+    
+    results = [
+        {'name': 'fast', 'accuracy_mean': 0.90, 'latency_p50_us': 10.0},
+        {'name': 'dominated', 'accuracy_mean': 0.88, 'latency_p50_us': 15.0},
+        {'name': 'accurate', 'accuracy_mean': 0.95, 'latency_p50_us': 30.0},
+        {'name': 'slow_same', 'accuracy_mean': 0.95, 'latency_p50_us': 40.0},
+    ]
+    assert [r['name'] for r in pareto_front(results)] == ['fast', 'accurate']
+
+def test_hparam_search_runs_in_process_pool():
+    """测试进程池超参数搜索（共享内存 + 预计算折叠）"""
+    from models.hparam_search import run_search
+    from models.train_model import FEATURE_COLUMNS, LABEL_COLUMN, generate_synthetic_training_data
+    
+    df = generate_synthetic_training_data(600, seed=5)
+    grid = {'n_estimators': [5, 10], 'max_depth': [3, None], 'min_samples_split': [2]}
+    results = run_search(
+        df[FEATURE_COLUMNS].to_numpy(), df[LABEL_COLUMN].to_numpy(), grid,
+        n_splits=3, max_workers=2, latency_iters=50
+    )
+    
+    assert len(results) == 4
+    assert results[0]['accuracy_mean'] >= results[-1]['accuracy_mean']
+    assert any(r['pareto'] for r in results)
+    for r in results:
+        assert 0.0 <= r['accuracy_mean'] <= 1.0
+        assert r['latency_p50_us'] > 0
+        assert r['model_bytes'] > 0 and r['n_nodes'] > 0
@@ -0,0 +1,889 @@
+"""
+服务层测试
+Tests for Solana RPC client and SolanaService (against the local mock RPC server)
+"""
+import asyncio
+import time
+
+import pytest
+
+from services.mock_rpc import MockRpcServer
+from services.rpc_client import AsyncRpcClient, RpcError
+from services.solana_service import SolanaService
+
+
+def test_rpc_client_call_and_error(mock_rpc_server):
+    """测试 JSON-RPC 调用与错误响应"""
+    async def scenario():
+        client = AsyncRpcClient(mock_rpc_server.url)
+        try:
+            assert await client.call('getHealth') == 'ok'
+            with pytest.raises(RpcError) as exc_info:
+                await client.call('noSuchMethod')
+            assert exc_info.value.code == -32601
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_rpc_client_reuses_pooled_connections(mock_rpc_server):
+    """测试 keep-alive 连接复用"""
+    async def scenario():
+        client = AsyncRpcClient(mock_rpc_server.url, max_connections=4)
+        try:
+            for _ in range(20):
+                await client.call('getSlot')
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+    assert mock_rpc_server.http_requests == 20
+    assert len(mock_rpc_server.connections) == 1
+
+
+def test_rpc_client_timeout_and_bounded_concurrency():
+    """测试单次调用超时与并发上限"""
+    async def scenario(url):
+        client = AsyncRpcClient(url, timeout=0.02, max_concurrency=2)
+        try:
+            with pytest.raises(RpcError):
+                await client.call('getSlot')
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client.call('getSlot', timeout=5) for _ in range(6)))
+            return time.perf_counter() - start
+        finally:
+            await client.close()
+
+    with MockRpcServer(latency_ms=50) as server:
+        elapsed = asyncio.run(scenario(server.url))
+
+    # 6 个请求、并发上限 2、每个 50ms → 至少 3 轮
+    assert elapsed >= 0.14
+
+
+def test_solana_service_fetches_metrics_over_rpc(mock_rpc_server):
+    """测试非 demo 模式通过 RPC 计算协议指标"""
+    service = SolanaService(
+        demo_mode=False, rpc_url=mock_rpc_server.url, metrics_soft_ttl=0, metrics_hard_ttl=0
+    )
+    try:
+        metrics = service.get_protocol_metrics('Jupiter')
+
+        assert metrics['protocol'] == 'Jupiter'
+        assert metrics['volume_24h'] >= 0
+        assert metrics['liquidity_change'] == 0.0  # 首次观测没有基线
+        assert isinstance(metrics['whale_transfers'], int)
+        assert 0 < metrics['holder_concentration'] <= 1
+        assert mock_rpc_server.method_counts['getTokenSupply'] == 1
+
+        # 链上状态变化后，流动性变化相对 24h 窗口内的首次观测计算
+        mock_rpc_server.epoch += 1
+        assert service.get_protocol_metrics('jupiter')['liquidity_change'] != 0.0
+
+        with pytest.raises(KeyError):
+            service.get_protocol_metrics('UnknownProtocol')
+    finally:
+        service.close()
+
+
+def test_solana_service_metrics_timeout():
+    """测试指标拉取超过截止时间时抛出 TimeoutError，服务仍可继续使用"""
+    with MockRpcServer(latency_ms=200) as server:
+        service = SolanaService(demo_mode=False, rpc_url=server.url, metrics_soft_ttl=0, metrics_hard_ttl=0)
+        try:
+            started = time.perf_counter()
+            with pytest.raises(TimeoutError):
+                service.get_protocol_metrics('Jupiter', timeout=0.05)
+            assert time.perf_counter() - started < 0.2
+
+            assert service.get_protocol_metrics('Jupiter', timeout=5)['protocol'] == 'Jupiter'
+        finally:
+            service.close()
+
+
+def test_solana_service_async_metrics_from_other_loop():
+    """测试 aget_protocol_metrics：在调用方事件循环上等待服务循环的结果，超时后不影响后续请求"""
+    with MockRpcServer(latency_ms=100) as server:
+        service = SolanaService(demo_mode=False, rpc_url=server.url, metrics_soft_ttl=0, metrics_hard_ttl=0)
+
+        async def scenario():
+            with pytest.raises(TimeoutError):
+                await service.aget_protocol_metrics('Jupiter', timeout=0.02)
+            # 并发等待不阻塞调用方事件循环
+            return await asyncio.gather(*(
+                service.aget_protocol_metrics(name, timeout=5) for name in ('Jupiter', 'Orca', 'Raydium')
+            ))
+
+        try:
+            results = asyncio.run(scenario())
+            assert [m['protocol'] for m in results] == ['Jupiter', 'Orca', 'Raydium']
+        finally:
+            service.close()
+
+
+def test_solana_service_demo_mode_skips_rpc(mock_rpc_server):
+    """测试 demo 模式不发起 RPC 请求"""
+    service = SolanaService(demo_mode=True, rpc_url=mock_rpc_server.url)
+
+    assert service.get_protocol_metrics('Jupiter')['protocol'] == 'Jupiter'
+    assert mock_rpc_server.http_requests == 0
+
+
+def test_rpc_client_batch_keeps_per_call_errors(mock_rpc_server):
+    """测试 JSON-RPC 批量请求：按顺序返回结果，单个调用失败不影响其它调用"""
+    async def scenario():
+        client = AsyncRpcClient(mock_rpc_server.url)
+        try:
+            return await client.batch([('getHealth', []), ('noSuchMethod', []), ('getSlot', [])])
+        finally:
+            await client.close()
+
+    health, error, slot = asyncio.run(scenario())
+    assert health == 'ok'
+    assert isinstance(error, RpcError) and error.code == -32601
+    assert isinstance(slot, int)
+    assert mock_rpc_server.http_requests == 1
+
+
+def test_get_many_protocol_metrics_batches_and_dedupes(mock_rpc_server):
+    """测试批量拉取：账户去重、分块，结果与逐个拉取一致"""
+    from services.protocol_registry import ProtocolAccounts
+
+    registry = {
+        'alpha': ProtocolAccounts('Alpha', 'ProgA', 'MintShared', pool='PoolA'),
+        'beta': ProtocolAccounts('Beta', 'ProgB', 'MintShared'),
+        'gamma': ProtocolAccounts('Gamma', 'ProgA', 'MintGamma'),
+    }
+    mock_rpc_server.add_token_account('PoolA', 'MintShared', 123_000_000)
+    names = ['Alpha', 'Beta', 'Gamma']
+
+    single = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url, registry=registry)
+    batched = SolanaService(
+        demo_mode=False, rpc_url=mock_rpc_server.url, registry=registry,
+        batch_size=4, accounts_per_request=2
+    )
+    try:
+        expected = {name: single.run(single.fetch_protocol_metrics(name)) for name in names}
+
+        mock_rpc_server.reset_counters()
+        metrics = batched.get_many_protocol_metrics(names + ['Alpha'])
+
+        assert metrics == expected
+        counts = mock_rpc_server.method_counts
+        assert counts['getTokenLargestAccounts'] == 2  # 两个不同的 mint
+        assert counts['getMultipleAccounts'] == 2  # 3 个地址，每次最多 2 个
+        # 第一轮 2+2+2=6 个调用分 2 批，第二轮 5+5 个鲸鱼账户分 3 批
+        assert mock_rpc_server.http_requests == 5
+
+        with pytest.raises(KeyError):
+            batched.get_many_protocol_metrics(['Alpha', 'Unknown'])
+    finally:
+        single.close()
+        batched.close()
+
+
+def test_metrics_cache_stale_while_revalidate():
+    """测试 SWR 缓存：单飞合并、软 TTL 后台刷新、硬 TTL 阻塞、刷新失败保留旧值"""
+    from services.metrics_cache import MetricsCache
+
+    now = [0.0]
+    calls = []
+    fail = [False]
+
+    async def fetch_many(keys):
+        calls.append(list(keys))
+        await asyncio.sleep(0.01)
+        if fail[0]:
+            raise RpcError('boom')
+        return {key: f'{key}-{len(calls)}' for key in keys}
+
+    async def scenario():
+        cache = MetricsCache(soft_ttl=10, hard_ttl=60, clock=lambda: now[0])
+
+        values = await asyncio.gather(*(cache.get('a', fetch_many) for _ in range(10)))
+        assert values == ['a-1'] * 10
+        assert (cache.misses, cache.coalesced, len(calls)) == (1, 9, 1)
+
+        assert await cache.get('a', fetch_many) == 'a-1'
+        assert cache.hits == 1
+
+        # 软 TTL 之后：立即返回旧值，后台刷新一次
+        now[0] = 20
+        assert await cache.get('a', fetch_many) == 'a-1'
+        assert await cache.get('a', fetch_many) == 'a-1'
+        assert cache.stale_served == 2
+        await asyncio.sleep(0.05)
+        assert cache.refreshes == 1 and len(calls) == 2
+        assert await cache.get('a', fetch_many) == 'a-2'
+
+        # 刷新失败时继续提供旧值
+        now[0] = 40
+        fail[0] = True
+        assert await cache.get('a', fetch_many) == 'a-2'
+        await asyncio.sleep(0.05)
+        assert cache.refresh_failures == 1
+
+        # 硬 TTL 之后调用方等待新值；缺失的键合并为一次 fetch_many
+        now[0] = 200
+        fail[0] = False
+        values = await cache.get_many(['a', 'b', 'c'], fetch_many)
+        assert values == {'a': 'a-4', 'b': 'b-4', 'c': 'c-4'}
+        assert calls[-1] == ['a', 'b', 'c']
+        assert cache.stats()['size'] == 3
+
+    asyncio.run(scenario())
+
+
+def test_solana_service_coalesces_concurrent_requests():
+    """测试 50 个并发请求冷数据时只发起一次 RPC 拉取"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with MockRpcServer(latency_ms=50) as server:
+        service = SolanaService(demo_mode=False, rpc_url=server.url)
+        try:
+            with ThreadPoolExecutor(max_workers=50) as pool:
+                results = list(pool.map(service.get_protocol_metrics, ['Jupiter'] * 50))
+        finally:
+            service.close()
+
+    assert all(r == results[0] for r in results)
+    assert server.method_counts['getTokenLargestAccounts'] == 1
+    stats = service.metrics_cache.stats()
+    assert stats['misses'] + stats['hits'] + stats['coalesced'] == 50
+    assert stats['misses'] == 1
+
+
+def test_prefetch_scheduler_rescores_only_changed(mock_rpc_server, trained_model_path):
+    """测试预取调度：写入分数存储，只对指标变化的协议重新打分"""
+    from models.predict import RiskPredictor
+    from scheduler import PrefetchScheduler, ScoreStore
+    from services.protocol_registry import PROTOCOL_REGISTRY
+
+    names = [p.name for p in PROTOCOL_REGISTRY.values()]
+    service = SolanaService(
+        demo_mode=False, rpc_url=mock_rpc_server.url, metrics_soft_ttl=0, metrics_hard_ttl=0
+    )
+    store = ScoreStore(max_age=60)
+    scheduler = PrefetchScheduler(
+        service, RiskPredictor(model_path=trained_model_path), store, names,
+        build_response=lambda protocol, metrics, prediction: {'protocol': protocol, **prediction},
+        max_workers=2, chunk_size=4
+    )
+    try:
+        assert scheduler.refresh_once() == len(names)
+        assert store.get('jupiter')['protocol'] == 'Jupiter'
+        assert 0 <= store.get('Orca')['risk_score'] <= 100
+
+        # 链上状态未变：不重新打分
+        assert scheduler.refresh_once() == 0
+        assert scheduler.unchanged == len(names)
+
+        mock_rpc_server.epoch += 1
+        assert scheduler.refresh_once() > 0
+        assert scheduler.stats()['runs'] == 3
+    finally:
+        service.close()
+
+
+def test_score_store_expires_entries(monkeypatch):
+    """测试分数存储过期后视为未命中"""
+    import scheduler
+    from scheduler import ScoreStore
+
+    now = [100.0]
+    monkeypatch.setattr(scheduler.time, 'monotonic', lambda: now[0])
+
+    store = ScoreStore(max_age=10)
+    store.put('Jupiter', {'risk_score': 1}, fingerprint=('v1',))
+    assert store.get('JUPITER') == {'risk_score': 1}
+
+    now[0] = 108
+    store.touch('Jupiter')
+    now[0] = 115
+    assert store.get('Jupiter') is not None
+
+    now[0] = 130
+    assert store.get('Jupiter') is None
+    assert store.stats()['misses'] == 1
+
+
+def _use_after_fork(store, cache, queue):
+    store.reset_after_fork()
+    cache.reset_after_fork()
+    store.put('Orca', {'risk_score': 1}, fingerprint=())
+    cache.set('k', 1)
+    queue.put((store.get('Orca'), cache.get('k')))
+
+
+def test_reset_after_fork_replaces_held_locks():
+    """测试 fork 时锁被其它线程持有，子进程换新锁后仍可使用（不会死锁）"""
+    import multiprocessing
+    from models.cache import PredictionCache
+    from scheduler import ScoreStore
+
+    store, cache = ScoreStore(), PredictionCache()
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    with store._lock, cache._lock:
+        process = ctx.Process(target=_use_after_fork, args=(store, cache, queue))
+        process.start()
+    assert queue.get(timeout=10) == ({'risk_score': 1}, 1)
+    process.join(timeout=10)
+
+
+def test_shared_rate_limiter_token_bucket(tmp_path):
+    """测试共享令牌桶：两个实例（相当于两个 worker）消耗同一个桶，拒绝时给出等待时间"""
+    from utils.rate_limit import SharedRateLimiter
+
+    now = [1000.0]
+    path = str(tmp_path / 'ratelimit')
+    worker_a = SharedRateLimiter(path, capacity=4, per_seconds=4, slots=8, clock=lambda: now[0])
+    worker_b = SharedRateLimiter(path, capacity=4, per_seconds=4, slots=8, clock=lambda: now[0])
+
+    assert [worker_a.acquire('10.0.0.1') for _ in range(2)] == [0.0, 0.0]
+    assert [worker_b.acquire('10.0.0.1') for _ in range(2)] == [0.0, 0.0]
+    assert worker_b.acquire('10.0.0.1') == pytest.approx(1.0)
+    assert worker_a.acquire('10.0.0.1') == pytest.approx(1.0)
+    # 其它客户端不受影响
+    assert worker_a.acquire('10.0.0.2') == 0.0
+
+    # 本进程缓存的拒绝在到期前不访问共享内存
+    now[0] += 0.5
+    assert worker_a.acquire('10.0.0.1') == pytest.approx(0.5)
+    assert worker_a.stats()['denied_local'] == 1
+
+    now[0] += 0.5
+    assert worker_b.acquire('10.0.0.1') == 0.0
+
+    class RacingDict(dict):
+        """模拟另一个线程在本线程读到过期记录之后、删除之前先删掉了它"""
+        def get(self, key, default=None):
+            value = super().get(key, default)
+            self.pop(key, None)
+            return value
+
+    worker_a._blocked = RacingDict(worker_a._blocked)
+    assert worker_a.acquire('10.0.0.1') == pytest.approx(1.0)
+
+    # 组内槽位用完时替换令牌最多（最空闲）的客户端
+    for i in range(20):
+        worker_a.acquire(f'192.168.0.{i}')
+    assert worker_a.stats()['slots'] == 8
+
+    # 配置变化时重建文件
+    resized = SharedRateLimiter(path, capacity=10, per_seconds=60, slots=8, clock=lambda: now[0])
+    assert resized.acquire('10.0.0.1') == 0.0
+    for limiter in (worker_a, worker_b, resized):
+        limiter.close()
+
+
+def _rate_limit_worker(path, n, queue):
+    from utils.rate_limit import SharedRateLimiter
+
+    limiter = SharedRateLimiter(path, capacity=50, per_seconds=3600, slots=64)
+    queue.put(sum(limiter.acquire('203.0.113.9') == 0.0 for _ in range(n)))
+
+
+def test_shared_rate_limiter_across_processes(tmp_path):
+    """测试多个进程并发消耗同一个桶时放行总数恰好等于容量"""
+    import multiprocessing
+
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    path = str(tmp_path / 'ratelimit')
+    processes = [ctx.Process(target=_rate_limit_worker, args=(path, 200, queue)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    allowed = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join(timeout=30)
+
+    assert sum(allowed) == 50
+
+
+def test_rate_limit_default_path_per_master(monkeypatch):
+    """测试默认限流文件按 master PID（或命名空间）区分部署，gunicorn master 退出时删除"""
+    import logging
+    import os
+    import types
+
+    import gunicorn_config
+    from config import Config
+    from utils.rate_limit import SharedRateLimiter, default_rate_limit_path
+
+    assert default_rate_limit_path() == default_rate_limit_path(str(os.getppid()))
+    assert default_rate_limit_path('a') != default_rate_limit_path('b')
+
+    namespace = f'test-{os.getpid()}'
+    monkeypatch.setattr(Config, 'RATE_LIMIT_FILE', '')
+    monkeypatch.setattr(Config, 'RATE_LIMIT_NAMESPACE', namespace)
+    path = default_rate_limit_path(namespace)
+    SharedRateLimiter(path, capacity=1, slots=8).close()
+    assert os.path.exists(path)
+
+    server = types.SimpleNamespace(log=logging.getLogger('test'))
+    gunicorn_config.on_exit(server)
+    assert not os.path.exists(path)
+    gunicorn_config.on_exit(server)  # 文件已不存在时不报错
+
+
+def test_rolling_window_and_feature_aggregator():
+    """测试环形缓冲窗口过期与增量特征"""
+    from services.aggregates import FeatureAggregator, RollingWindow
+
+    window = RollingWindow(window_seconds=300, bucket_seconds=60)
+    window.add(0)
+    window.add(30, 2)
+    window.add(120)
+    assert window.sum(120) == 4
+    assert window.sum(330) == 1   # 第 0 个桶移出窗口
+    assert window.sum(10_000) == 0
+
+    aggregator = FeatureAggregator('Jupiter', avg_trade_usd=100, window_seconds=300, bucket_seconds=60)
+    aggregator.seed([('a', 600), ('b', 300), ('c', 100)], supply=2000,
+                    whales=['a', 'b'], reserve_account='a', reserve=600, now=0)
+    aggregator.on_transaction(10)
+    aggregator.on_transaction(20, failed=True)
+    aggregator.on_token_account(30, 'a', 900)
+    aggregator.on_token_account(40, 'c', 50)
+    aggregator.on_token_account(50, 'unknown', 1)
+
+    metrics = aggregator.metrics(60)
+    assert metrics['volume_24h'] == 100
+    assert metrics['whale_transfers'] == 1
+    assert metrics['liquidity_change'] == 0.5
+    assert metrics['holder_concentration'] == round(1250 / 2000, 3)
+
+    aggregator.on_supply(70, 2500)
+    assert aggregator.metrics(70)['holder_concentration'] == 0.5
+    # 窗口外：交易与鲸鱼计数归零，储备基线前移
+    aggregator.on_token_account(400, 'a', 450)
+    metrics = aggregator.metrics(400)
+    assert metrics['volume_24h'] == 0
+    assert metrics['whale_transfers'] == 1
+    assert metrics['liquidity_change'] == -0.5
+
+
+def test_stream_ingestor_applies_replayed_events(mock_rpc_server):
+    """测试 websocket 流式摄取：回放事件、实时指标与断线重连"""
+    from services.ingestion import StreamIngestor
+    from services.protocol_registry import PROTOCOL_REGISTRY
+
+    names = [p.name for p in PROTOCOL_REGISTRY.values()]
+    now = [time.time()]
+    service = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url)
+    ingestor = StreamIngestor(service, mock_rpc_server.ws_url, names, clock=lambda: now[0], max_backoff=0.1)
+
+    def wait_for(condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    try:
+        ingestor.start()
+        assert ingestor.wait_ready()
+        assert ingestor.stats()['subscriptions'] > 2 * len(names)
+
+        # 不回填时，连接满 24 小时之前窗口不完整，不提供实时指标
+        assert ingestor.metrics('Jupiter') is None
+        now[0] += 86400
+
+        events = mock_rpc_server.record_events(PROTOCOL_REGISTRY, 2000, seed=1)
+        sent = mock_rpc_server.replay(events)
+        wait_for(lambda: ingestor.events == sent)
+        assert ingestor.decode_errors == 0
+
+        live = ingestor.metrics('Jupiter')
+        assert live['protocol'] == 'Jupiter'
+        assert live['volume_24h'] > 0
+        assert 0 < live['holder_concentration'] <= 1
+
+        # 挂上摄取器后，服务直接返回实时指标，不再走 RPC
+        service.ingestor = ingestor
+        mock_rpc_server.reset_counters()
+        assert service.get_protocol_metrics('Jupiter') == ingestor.metrics('Jupiter')
+        assert mock_rpc_server.rpc_calls == 0
+
+        mock_rpc_server.drop_ws_clients()
+        wait_for(lambda: ingestor.reconnects >= 1 and ingestor.connected)
+        assert ingestor.metrics('Jupiter') is None  # 断线期间的事件丢失，重新计满窗口
+
+        # 快照返回意外数据（KeyError 等）时同样退避重连，而不是让摄取任务就此退出
+        bootstrap, failures = ingestor._bootstrap, []
+
+        async def failing_bootstrap():
+            if not failures:
+                failures.append(1)
+                raise KeyError('value')
+            await bootstrap()
+
+        ingestor._bootstrap = failing_bootstrap
+        reconnects = ingestor.reconnects
+        mock_rpc_server.drop_ws_clients()
+        wait_for(lambda: ingestor.reconnects >= reconnects + 2 and ingestor.connected)
+        assert failures and not ingestor._task.done()
+    finally:
+        ingestor.stop()
+        service.close()
+
+
+def test_signature_backfill_paginates_retries_and_resumes(mock_rpc_server, tmp_path):
+    """测试历史回填：分页、重试、断点续传且不重复"""
+    from services.backfill import BackfillCheckpoint, SignatureBackfill
+    from services.protocol_registry import PROTOCOL_REGISTRY
+    from services.rpc_client import AsyncRpcClient
+
+    entry = PROTOCOL_REGISTRY['jupiter']
+    mock_rpc_server.add_program(entry.program_id, entry.mint)
+    mock_rpc_server.set_history(entry.program_id, 2500, span_seconds=2 * 86400)
+    since = mock_rpc_server._started - 86400
+    expected = {
+        s['signature'] for s in mock_rpc_server.signatures(entry.program_id, limit=2500) if s['blockTime'] >= since
+    }
+    checkpoint_path = str(tmp_path / 'backfill.json')
+
+    def make(client):
+        return SignatureBackfill(client, entry.program_id, mint=entry.mint, since=since,
+                                 checkpoint_path=checkpoint_path, page_size=500, max_parallel=8, backoff=0.001)
+
+    async def scenario():
+        client = AsyncRpcClient(mock_rpc_server.url)
+        try:
+            mock_rpc_server.inject_errors('getTransaction', 5)
+            first = make(client)
+            seen = []
+            stream = first.transactions()
+            async for tx in stream:
+                seen.append(tx)
+                if len(seen) == 700:
+                    break
+            await stream.aclose()
+            assert first.retries >= 5
+            assert BackfillCheckpoint.load(checkpoint_path, entry.program_id).processed == 700
+
+            # 从检查点续传
+            second = make(client)
+            seen += [tx async for tx in second.transactions()]
+            assert second.checkpoint.complete
+
+            # 已完成：下一轮只追到上次最新的签名
+            third = make(client)
+            assert [tx async for tx in third.transactions()] == []
+            return seen
+        finally:
+            await client.close()
+
+    seen = asyncio.run(scenario())
+    signatures = [tx.signature for tx in seen]
+    assert len(signatures) == len(set(signatures))
+    assert set(signatures) == expected
+    assert any(tx.failed for tx in seen)
+    transfers = [t for tx in seen for t in tx.transfers]
+    assert transfers and all(t.mint == entry.mint for t in transfers)
+    assert sum(t.delta for t in transfers) == 0
+
+
+def test_stream_ingestor_backfills_history(mock_rpc_server):
+    """测试冷启动回填：窗口特征包含最近 24 小时的历史交易"""
+    from services.ingestion import StreamIngestor
+    from services.protocol_registry import PROTOCOL_REGISTRY
+
+    entry = PROTOCOL_REGISTRY['orca']
+    mock_rpc_server.add_program(entry.program_id, entry.mint)
+    service = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url)
+    ingestor = StreamIngestor(service, mock_rpc_server.ws_url, ['Orca'], backfill=True)
+    try:
+        ingestor.start()
+        assert ingestor.wait_ready()
+        assert ingestor.wait_backfilled()
+
+        since = time.time() - 86400
+        recent = [
+            s for s in mock_rpc_server.signatures(entry.program_id)
+            if s['blockTime'] >= since and s['err'] is None
+        ]
+        metrics = ingestor.metrics('Orca')
+        assert metrics['volume_24h'] == pytest.approx(len(recent) * service.avg_trade_usd, rel=0.01)
+        assert metrics['whale_transfers'] > 0
+        assert ingestor.stats()['backfill']['orca']['complete']
+    finally:
+        ingestor.stop()
+        service.close()
+
+
+def test_stream_ingestor_catches_up_after_reconnect(mock_rpc_server):
+    """测试断线期间的交易：重连后窗口标记为不完整，补扫上次回填边界之后的历史再恢复实时指标"""
+    from services.ingestion import StreamIngestor
+    from services.protocol_registry import PROTOCOL_REGISTRY
+
+    entry = PROTOCOL_REGISTRY['orca']
+    mock_rpc_server.add_program(entry.program_id, entry.mint)
+    service = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url)
+    ingestor = StreamIngestor(service, mock_rpc_server.ws_url, ['Orca'], max_backoff=0.1, backfill=True)
+
+    def wait_for(condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    try:
+        ingestor.start()
+        assert ingestor.wait_ready()
+        assert ingestor.wait_backfilled()
+        job = ingestor.backfills['orca']
+        job.backoff = 0.01
+        first_head, processed = job.checkpoint.head, job.checkpoint.processed
+        counted = ingestor.aggregators['orca'].transactions.sum(time.time())
+        assert ingestor.metrics('Orca') is not None
+
+        # 断线期间确认的交易不会推送过来；补扫第一次失败时窗口保持不完整
+        gap = mock_rpc_server.add_transactions(entry.program_id, 5)
+        succeeded = [s for s in mock_rpc_server.signatures(entry.program_id, limit=5) if s['err'] is None]
+        mock_rpc_server.inject_errors('getSignaturesForAddress', job.max_retries + 1)
+        mock_rpc_server.drop_ws_clients()
+        wait_for(lambda: ingestor.reconnects >= 1 and ingestor.connected and ingestor._backfill_tasks['orca'].done())
+        assert not ingestor.covers_window('Orca')
+        assert ingestor.metrics('Orca') is None
+
+        mock_rpc_server.drop_ws_clients()
+        wait_for(lambda: ingestor.reconnects >= 2 and ingestor.connected)
+        assert ingestor.wait_backfilled()
+        assert job.checkpoint.until == first_head
+        assert job.checkpoint.head == gap[0]
+        assert job.checkpoint.processed == processed + len(gap)  # 只补扫断线期间的交易
+        # 窗口边缘的旧交易可能在此期间过期，允许 1 笔误差
+        assert abs(ingestor.aggregators['orca'].transactions.sum(time.time()) - (counted + len(succeeded))) <= 1
+        assert ingestor.metrics('Orca') is not None
+    finally:
+        ingestor.stop()
+        service.close()
+
+
+def test_stream_ingestor_backfill_overlap_counted_once(mock_rpc_server):
+    """测试回填与实时推送重叠的交易只计一次：先推送后回填、先回填后推送都不重复"""
+    import asyncio
+    import json
+
+    from services.ingestion import StreamIngestor
+    from services.protocol_registry import PROTOCOL_REGISTRY
+
+    entry = PROTOCOL_REGISTRY['orca']
+    mock_rpc_server.add_program(entry.program_id, entry.mint)
+    service = SolanaService(demo_mode=False, rpc_url=mock_rpc_server.url)
+    ingestor = StreamIngestor(service, mock_rpc_server.ws_url, ['Orca'], backfill=True)
+
+    def run(coro):
+        return asyncio.run_coroutine_threadsafe(coro, service.loop).result(30)
+
+    def live(signature):
+        ingestor.handle_message(json.dumps({
+            'jsonrpc': '2.0', 'method': 'logsNotification',
+            'params': {'subscription': 1, 'result': {'context': {'slot': 1}, 'value': {
+                'signature': signature, 'err': None, 'logs': []}}},
+        }))
+
+    try:
+        since = time.time() - 86400
+        recent = [
+            s for s in mock_rpc_server.signatures(entry.program_id)
+            if s['blockTime'] >= since and s['err'] is None
+        ]
+        # 手动走一遍连接流程：快照、订阅确认（订阅时间取第二新的成功交易，使其落在重叠区间内）
+        run(ingestor._bootstrap())
+        aggregator = ingestor.aggregators['orca']
+        ingestor._begin_connection()
+        ingestor._subscriptions = {1: (aggregator, 'logs', entry.program_id)}
+        ingestor._subscribed_at = recent[1]['blockTime']
+
+        live(recent[0]['signature'])  # 回填固定上界之前已经推送过来
+        run(ingestor._backfill_protocol('Orca'))
+        job = ingestor.backfills['orca']
+        assert job.checkpoint.complete
+        assert job.checkpoint.head == mock_rpc_server.signatures(entry.program_id, limit=1)[0]['signature']
+        assert job.skipped == 1
+
+        counted = aggregator.transactions.sum(time.time())
+        assert counted == pytest.approx(len(recent), rel=0.01)
+        live(recent[1]['signature'])  # 回填已经计入之后才推送到
+        assert ingestor.duplicates == 1
+        assert aggregator.transactions.sum(time.time()) == counted
+
+        live('new-signature')  # 上界之后的新交易照常计入
+        assert aggregator.transactions.sum(time.time()) == counted + 1
+    finally:
+        service.close()
+
+
+def test_holder_concentration_streaming_and_incremental():
+    """测试持有人集中度：精确计算、分块流式与增量更新一致"""
+    import numpy as np
+
+    from services.concentration import ConcentrationAccumulator, holder_concentration, stream_concentration
+
+    assert holder_concentration([0, 0])['holders'] == 0
+    equal = holder_concentration([5] * 8, top_n=2)
+    assert equal['top_n_share'] == pytest.approx(0.25)
+    assert equal['hhi'] == pytest.approx(1 / 8)
+    assert equal['gini'] == pytest.approx(0.0, abs=1e-12)
+    assert holder_concentration([0, 0, 0, 100])['gini'] == pytest.approx(0.0)  # 零余额不算持有人
+    assert holder_concentration([1, 1, 1, 97], top_n=1, supply=200)['top_n_share'] == pytest.approx(0.485)
+
+    rng = np.random.default_rng(7)
+    balances = (rng.pareto(1.1, 50_000) * 1e6).astype(np.uint64)
+    balances[rng.integers(0, len(balances), 500)] = 0
+    exact = holder_concentration(balances)
+
+    streamed = stream_concentration(np.array_split(balances, 7))
+    assert streamed['holders'] == exact['holders']
+    assert streamed['total'] == exact['total']
+    assert streamed['top_n_share'] == pytest.approx(exact['top_n_share'], rel=1e-12)
+    assert streamed['hhi'] == pytest.approx(exact['hhi'], rel=1e-9)
+    assert streamed['gini'] == pytest.approx(exact['gini'], abs=1e-3)
+
+    accumulator = ConcentrationAccumulator()
+    accumulator.add(balances)
+    largest = int(np.argmax(balances))
+    for account in [largest] + rng.integers(0, len(balances), 2000).tolist():
+        new = int(balances[account] * rng.uniform(0, 2))
+        accumulator.update(account, int(balances[account]), new)
+        balances[account] = new
+
+    updated, exact = accumulator.metrics(), holder_concentration(balances)
+    assert updated['holders'] == exact['holders']
+    assert updated['top_n_share'] == pytest.approx(exact['top_n_share'], rel=1e-12)
+    assert updated['hhi'] == pytest.approx(exact['hhi'], rel=1e-6)
+    assert updated['gini'] == pytest.approx(exact['gini'], abs=1e-3)
+    assert accumulator.top(1)[0] == (int(np.argmax(balances)), int(balances.max()))
+
+
+def test_account_decoder_bulk_matches_struct_decoding():
+    """测试批量零拷贝解码与逐个 struct 解码一致"""
+    import base64
+
+    from services.accounts import (
+        MINT_DTYPE, TOKEN_ACCOUNT_DTYPE, AccountDecoder, account_bytes, decode_mint, decode_token_account_amount
+    )
+    from services.protocol_registry import PROTOCOL_REGISTRY
+
+    server = MockRpcServer()
+    mints = [entry.mint for entry in PROTOCOL_REGISTRY.values()]
+    holders = [h['address'] for h in server.largest_accounts(mints[0])]
+    token_accounts = [server.account_info(address) for address in holders]
+
+    decoder = AccountDecoder(TOKEN_ACCOUNT_DTYPE, capacity=4)
+    records, present = decoder.decode_many(token_accounts)  # 等长无填充：拼接后一次解码
+    assert present.all()
+    assert records['amount'].tolist() == [decode_token_account_amount(account_bytes(a)) for a in token_accounts]
+    assert bytes(records['owner'][0]) == account_bytes(token_accounts[0])[32:64]
+
+    # 缺失、过短和带扩展的账户（走缓冲区路径）
+    extended = dict(token_accounts[1], data=[
+        base64.b64encode(account_bytes(token_accounts[1]) + b'\x01' * 40).decode(), 'base64'
+    ])
+    short = dict(token_accounts[2], data=[base64.b64encode(b'\x00' * 10).decode(), 'base64'])
+    columns = decoder.columns([token_accounts[0], None, extended, short], 'amount')
+    assert columns['present'].tolist() == [True, False, True, False]
+    assert columns['amount'].tolist() == [records['amount'][0], 0, records['amount'][1], 0]
+
+    mint_accounts = [server.account_info(mint) for mint in mints]
+    mint_records, present = AccountDecoder(MINT_DTYPE).decode_many(mint_accounts)
+    assert present.all()
+    assert mint_records['supply'].tolist() == [decode_mint(account_bytes(a))['supply'] for a in mint_accounts]
+    assert set(mint_records['decimals'].tolist()) == {6}
+
+
+def test_rpc_router_hedges_slow_endpoint_and_trips_breaker():
+    """测试多端点路由：对慢请求发送对冲请求，故障端点熔断后恢复"""
+    from services.rpc_router import RpcRouter
+
+    now = [0.0]
+    with MockRpcServer(latency_ms=2, slow_rate=0.2, slow_latency_ms=400) as flaky, \
+            MockRpcServer(latency_ms=30) as steady:
+        async def scenario():
+            router = RpcRouter([(flaky.url, 100.0), (steady.url, 1.0)], hedge_percentile=75,
+                               hedge_min_samples=10, initial_hedge_delay=0.05,
+                               failure_threshold=3, cooldown=10, clock=lambda: now[0])
+            try:
+                latencies = []
+                for _ in range(60):
+                    start = time.perf_counter()
+                    assert await router.call('getHealth') == 'ok'
+                    latencies.append(time.perf_counter() - start)
+                stats = router.stats()
+                by_url = {e['url']: e for e in stats['endpoints']}
+                assert stats['hedges'] > 0
+                assert by_url[steady.url]['hedge_wins'] > 0
+                assert by_url[flaky.url]['wins'] > by_url[steady.url]['wins']
+                assert max(latencies) < 0.3  # 慢请求被对冲请求截断
+
+                # 注入 HTTP 故障：失败即切换到另一端点，连续失败后熔断
+                flaky.http_error_rate = 1.0
+                for _ in range(20):
+                    assert await router.call('getSlot') > 0
+                flaky_endpoint = router.endpoints[0]
+                assert flaky_endpoint.state == 'open'
+                assert flaky_endpoint.trips == 1
+                assert flaky_endpoint.failures == 3  # 熔断后不再发请求
+
+                # 冷却期过后单个探测请求成功即恢复
+                flaky.http_error_rate = 0.0
+                now[0] += 11
+                for _ in range(20):
+                    await router.call('getSlot')
+                assert flaky_endpoint.state == 'closed'
+
+                # 请求本身的错误不切换端点、不计入熔断
+                with pytest.raises(RpcError):
+                    await router.call('noSuchMethod')
+                assert flaky_endpoint.consecutive_failures == 0
+            finally:
+                await router.close()
+
+        asyncio.run(scenario())
+
+
+def test_rpc_router_slow_primary_loses_selection_share():
+    """测试被对冲请求取消的慢端点也记录延迟下界和软失败，被选为主端点的概率随之下降"""
+    from services.rpc_router import RpcRouter
+
+    def share(router, endpoint):
+        return endpoint.score() / sum(e.score() for e in router.endpoints)
+
+    with MockRpcServer(latency_ms=300) as slow, MockRpcServer(latency_ms=5) as fast:
+        async def scenario():
+            router = RpcRouter([(slow.url, 10.0), (fast.url, 1.0)], hedge_min_samples=1000,
+                               initial_hedge_delay=0.02)
+            slow_endpoint = router.endpoints[0]
+            try:
+                assert share(router, slow_endpoint) > 0.9
+                for _ in range(40):
+                    assert await router.call('getHealth') == 'ok'
+                assert slow_endpoint.wins == 0
+                assert slow_endpoint.losses > 0
+                assert slow_endpoint.latency_ewma > 0.02
+                assert share(router, slow_endpoint) < 0.3
+                assert router.stats()['endpoints'][0]['losses'] == slow_endpoint.losses
+            finally:
+                await router.close()
+
+        asyncio.run(scenario())
+
+def test_solana_service_routes_over_multiple_endpoints(mock_rpc_server):
+    """测试 SolanaService 配置多个端点时使用路由器"""
+    from services.rpc_router import RpcRouter
+
+    with MockRpcServer() as backup:
+        service = SolanaService(demo_mode=False, rpc_url=f'{mock_rpc_server.url}|3,{backup.url}|1')
+        try:
+            assert isinstance(service.client, RpcRouter)
+            assert [e.weight for e in service.client.endpoints] == [3.0, 1.0]
+            mock_rpc_server.http_error_rate = 1.0
+            metrics = service.get_many_protocol_metrics(['Jupiter', 'Orca'])
+            assert set(metrics) == {'Jupiter', 'Orca'}
+            assert backup.rpc_calls > 0
+        finally:
+            service.close()